@@ -0,0 +1,671 @@
+"""
+Pula procesów do inferencji ciężkich slotów AI.
+
+Po co:
+- model (wagi) ładowany RAZ na proces roboczy, a nie w każdym procesie serwera
+  i nie w wątku skryptu Streamlita,
+- tablice wejścia / wyjścia idą przez `multiprocessing.shared_memory`
+  (kolejką lecą tylko nazwy segmentów i kształty – bez picklowania danych),
+- mikro-batching: żądania z różnych sesji zebrane w oknie `batch_wait_ms`
+  (do `max_batch_locations` punktów) idą do modelu jedną paczką,
+- backpressure: ograniczona kolejka żądań (łącznie z odłożonymi przez mikro-batching)
+  + limit paczek w locie; `submit()` przy pełnej kolejce czeka najwyżej `timeout`,
+  potem zwraca None,
+- każdy proces ma własną kolejkę zadań; proces, który padł w trakcie paczki,
+  jest wykrywany, jego paczki kończą się błędem (wołający liczy lokalnie),
+  a proces jest uruchamiany ponownie (najwyżej `max_restarts` razy),
+- metryki: głębokość kolejki, paczki w locie, średni rozmiar paczki, odrzucenia, latencje.
+
+Protokół modelu = protokół slotu wsadowego z ai/model_slot.py:
+    model.predict(values (punkty × czas × zmienne), lats, lons, variables) -> (values, notatki)
+
+Model podajemy jako "moduł:fabryka" (import w procesie roboczym), np.
+"ai.inference_pool:MockCPUModel" – makieta na CPU do pomiaru przepustowości:
+    python -m ai.inference_pool --workers 2 --requests 200
+"""
+from __future__ import annotations
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import importlib
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+POOL_ENABLED = os.getenv("AI_INFERENCE_POOL", "0").lower() in ("1", "true", "yes")
+POOL_WORKERS = int(os.getenv("AI_INFERENCE_WORKERS", "2"))
+POOL_MODEL = os.getenv("AI_INFERENCE_MODEL", "ai.inference_pool:MockCPUModel")
+POOL_MAX_QUEUE = int(os.getenv("AI_INFERENCE_MAX_QUEUE", "64"))
+POOL_MAX_BATCH_LOCATIONS = int(os.getenv("AI_INFERENCE_MAX_BATCH", "256"))
+POOL_BATCH_WAIT_MS = float(os.getenv("AI_INFERENCE_BATCH_WAIT_MS", "5"))
+POOL_SUBMIT_TIMEOUT_S = float(os.getenv("AI_INFERENCE_SUBMIT_TIMEOUT_S", "2"))
+POOL_RESULT_TIMEOUT_S = float(os.getenv("AI_INFERENCE_RESULT_TIMEOUT_S", "30"))
+
+
+# ---------------------------
+# makieta modelu (CPU)
+# ---------------------------
+
+class MockCPUModel:
+    """
+    Udajemy sieć: kilka warstw gęstych (tanh) na cechach (zmienne + lat/lon) dla
+    każdej pary (punkt, godzina), wynik = mała poprawka dodana do wejścia.
+    Koszt ~ liczba punktów × godzin × hidden², więc paczkowanie realnie pomaga.
+    """
+
+    name = "mock-cpu"
+
+    def __init__(self, hidden: int = 256, n_layers: int = 3, seed: int = 0) -> None:
+        self.hidden = hidden
+        self.n_layers = n_layers
+        self.seed = seed
+        self._weights: Dict[int, List[np.ndarray]] = {}
+
+    def _layers(self, n_in: int) -> List[np.ndarray]:
+        # wagi per liczba cech wejściowych – budowane raz („ładowanie modelu”)
+        layers = self._weights.get(n_in)
+        if layers is None:
+            rng = np.random.default_rng(self.seed)
+            sizes = [n_in] + [self.hidden] * self.n_layers + [n_in - 2]
+            layers = [
+                (rng.standard_normal((a, b)) / np.sqrt(a)).astype(np.float32)
+                for a, b in zip(sizes[:-1], sizes[1:])
+            ]
+            self._weights[n_in] = layers
+        return layers
+
+    @property
+    def memory_mb(self) -> float:
+        """Zajętość załadowanych wag [MB]."""
+        return sum(w.nbytes for layers in self._weights.values() for w in layers) / 2**20
+
+    def predict(
+        self, values: np.ndarray, lats: np.ndarray, lons: np.ndarray, variables: Sequence[str]
+    ) -> Tuple[np.ndarray, List[str]]:
+        n_loc, n_t, n_v = values.shape
+        x = np.nan_to_num(values, nan=0.0).reshape(n_loc * n_t, n_v)
+        coords = np.repeat(
+            np.column_stack([np.asarray(lats, np.float32) / 90.0, np.asarray(lons, np.float32) / 180.0]),
+            n_t, axis=0,
+        )
+        h = np.concatenate([x / 10.0, coords], axis=1).astype(np.float32)
+        layers = self._layers(n_v + 2)
+        for w in layers[:-1]:
+            h = np.tanh(h @ w)
+        delta = (h @ layers[-1]).reshape(n_loc, n_t, n_v) * np.float32(0.05)
+        out = values + delta
+        return out.astype(np.float32, copy=False), [
+            f"slot=mock-cpu: makieta sieci ({self.n_layers}×{self.hidden}) na {n_loc} punktach."
+        ]
+
+
+def load_model(spec: str) -> Any:
+    """'moduł:fabryka' → instancja modelu."""
+    module_name, _, attr = spec.partition(":")
+    factory = getattr(importlib.import_module(module_name), attr or "Model")
+    return factory()
+
+
+# ---------------------------
+# proces roboczy
+# ---------------------------
+
+def _worker_main(model_spec: str, task_q: Any, result_q: Any) -> None:
+    t0 = time.perf_counter()
+    try:
+        model = load_model(model_spec)
+    except Exception as exc:  # model się nie ładuje – zgłaszamy i kończymy
+        result_q.put(("failed", os.getpid(), repr(exc)))
+        return
+    result_q.put(("ready", os.getpid(), time.perf_counter() - t0))
+
+    while True:
+        task = task_q.get()
+        if task is None:
+            break
+        batch_id, in_name, out_name, shape, lats, lons, variables = task
+        shm_in = shared_memory.SharedMemory(name=in_name)
+        shm_out = shared_memory.SharedMemory(name=out_name)
+        out = None
+        try:
+            x = np.ndarray(shape, dtype=np.float32, buffer=shm_in.buf)
+            y = np.ndarray(shape, dtype=np.float32, buffer=shm_out.buf)
+            t1 = time.perf_counter()
+            out, notes = model.predict(x, lats, lons, variables)
+            y[...] = out
+            result_q.put(("done", batch_id, list(notes), None, time.perf_counter() - t1))
+        except Exception as exc:
+            result_q.put(("done", batch_id, [], repr(exc), 0.0))
+        finally:
+            # widoki na bufor (także `out` – model może zwrócić samo `x`) muszą zniknąć przed close()
+            x = y = out = None  # noqa: F841
+            shm_in.close()
+            shm_out.close()
+
+
+# ---------------------------
+# pula (strona serwera)
+# ---------------------------
+
+@dataclass
+class _Request:
+    values: np.ndarray
+    lats: np.ndarray
+    lons: np.ndarray
+    variables: Tuple[str, ...]
+    future: Future
+    submitted: float = field(default_factory=time.perf_counter)
+
+
+@dataclass
+class _Batch:
+    requests: List[_Request]
+    shm_in: shared_memory.SharedMemory
+    shm_out: shared_memory.SharedMemory
+    shape: Tuple[int, int, int]
+    worker: "_Worker"
+
+
+@dataclass(eq=False)
+class _Worker:
+    process: Any
+    task_q: Any
+    restarts: int = 0
+    retired: bool = False
+
+
+class InferencePool:
+    def __init__(
+        self,
+        model_spec: str = POOL_MODEL,
+        *,
+        n_workers: int = POOL_WORKERS,
+        max_queue: int = POOL_MAX_QUEUE,
+        max_batch_locations: int = POOL_MAX_BATCH_LOCATIONS,
+        batch_wait_ms: float = POOL_BATCH_WAIT_MS,
+        max_inflight: Optional[int] = None,
+        max_restarts: int = 5,
+    ) -> None:
+        self.model_spec = model_spec
+        self.n_workers = max(1, int(n_workers))
+        self.max_batch_locations = max(1, int(max_batch_locations))
+        self.batch_wait_s = batch_wait_ms / 1000.0
+        self.max_restarts = max_restarts
+        # miejsca w kolejce: zajmowane w submit(), zwalniane dopiero przy wysłaniu paczki,
+        # więc żądania odłożone w `_carry` nadal liczą się do limitu
+        self._queue_slots = threading.BoundedSemaphore(max(1, int(max_queue)))
+        self._pending: "queue.Queue[_Request]" = queue.Queue()
+        self._inflight_slots = threading.BoundedSemaphore(max_inflight or 2 * self.n_workers)
+        self._inflight: Dict[int, _Batch] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._ctx = mp.get_context("spawn")
+        self._result_q: Any = None
+        self._workers: List[_Worker] = []
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._carry: List[_Request] = []
+        self._stats: Dict[str, float] = {
+            "submitted": 0, "rejected": 0, "completed": 0, "failed": 0,
+            "batches": 0, "batched_locations": 0, "model_s": 0.0, "latency_s": 0.0,
+            "worker_deaths": 0, "worker_restarts": 0,
+        }
+        self.load_times_s: Dict[int, float] = {}
+
+    # --- cykl życia ---
+
+    def start(self, *, wait_ready: bool = True, timeout: float = 60.0) -> "InferencePool":
+        if self._workers:
+            return self
+        self._result_q = self._ctx.Queue()
+        self._workers = [self._spawn() for _ in range(self.n_workers)]
+        if wait_ready:
+            deadline = time.monotonic() + timeout
+            while len(self.load_times_s) < self.n_workers and time.monotonic() < deadline:
+                try:
+                    msg = self._result_q.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                self._handle_message(msg)
+        for target in (self._dispatch_loop, self._collect_loop):
+            t = threading.Thread(target=target, daemon=True, name=f"inference-{target.__name__}")
+            t.start()
+            self._threads.append(t)
+        logger.info("Pula inferencji: %d procesów, model %s", self.n_workers, self.model_spec)
+        return self
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=2.0)
+        for w in self._workers:
+            w.task_q.put(None)
+        for w in self._workers:
+            w.process.join(timeout=5.0)
+            if w.process.is_alive():
+                w.process.terminate()
+        with self._lock:
+            batches = list(self._inflight.values())
+            self._inflight.clear()
+        for batch in batches:
+            self._fail(batch.requests, "pula inferencji zamknięta")
+            self._release(batch)
+        pending = self._carry
+        self._carry = []
+        while True:
+            try:
+                pending.append(self._pending.get_nowait())
+            except queue.Empty:
+                break
+        self._fail(pending, "pula inferencji zamknięta")
+        for _ in pending:
+            self._queue_slots.release()
+        self._workers = []
+        self._threads = []
+
+    # --- API ---
+
+    def submit(
+        self,
+        values: np.ndarray,
+        lats: Sequence[float],
+        lons: Sequence[float],
+        variables: Sequence[str],
+        *,
+        timeout: Optional[float] = POOL_SUBMIT_TIMEOUT_S,
+    ) -> Optional[Future]:
+        """
+        Zleca inferencję (punkty × czas × zmienne). Zwraca Future z (values, notatki)
+        albo None, gdy kolejka jest pełna dłużej niż `timeout` (backpressure).
+        """
+        if not self.healthy:
+            self._bump("rejected")
+            return None
+        req = _Request(
+            np.ascontiguousarray(values, dtype=np.float32),
+            np.asarray(lats, dtype=np.float64),
+            np.asarray(lons, dtype=np.float64),
+            tuple(variables),
+            Future(),
+        )
+        if not self._queue_slots.acquire(timeout=timeout):
+            self._bump("rejected")
+            return None
+        self._pending.put(req)
+        self._bump("submitted")
+        return req.future
+
+    def infer(
+        self,
+        values: np.ndarray,
+        lats: Sequence[float],
+        lons: Sequence[float],
+        variables: Sequence[str],
+        *,
+        submit_timeout: Optional[float] = POOL_SUBMIT_TIMEOUT_S,
+        result_timeout: Optional[float] = POOL_RESULT_TIMEOUT_S,
+    ) -> Optional[Tuple[np.ndarray, List[str]]]:
+        """
+        Wersja blokująca; None przy przepełnieniu (kolejka pełna dłużej niż `submit_timeout`),
+        braku wyniku w `result_timeout` albo błędzie modelu.
+        """
+        future = self.submit(values, lats, lons, variables, timeout=submit_timeout)
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=result_timeout)
+        except Exception as exc:
+            logger.warning("Inferencja nieudana: %s", exc)
+            return None
+
+    @property
+    def healthy(self) -> bool:
+        """Czy choć jeden żywy proces roboczy ma załadowany model."""
+        return bool(self._ready_workers())
+
+    @property
+    def queue_depth(self) -> int:
+        return self._pending.qsize() + len(self._carry)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["inflight_batches"] = len(self._inflight)
+        out["queue_depth"] = self.queue_depth
+        out["workers"] = len(self._ready_workers())
+        out["mean_batch_locations"] = out["batched_locations"] / out["batches"] if out["batches"] else 0.0
+        out["mean_latency_ms"] = out["latency_s"] / out["completed"] * 1000.0 if out["completed"] else 0.0
+        out["worker_load_s"] = dict(self.load_times_s)
+        return out
+
+    # --- wnętrze ---
+
+    def _spawn(self, restarts: int = 0) -> _Worker:
+        task_q = self._ctx.Queue()
+        p = self._ctx.Process(target=_worker_main, args=(self.model_spec, task_q, self._result_q), daemon=True)
+        p.start()
+        return _Worker(p, task_q, restarts)
+
+    def _ready_workers(self) -> List[_Worker]:
+        # NaN w load_times_s = proces nie załadował modelu
+        ready = []
+        for w in self._workers:
+            load_time = self.load_times_s.get(w.process.pid)
+            if load_time is not None and load_time == load_time and not w.retired and w.process.is_alive():
+                ready.append(w)
+        return ready
+
+    def _pick_worker(self) -> Optional[_Worker]:
+        """Najmniej obciążony żywy proces (po liczbie paczek w locie)."""
+        ready = self._ready_workers()
+        if not ready:
+            return None
+        with self._lock:
+            busy = [b.worker for b in self._inflight.values()]
+        return min(ready, key=lambda w: sum(b is w for b in busy))
+
+    def _check_workers(self) -> None:
+        """Procesy martwe: ich paczki kończą się błędem, zwalniamy limity, proces wstaje od nowa."""
+        if self._stop.is_set():
+            return
+        for i, w in enumerate(self._workers):
+            if w.retired or w.process.is_alive():
+                continue
+            w.retired = True
+            pid = w.process.pid
+            load_time = self.load_times_s.get(pid)
+            if load_time is not None and load_time != load_time:
+                continue  # model się nie ładuje – restart nic nie da
+            self.load_times_s.pop(pid, None)
+            self._bump("worker_deaths")
+            logger.error("Proces inferencji %s padł (kod %s)", pid, w.process.exitcode)
+            if w.restarts >= self.max_restarts:
+                logger.error("Limit restartów procesu inferencji wyczerpany – proces nie wraca")
+                continue
+            self._workers[i] = self._spawn(w.restarts + 1)
+            self._bump("worker_restarts")
+        # paczki martwych procesów (także wysłane tuż przed wykryciem śmierci)
+        with self._lock:
+            lost = [bid for bid, b in self._inflight.items() if b.worker.retired]
+            batches = [self._inflight.pop(bid) for bid in lost]
+        for batch in batches:
+            self._fail(batch.requests, f"proces inferencji {batch.worker.process.pid} zakończył się w trakcie paczki")
+            self._release(batch)
+            self._inflight_slots.release()
+
+    def _fail(self, requests: List[_Request], error: str) -> None:
+        for r in requests:
+            if not r.future.done():
+                r.future.set_exception(RuntimeError(error))
+        if requests:
+            self._bump("failed", len(requests))
+
+    def _bump(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._stats[name] += value
+
+    def _next_request(self, timeout: float) -> Optional[_Request]:
+        if self._carry:
+            return self._carry.pop(0)
+        try:
+            return self._pending.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _dispatch_loop(self) -> None:
+        while not self._stop.is_set():
+            first = self._next_request(0.1)
+            if first is None:
+                continue
+            group = [first]
+            n_loc = first.values.shape[0]
+            key = (first.values.shape[1:], first.variables)
+            deadline = time.perf_counter() + self.batch_wait_s
+            skipped: List[_Request] = []
+            # mikro-batching: zbieramy zgodne żądania (ta sama oś czasu i zmienne)
+            while n_loc < self.max_batch_locations:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                req = self._next_request(remaining)
+                if req is None:
+                    break
+                if (req.values.shape[1:], req.variables) != key or n_loc + req.values.shape[0] > self.max_batch_locations:
+                    skipped.append(req)
+                    continue
+                group.append(req)
+                n_loc += req.values.shape[0]
+            self._carry = skipped + self._carry
+            # backpressure w stronę procesów: najwyżej max_inflight paczek naraz
+            while not self._inflight_slots.acquire(timeout=0.1):
+                if self._stop.is_set():
+                    # paczka wraca do odłożonych – shutdown() zakończy je błędem i zwolni miejsca w kolejce
+                    self._carry = group + self._carry
+                    return
+            self._send(group)
+
+    def _send(self, group: List[_Request]) -> None:
+        for _ in group:
+            self._queue_slots.release()
+        worker = self._pick_worker()
+        if worker is None:
+            self._fail(group, "brak działających procesów inferencji")
+            self._inflight_slots.release()
+            return
+        shape = (sum(r.values.shape[0] for r in group),) + group[0].values.shape[1:]
+        nbytes = max(1, int(np.prod(shape)) * 4)
+        shm_in = shared_memory.SharedMemory(create=True, size=nbytes)
+        shm_out = shared_memory.SharedMemory(create=True, size=nbytes)
+        x = np.ndarray(shape, dtype=np.float32, buffer=shm_in.buf)
+        offset = 0
+        for r in group:
+            x[offset: offset + r.values.shape[0]] = r.values
+            offset += r.values.shape[0]
+        del x
+        lats = np.concatenate([r.lats for r in group])
+        lons = np.concatenate([r.lons for r in group])
+        batch_id = next(self._ids)
+        with self._lock:
+            self._inflight[batch_id] = _Batch(group, shm_in, shm_out, shape, worker)
+            self._stats["batches"] += 1
+            self._stats["batched_locations"] += shape[0]
+        worker.task_q.put((batch_id, shm_in.name, shm_out.name, shape, lats, lons, group[0].variables))
+
+    def _collect_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                msg = self._result_q.get(timeout=0.1)
+            except (queue.Empty, OSError, EOFError):
+                msg = None
+            if msg is not None:
+                self._handle_message(msg)
+            self._check_workers()
+
+    def _handle_message(self, msg: Tuple[Any, ...]) -> None:
+        kind = msg[0]
+        if kind == "ready":
+            self.load_times_s[msg[1]] = msg[2]
+            return
+        if kind == "failed":
+            logger.error("Proces inferencji %s nie załadował modelu: %s", msg[1], msg[2])
+            self.load_times_s[msg[1]] = float("nan")
+            return
+        _, batch_id, notes, error, model_s = msg
+        with self._lock:
+            batch = self._inflight.pop(batch_id, None)
+        if batch is None:
+            return
+        now = time.perf_counter()
+        if error is None:
+            y = np.ndarray(batch.shape, dtype=np.float32, buffer=batch.shm_out.buf)
+            offset = 0
+            for r in batch.requests:
+                n = r.values.shape[0]
+                r.future.set_result((np.array(y[offset: offset + n]), list(notes)))
+                offset += n
+            del y
+            self._bump("completed", len(batch.requests))
+            self._bump("model_s", model_s)
+            self._bump("latency_s", sum(now - r.submitted for r in batch.requests))
+        else:
+            self._fail(batch.requests, error)
+        self._release(batch)
+        self._inflight_slots.release()
+
+    @staticmethod
+    def _release(batch: _Batch) -> None:
+        for shm in (batch.shm_in, batch.shm_out):
+            try:
+                shm.close()
+                shm.unlink()
+            except (FileNotFoundError, BufferError):
+                pass
+
+
+# ---------------------------
+# globalna pula + slot
+# ---------------------------
+
+_POOL: Optional[InferencePool] = None
+_POOL_LOCK = threading.Lock()
+_LOCAL_MODEL: Any = None
+
+
+def get_inference_pool() -> Optional[InferencePool]:
+    """Pula współdzielona przez sesje procesu (startuje leniwie, gdy AI_INFERENCE_POOL=1)."""
+    global _POOL
+    if not POOL_ENABLED:
+        return None
+    with _POOL_LOCK:
+        if _POOL is None:
+            try:
+                _POOL = InferencePool().start()
+            except Exception as exc:
+                logger.error("Nie udało się uruchomić puli inferencji: %s", exc)
+                return None
+        return _POOL
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    return _POOL.stats() if _POOL is not None else {"enabled": POOL_ENABLED, "workers": 0}
+
+
+def pool_batch_slot(
+    values: np.ndarray,
+    lats: np.ndarray,
+    lons: np.ndarray,
+    variables: Sequence[str],
+    *,
+    local_model: Any = None,
+) -> Tuple[np.ndarray, List[str]]:
+    """
+    Slot wsadowy (ai/model_slot.py) wykonywany w puli. Bez puli albo gdy jest
+    przeciążona – lokalnie w tym procesie (wynik ten sam, tylko wolniej dla UI):
+    na `local_model`, a bez niego na modelu współdzielonym przez moduł.
+    """
+    global _LOCAL_MODEL
+    pool = get_inference_pool()
+    if pool is not None:
+        res = pool.infer(values, lats, lons, variables)
+        if res is not None:
+            return res
+        logger.info("Pula inferencji przeciążona – liczę lokalnie")
+    if local_model is None:
+        if _LOCAL_MODEL is None:
+            _LOCAL_MODEL = load_model(POOL_MODEL)
+        local_model = _LOCAL_MODEL
+    return local_model.predict(np.asarray(values, dtype=np.float32), lats, lons, variables)
+
+
+class PooledModelSlot:
+    """
+    Fabryka slotu "model" dla rejestru (ai/registry.py): instancja trzyma własną
+    kopię modelu do liczenia lokalnie (gdy puli nie ma albo jest przeciążona),
+    więc wyrzucenie slotu z rejestru faktycznie zwalnia jego wagi.
+    """
+
+    def __init__(self, model_spec: str = POOL_MODEL, warm_variables: int = 2) -> None:
+        self.model = load_model(model_spec)
+        warm = getattr(self.model, "_layers", None)
+        if warm is not None:
+            # wagi dla typowej paczki (temperatura + opad) od razu – koszt ładowania tutaj, nie w 1. żądaniu
+            warm(warm_variables + 2)
+
+    @property
+    def memory_mb(self) -> float:
+        return float(getattr(self.model, "memory_mb", 0.0))
+
+    def predict(
+        self, values: np.ndarray, lats: np.ndarray, lons: np.ndarray, variables: Sequence[str]
+    ) -> Tuple[np.ndarray, List[str]]:
+        return pool_batch_slot(values, lats, lons, variables, local_model=self.model)
+
+
+def benchmark(
+    n_requests: int = 200,
+    locations_per_request: int = 1,
+    n_hours: int = 168,
+    n_workers: int = 2,
+    clients: int = 16,
+) -> Dict[str, float]:
+    """Przepustowość puli (wiele „sesji” naraz) vs ten sam model liczony lokalnie żądanie po żądaniu."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    rng = np.random.default_rng(0)
+    variables = ("temperature_c", "precip_mm")
+    reqs = [
+        (
+            rng.normal(8, 5, (locations_per_request, n_hours, 2)).astype(np.float32),
+            rng.uniform(49, 55, locations_per_request),
+            rng.uniform(14, 24, locations_per_request),
+        )
+        for _ in range(n_requests)
+    ]
+    model = load_model(POOL_MODEL)
+    model.predict(*reqs[0], variables)  # rozgrzewka
+    t0 = time.perf_counter()
+    for v, la, lo in reqs:
+        model.predict(v, la, lo, variables)
+    local_s = time.perf_counter() - t0
+
+    pool = InferencePool(n_workers=n_workers).start()
+    try:
+        pool.infer(*reqs[0], variables)
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as ex:
+            results = list(ex.map(lambda r: pool.infer(*r, variables), reqs))
+        pool_s = time.perf_counter() - t0
+        stats = pool.stats()
+    finally:
+        pool.shutdown()
+    return {
+        "requests": float(n_requests),
+        "local_req_per_s": n_requests / local_s,
+        "pool_req_per_s": n_requests / pool_s,
+        "mean_batch_locations": stats["mean_batch_locations"],
+        "mean_latency_ms": stats["mean_latency_ms"],
+        "failed": float(sum(r is None for r in results)),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark puli inferencji (makieta CPU).")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--locations", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--clients", type=int, default=16)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    for k, v in benchmark(args.requests, args.locations, n_workers=args.workers, clients=args.clients).items():
+        print(f"{k:>22}: {v:,.2f}")
@@ -0,0 +1,263 @@
+"""
+Memoizacja slotów AI i postprocessingu.
+
+Streamlit przelicza cały skrypt przy każdym kliknięciu, a slot / postprocessing
+dają ten sam wynik dla tej samej prognozy i tych samych parametrów. Klucz:
+
+    (etap, nazwa, wersja logiki, blake2b(oś czasu + kolumny + wartości float32), parametry)
+
+- poziom 1: TTLCache w pamięci procesu (ograniczony, LRU),
+- poziom 2 (opcjonalny, AI_MEMO_DISK=1): pliki .npz pod BASE_DIR – przeżywa restart,
+  prawdziwy, drogi model liczy się raz na wersję prognozy, a nie raz na klik.
+
+Zwracane obiekty są współdzielone między rerunami – traktuj je jako tylko do odczytu
+(sloty i postprocessing i tak zawsze robią kopię).
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Union
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from core.disk_budget import DiskBudget
+from core.storage import BASE_DIR
+from core.ttl_cache import MISSING, TTLCache
+from weather.block import ForecastBlock
+
+logger = logging.getLogger(__name__)
+
+MEMO_CACHE_SIZE = int(os.getenv("AI_MEMO_CACHE_SIZE", "256"))
+MEMO_CACHE_TTL_S = float(os.getenv("AI_MEMO_CACHE_TTL_S", "21600"))
+MEMO_DISK_ENABLED = os.getenv("AI_MEMO_DISK", "0").lower() in ("1", "true", "yes")
+MEMO_DISK_MAX_BYTES = int(os.getenv("AI_MEMO_DISK_MAX_BYTES", str(256 * 1024 * 1024)))
+MEMO_SUBDIR = "ai-memo"
+
+Forecast = Union[pd.DataFrame, ForecastBlock]
+StageResult = Tuple[Forecast, List[str]]
+
+
+def content_hash(data: Forecast) -> str:
+    """Szybki odcisk zawartości: oś czasu, nazwy kolumn i wartości (float32)."""
+    h = hashlib.blake2b(digest_size=16)
+    if isinstance(data, ForecastBlock):
+        h.update(b"block")
+        h.update(data.times.astype(np.int64).tobytes())
+        h.update(data.lats.tobytes())
+        h.update(data.lons.tobytes())
+        h.update("|".join(data.variables).encode("utf-8"))
+        h.update(np.ascontiguousarray(data.values).tobytes())
+        return h.hexdigest()
+    h.update(b"frame")
+    h.update(pd.DatetimeIndex(data.index).asi8.tobytes() if len(data.index) else b"")
+    for col in data.columns:
+        h.update(str(col).encode("utf-8"))
+        h.update(np.ascontiguousarray(pd.to_numeric(data[col], errors="coerce").to_numpy(dtype=np.float32)).tobytes())
+    return h.hexdigest()
+
+
+def memo_key(stage: str, name: str, version: str, data_hash: str, params: Optional[Mapping[str, Any]] = None) -> str:
+    payload = json.dumps(
+        {"stage": stage, "name": name, "version": version, "data": data_hash, "params": dict(params or {})},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=20).hexdigest()
+
+
+class ResultMemo:
+    """Dwupoziomowy cache wyników etapów AI (pamięć + opcjonalnie dysk)."""
+
+    def __init__(
+        self,
+        memory: Optional[TTLCache] = None,
+        *,
+        disk_dir: Optional[str] = None,
+        max_disk_bytes: int = MEMO_DISK_MAX_BYTES,
+    ) -> None:
+        self.memory = memory if memory is not None else TTLCache(MEMO_CACHE_SIZE, MEMO_CACHE_TTL_S, name="ai-memo")
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._budget = DiskBudget(disk_dir, max_disk_bytes) if disk_dir else None
+        self._lock = threading.Lock()
+        self._stats = {"computed": 0, "disk_hits": 0, "disk_writes": 0, "disk_errors": 0}
+
+    # ---------------------------
+    # główne API
+    # ---------------------------
+
+    def call(
+        self,
+        stage: str,
+        name: str,
+        version: str,
+        data: Forecast,
+        params: Optional[Mapping[str, Any]],
+        compute: Callable[[], StageResult],
+    ) -> StageResult:
+        """Wynik z cache albo `compute()` (i zapis do obu poziomów)."""
+        key = memo_key(stage, name, version, content_hash(data), params)
+        hit = self.memory.get(key)
+        if hit is not MISSING:
+            return hit
+        if self.disk_dir:
+            hit = self._disk_get(key)
+            if hit is not None:
+                self.memory.set(key, hit)
+                return hit
+
+        result = compute()
+        self._bump("computed")
+        self.memory.set(key, result)
+        if self.disk_dir:
+            self._disk_put(key, result)
+        return result
+
+    def clear(self) -> None:
+        self.memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+        out["memory"] = self.memory.stats()
+        out["disk_enabled"] = bool(self.disk_dir)
+        if self._budget is not None:
+            out["disk_entries"] = self._budget.entries
+            out["disk_bytes"] = self._budget.total_bytes
+        return out
+
+    def _bump(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    # ---------------------------
+    # poziom dyskowy (.npz, jak ForecastDiskCache)
+    # ---------------------------
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.disk_dir or "", key[:2], f"{key}.npz")
+
+    def _disk_get(self, key: str) -> Optional[StageResult]:
+        path = self._path_for(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                meta = json.loads(str(npz["meta"]))
+                if meta["kind"] == "block":
+                    data: Forecast = ForecastBlock(
+                        npz["times"].astype("datetime64[ns]"), npz["lats"], npz["lons"],
+                        meta["variables"], npz["values"], attrs=meta.get("attrs"),
+                    )
+                else:
+                    index = pd.DatetimeIndex(npz["time"].astype("datetime64[ns]"), name=meta.get("index_name"))
+                    if meta.get("tz"):
+                        index = index.tz_localize("UTC").tz_convert(meta["tz"])
+                    data = pd.DataFrame(
+                        {col: npz[f"c{i}"] for i, col in enumerate(meta["columns"])}, index=index
+                    )
+                    data.attrs.update(meta.get("attrs") or {})
+        except Exception as exc:
+            logger.warning("Uszkodzony wpis memo %s: %s", path, exc)
+            self._bump("disk_errors")
+            return None
+        self._bump("disk_hits")
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data, list(meta.get("notes") or [])
+
+    def _disk_put(self, key: str, result: StageResult) -> None:
+        data, notes = result
+        attrs = {k: v for k, v in getattr(data, "attrs", {}).items() if isinstance(v, (str, int, float, bool, type(None)))}
+        meta: Dict[str, Any] = {"notes": list(notes), "attrs": attrs}
+        arrays: Dict[str, Any] = {}
+        if isinstance(data, ForecastBlock):
+            meta.update(kind="block", variables=list(data.variables))
+            arrays.update(times=data.times.astype(np.int64), lats=data.lats, lons=data.lons, values=data.values)
+        else:
+            index = pd.DatetimeIndex(data.index)
+            columns = [str(c) for c in data.columns]
+            meta.update(
+                kind="frame", columns=columns, index_name=data.index.name,
+                tz=str(index.tz) if index.tz is not None else None,
+            )
+            arrays["time"] = index.asi8
+            for i, col in enumerate(columns):
+                values = pd.to_numeric(data[col], errors="coerce")
+                # dtype jak w wyniku (float64 po rolling w pandas, float32 z parsera)
+                dtype = values.dtype if values.dtype.kind == "f" else np.float32
+                arrays[f"c{i}"] = values.to_numpy(dtype=dtype)
+        arrays["meta"] = np.array(json.dumps(meta, default=str))
+
+        path = self._path_for(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        except Exception as exc:
+            logger.warning("Nie udało się zapisać memo %s: %s", path, exc)
+            self._bump("disk_errors")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self._bump("disk_writes")
+        if self._budget is not None:
+            # bieżąca suma zamiast os.walk przy każdym zapisie; skan dopiero po przekroczeniu limitu
+            self._budget.added(path)
+            self._budget.max_bytes = self.max_disk_bytes
+            self._budget.enforce(self._remove_file)
+
+    @staticmethod
+    def _remove_file(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+MEMO = ResultMemo(disk_dir=os.path.join(BASE_DIR, MEMO_SUBDIR) if MEMO_DISK_ENABLED else None)
+
+
+def memoized_model_slot(
+    df: Forecast,
+    slot_name: str,
+    lat: float,
+    lon: float,
+    *,
+    memo: ResultMemo = MEMO,
+) -> StageResult:
+    """`apply_model_slot` liczony raz na (prognoza, slot + wersja, punkt)."""
+    from ai.model_slot import apply_model_slot
+    from ai.registry import SLOT_REGISTRY
+
+    if slot_name == "none":
+        return df, []
+    params = {"lat": round(float(lat), 4), "lon": round(float(lon), 4)}
+    return memo.call(
+        "slot", slot_name, SLOT_REGISTRY.version(slot_name), df, params,
+        lambda: apply_model_slot(df, slot_name=slot_name, lat=lat, lon=lon),
+    )
+
+
+def memoized_corrections(df: Forecast, *, memo: ResultMemo = MEMO, **params: Any) -> StageResult:
+    """`apply_basic_ai_corrections` liczony raz na (prognoza, parametry)."""
+    from ai.postprocess import POSTPROCESS_VERSION, apply_basic_ai_corrections
+
+    return memo.call(
+        "postprocess", "basic", POSTPROCESS_VERSION, df, params,
+        lambda: apply_basic_ai_corrections(df, **params),
+    )
+
+
+def get_memo_stats() -> Dict[str, Any]:
+    return MEMO.stats()
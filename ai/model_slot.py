@@ -1,11 +1,43 @@
+"""
+Sloty modeli AI (GraphCast / downscaling / HF) nakładane na prognozę.
+
+Dwa protokoły:
+- `ModelSlot` – jedna ramka + jeden punkt (stary, prosty interfejs),
+- `BatchModelSlot` – cała paczka punktów naraz:
+
+      slot(values, lats, lons, variables) -> (values, notatki)
+
+  values: (punkty × czas × zmienne) float32, lats / lons: (punkty,).
+  Prawdziwy model (GraphCast, downscaler) jest wydajny dopiero na paczce,
+  a układ „zmienne na końcu” to to, czego zwykle oczekują sieci.
+
+Adaptery działają w obie strony: slot ramkowy da się puścić po bloku
+(`batch_from_frame_slot`, pętla po punktach), a slot wsadowy obsłuży pojedynczą
+ramkę (`run_batch_slot_on_frame`, paczka z jednym punktem). ForecastBlock trzyma
+(punkty × zmienne × czas), więc do slotu idzie widok z przestawionymi osiami – bez kopii.
+
+Benchmark (latencja na punkt vs rozmiar paczki):
+    python -m ai.model_slot
+"""
 from __future__ import annotations
-from typing import Callable, Dict, List, Tuple
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+import numpy as np
 import pandas as pd
 
+from weather.block import ForecastBlock, rolling_mean
+
 
 # typ slotu: bierze df i zwraca df + listę notatek
 ModelSlot = Callable[[pd.DataFrame, float, float], Tuple[pd.DataFrame, List[str]]]
 
+# slot wsadowy: (punkty × czas × zmienne), lats, lons, nazwy zmiennych -> (to samo, notatki)
+BatchModelSlot = Callable[
+    [np.ndarray, np.ndarray, np.ndarray, Sequence[str]], Tuple[np.ndarray, List[str]]
+]
+
+# zmienne, które ramka przekazuje slotowi; reszta kolumn (wilgotność, kod pogody, ...) zostaje nietknięta
+SLOT_VARIABLES: Tuple[str, ...] = ("temperature_c", "precip_mm")
+
 
 def _ensure_weather_columns(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -20,66 +52,221 @@ def _ensure_weather_columns(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def slot_none(df: pd.DataFrame, lat: float, lon: float) -> Tuple[pd.DataFrame, List[str]]:
-    return df, []
+# ---------------------------
+# sloty wsadowe (wektorowo dla całej paczki)
+# ---------------------------
 
+def _working_copy(values: np.ndarray) -> np.ndarray:
+    # float64 z ramki zostaje float64, bloki i całe liczby → float32
+    return np.array(values, dtype=np.result_type(values.dtype, np.float32), copy=True)
 
-def slot_mock_graphcast(df: pd.DataFrame, lat: float, lon: float) -> Tuple[pd.DataFrame, List[str]]:
+
+def _as_f64(values: np.ndarray) -> np.ndarray:
+    # arytmetyka + .round(2) zawsze w float64 (jak stare sloty ramkowe), rzutowanie dopiero przy wpisaniu
+    return np.asarray(values, dtype=np.float64)
+
+
+def batch_slot_none(
+    values: np.ndarray, lats: np.ndarray, lons: np.ndarray, variables: Sequence[str]
+) -> Tuple[np.ndarray, List[str]]:
+    return values, []
+
+
+def batch_slot_mock_graphcast(
+    values: np.ndarray, lats: np.ndarray, lons: np.ndarray, variables: Sequence[str]
+) -> Tuple[np.ndarray, List[str]]:
     """
     Udajemy, że GraphCast:
     - delikatnie redukujemy opad,
-    - lekko wygładzamy temperaturę.
+    - lekko wygładzamy temperaturę (okno 2 h, jak rolling(2, min_periods=1)).
     """
     notes: List[str] = ["slot=mock-graphcast: symulacja poprawy pola opadów i temperatury."]
-    df = df.copy()
+    out = _working_copy(values)
+    names = list(variables)
 
-    if "precip_mm" in df.columns:
-        df["precip_mm"] = (df["precip_mm"] * 0.9).round(2)
+    if "precip_mm" in names:
+        p = names.index("precip_mm")
+        out[..., p] = np.round(_as_f64(out[..., p]) * 0.9, 2)
 
-    if "temperature_c" in df.columns:
-        df["temperature_c"] = (
-            df["temperature_c"]
-            .rolling(window=2, min_periods=1)
-            .mean()
-            .round(2)
-        )
+    if "temperature_c" in names:
+        t = names.index("temperature_c")
+        out[..., t] = np.round(rolling_mean(_as_f64(out[..., t]), 2), 2)
 
-    return df, notes
+    return out, notes
 
 
-def slot_mock_downscaler(df: pd.DataFrame, lat: float, lon: float) -> Tuple[pd.DataFrame, List[str]]:
+def batch_slot_mock_downscaler(
+    values: np.ndarray, lats: np.ndarray, lons: np.ndarray, variables: Sequence[str]
+) -> Tuple[np.ndarray, List[str]]:
     """
-    Udajemy lokalny downscaler – np. poprawka terenowa zależna od szerokości.
+    Udajemy lokalny downscaler – np. poprawka terenowa zależna od szerokości (per punkt).
     """
-    df = df.copy()
-    correction = (abs(lat) % 5) * 0.1  # 0.0–0.5°C
-    notes = [f"slot=mock-downscaler: lokalna korekta temperatury o {correction:.2f} °C (lat={lat:.2f})."]
+    out = _working_copy(values)
+    lats = np.asarray(lats, dtype=np.float64)
+    correction = (np.abs(lats) % 5) * 0.1  # 0.0–0.5°C
+    if len(lats) == 1:
+        notes = [
+            f"slot=mock-downscaler: lokalna korekta temperatury o {correction[0]:.2f} °C (lat={lats[0]:.2f})."
+        ]
+    else:
+        notes = [
+            f"slot=mock-downscaler: lokalna korekta temperatury {correction.min():.2f}–{correction.max():.2f} °C "
+            f"dla {len(lats)} punktów."
+        ]
+
+    names = list(variables)
+    if "temperature_c" in names and len(lats):
+        t = names.index("temperature_c")
+        out[..., t] = np.round(_as_f64(out[..., t]) - correction[:, None], 2)
+
+    return out, notes
+
 
-    if "temperature_c" in df.columns:
-        df["temperature_c"] = (df["temperature_c"] - correction).round(2)
+# ---------------------------
+# adaptery ramka <-> paczka
+# ---------------------------
 
+def run_batch_slot_on_frame(
+    slot: BatchModelSlot,
+    df: pd.DataFrame,
+    lat: float,
+    lon: float,
+    variables: Sequence[str] = SLOT_VARIABLES,
+) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Slot wsadowy dla jednej ramki: paczka z jednym punktem. Do slotu idą tylko
+    `variables` obecne w ramce; wracają tylko te kolumny, w swoim pierwotnym dtype.
+    """
+    names = [c for c in variables if c in df.columns and pd.api.types.is_numeric_dtype(df[c])]
+    if df.empty or not names:
+        return df, []
+    dtype = np.result_type(*[df[c].dtype for c in names], np.float32)
+    values = df[names].to_numpy(dtype=dtype)[None, :, :]
+    out, notes = slot(values, np.array([lat], dtype=np.float64), np.array([lon], dtype=np.float64), names)
+    df = df.copy()
+    for v, name in enumerate(names):
+        col = out[0, :, v]
+        df[name] = col.astype(df[name].dtype, copy=False) if df[name].dtype.kind == "f" else col
     return df, notes
 
 
-# rejestr slotów – tu dodajesz kolejne, np. "real-graphcast": slot_real_graphcast
+def batch_from_frame_slot(slot: ModelSlot) -> BatchModelSlot:
+    """Slot ramkowy jako wsadowy – pętla po punktach (dla starych / zewnętrznych slotów)."""
+
+    def _batch(
+        values: np.ndarray, lats: np.ndarray, lons: np.ndarray, variables: Sequence[str]
+    ) -> Tuple[np.ndarray, List[str]]:
+        out = np.empty_like(values, dtype=np.float32)
+        notes: List[str] = []
+        names = list(variables)
+        index = pd.RangeIndex(values.shape[1], name="time")
+        for i in range(values.shape[0]):
+            frame = pd.DataFrame(values[i], index=index, columns=names)
+            res, slot_notes = slot(frame, float(lats[i]), float(lons[i]))
+            for v, name in enumerate(names):
+                out[i, :, v] = res[name].to_numpy(dtype=np.float32) if name in res.columns else values[i, :, v]
+            for note in slot_notes:
+                if note not in notes:
+                    notes.append(note)
+        return out, notes
+
+    _batch.__name__ = f"batch_{getattr(slot, '__name__', 'slot')}"
+    return _batch
+
+
+# ---------------------------
+# sloty na jedną ramkę (stary interfejs – ten sam kod co wsadowe)
+# ---------------------------
+
+def slot_none(df: pd.DataFrame, lat: float, lon: float) -> Tuple[pd.DataFrame, List[str]]:
+    return df, []
+
+
+def slot_mock_graphcast(df: pd.DataFrame, lat: float, lon: float) -> Tuple[pd.DataFrame, List[str]]:
+    return run_batch_slot_on_frame(batch_slot_mock_graphcast, df, lat, lon)
+
+
+def slot_mock_downscaler(df: pd.DataFrame, lat: float, lon: float) -> Tuple[pd.DataFrame, List[str]]:
+    return run_batch_slot_on_frame(batch_slot_mock_downscaler, df, lat, lon)
+
+
+def batch_slot_mock_cpu(
+    values: np.ndarray, lats: np.ndarray, lons: np.ndarray, variables: Sequence[str]
+) -> Tuple[np.ndarray, List[str]]:
+    """Makieta ciężkiego modelu – liczona w puli procesów (ai/inference_pool.py), gdy jest włączona."""
+    from ai.inference_pool import pool_batch_slot
+
+    return pool_batch_slot(values, lats, lons, variables)
+
+
+def slot_mock_cpu(df: pd.DataFrame, lat: float, lon: float) -> Tuple[pd.DataFrame, List[str]]:
+    return run_batch_slot_on_frame(batch_slot_mock_cpu, df, lat, lon)
+
+
+# stary rejestr (gorące importy) – nowe sloty dopisuj w ai/registry.py (SlotSpec, leniwe ładowanie)
 SLOTS: Dict[str, ModelSlot] = {
     "none": slot_none,
     "mock-graphcast": slot_mock_graphcast,
     "mock-downscaler": slot_mock_downscaler,
+    "mock-cpu": slot_mock_cpu,
+}
+
+# wersje wsadowe; slot bez wpisu tutaj idzie po bloku przez adapter (pętla po punktach)
+BATCH_SLOTS: Dict[str, BatchModelSlot] = {
+    "none": batch_slot_none,
+    "mock-graphcast": batch_slot_mock_graphcast,
+    "mock-downscaler": batch_slot_mock_downscaler,
+    "mock-cpu": batch_slot_mock_cpu,
 }
 
 
+def get_batch_slot(slot_name: str) -> Union[BatchModelSlot, None]:
+    slot = BATCH_SLOTS.get(slot_name)
+    if slot is not None:
+        return slot
+    frame_slot = SLOTS.get(slot_name)
+    return batch_from_frame_slot(frame_slot) if frame_slot is not None else None
+
+
+def apply_batch_slot(block: ForecastBlock, slot: BatchModelSlot) -> Tuple[ForecastBlock, List[str]]:
+    """Slot wsadowy na bloku: widok (punkty × czas × zmienne) na wejściu, nowy blok na wyjściu."""
+    if block.empty:
+        return block, []
+    values = np.moveaxis(block.values, 1, 2)
+    out, notes = slot(values, block.lats, block.lons, block.variables)
+    return block.with_values(np.ascontiguousarray(np.moveaxis(out, 2, 1), dtype=np.float32)), notes
+
+
 def apply_model_slot(
-    df: pd.DataFrame,
+    df: Union[pd.DataFrame, ForecastBlock],
     slot_name: str,
     lat: float,
     lon: float,
-) -> Tuple[pd.DataFrame, List[str]]:
+) -> Tuple[Union[pd.DataFrame, ForecastBlock], List[str]]:
     """
     Główny punkt wejścia dla warstwy AI-slotów.
-    Przyjmuje surowy dataframe prognozy i próbuje przepuścić go przez wybrany slot.
+    Przyjmuje surowy dataframe prognozy (albo ForecastBlock – wtedy lat/lon są
+    brane z bloku per punkt) i próbuje przepuścić go przez wybrany slot.
+    Sloty są ładowane leniwie z rejestru (ai/registry.py); SLOTS / BATCH_SLOTS
+    to już tylko fallback dla slotów dopisanych do słowników po staremu.
     Zawsze zwraca (df, notatki) – nawet dla nieznanego slotu.
     """
+    from ai.registry import SLOT_REGISTRY
+
+    if slot_name == "none":
+        return df, []
+
+    if SLOT_REGISTRY.get_spec(slot_name) is not None:
+        if isinstance(df, ForecastBlock):
+            return SLOT_REGISTRY.run_block(slot_name, df)
+        return SLOT_REGISTRY.run_frame(slot_name, _ensure_weather_columns(df), lat, lon)
+
+    if isinstance(df, ForecastBlock):
+        slot = get_batch_slot(slot_name)
+        if slot is None:
+            return df, [f"slot={slot_name}: nieznany slot modelu – dane bez zmian."]
+        return apply_batch_slot(df, slot)
+
     df = _ensure_weather_columns(df)
     slot = SLOTS.get(slot_name)
 
@@ -88,3 +275,46 @@ def apply_model_slot(
         return df, [f"slot={slot_name}: nieznany slot modelu – dane bez zmian."]
 
     return slot(df, lat, lon)
+
+
+def benchmark_batch_slots(
+    batch_sizes: Sequence[int] = (1, 8, 64, 512, 2048),
+    n_hours: int = 168,
+    slot_name: str = "mock-graphcast",
+    repeats: int = 3,
+) -> pd.DataFrame:
+    """
+    Latencja na punkt [µs] w zależności od rozmiaru paczki:
+    slot wsadowy vs ten sam slot puszczony przez adapter ramkowy (punkt po punkcie).
+    """
+    import time
+
+    rng = np.random.default_rng(0)
+    variables = ["temperature_c", "precip_mm"]
+    batch_slot = BATCH_SLOTS[slot_name]
+    looped = batch_from_frame_slot(SLOTS[slot_name])
+    rows = []
+    for size in batch_sizes:
+        values = np.stack(
+            [rng.normal(8, 5, (size, n_hours)), rng.gamma(0.3, 2.0, (size, n_hours))], axis=-1
+        ).astype(np.float32)
+        lats = rng.uniform(49, 55, size)
+        lons = rng.uniform(14, 24, size)
+        row = {"batch": size}
+        for label, slot in (("batch_us", batch_slot), ("per_frame_us", looped)):
+            # przy dużych paczkach pętla po ramkach jest wolna – jedno powtórzenie wystarczy
+            reps = repeats if label == "batch_us" or size <= 64 else 1
+            best = float("inf")
+            for _ in range(reps):
+                t0 = time.perf_counter()
+                slot(values, lats, lons, variables)
+                best = min(best, time.perf_counter() - t0)
+            row[label] = best / size * 1e6
+        rows.append(row)
+    table = pd.DataFrame(rows).set_index("batch")
+    table["speedup"] = table["per_frame_us"] / table["batch_us"]
+    return table
+
+
+if __name__ == "__main__":
+    print(benchmark_batch_slots().round(1).to_string())
@@ -0,0 +1,286 @@
+"""
+Deklaratywny pipeline prognozy: pobranie → slot → postprocessing → widok / tekst / audio.
+
+Każdy etap (`Stage`) deklaruje, od których etapów zależy (`inputs`) i których
+parametrów używa (`params`). Dzięki temu:
+- wynik etapu jest w cache pod odciskiem (parametry etapu + odciski wejść) –
+  odcisk liczy się z samych parametrów, bez liczenia etapów nadrzędnych,
+- etap liczy się dopiero, gdy ktoś poprosi o niego (albo o etap zależny) –
+  `pipeline.get("text")` przy wyłączonym `show_voice` po prostu nie pada,
+- zmiana parametru unieważnia tylko etapy, które go (pośrednio) używają:
+  przełączenie języka nie pobiera prognozy ani nie puszcza slotu ponownie,
+- `timings()` – per etap: ostatni status w tym przebiegu (computed / cached / skipped),
+  czas ostatniego liczenia, liczba trafień.
+
+Wynik None (np. nieudane pobranie, błąd TTS) nie trafia do cache – kolejne
+żądanie spróbuje ponownie.
+
+Pipeline trzymamy w st.session_state (`get_session_pipeline`), więc przeżywa reruny
+Streamlita w obrębie sesji.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, MutableMapping, Optional, Tuple
+import hashlib
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SESSION_KEY = "forecast_pipeline"
+
+
+@dataclass(frozen=True)
+class Stage:
+    """Etap: funkcja wołana z wynikami `inputs` i wartościami `params` jako argumentami nazwanymi."""
+    name: str
+    func: Callable[..., Any]
+    inputs: Tuple[str, ...] = ()
+    params: Tuple[str, ...] = ()
+    max_entries: int = 4
+
+
+@dataclass
+class StageStats:
+    computed: int = 0
+    hits: int = 0
+    last_ms: float = 0.0
+    total_ms: float = 0.0
+    status: str = "skipped"
+
+
+@dataclass
+class _StageCache:
+    entries: "OrderedDict[str, Any]" = field(default_factory=OrderedDict)
+
+
+class Pipeline:
+    def __init__(self, stages: Iterable[Stage], params: Optional[Dict[str, Any]] = None) -> None:
+        self._stages: Dict[str, Stage] = {}
+        for stage in stages:
+            if stage.name in self._stages:
+                raise ValueError(f"Etap {stage.name!r} zdefiniowany dwa razy")
+            self._stages[stage.name] = stage
+        self._check_graph()
+        self._params: Dict[str, Any] = dict(params or {})
+        self._cache: Dict[str, _StageCache] = {name: _StageCache() for name in self._stages}
+        self._stats: Dict[str, StageStats] = {name: StageStats() for name in self._stages}
+        self._fingerprints: Dict[str, str] = {}
+        self._lock = threading.RLock()
+
+    def _check_graph(self) -> None:
+        state: Dict[str, int] = {}  # 1 = w trakcie, 2 = gotowe
+
+        def visit(name: str, path: Tuple[str, ...]) -> None:
+            if name not in self._stages:
+                raise ValueError(f"Etap {path[-1]!r} zależy od nieznanego etapu {name!r}")
+            if state.get(name) == 2:
+                return
+            if state.get(name) == 1:
+                raise ValueError(f"Cykl w pipeline: {' → '.join(path + (name,))}")
+            state[name] = 1
+            for dep in self._stages[name].inputs:
+                visit(dep, path + (name,))
+            state[name] = 2
+
+        for name in self._stages:
+            visit(name, ())
+
+    # ---------------------------
+    # parametry
+    # ---------------------------
+
+    def update(self, **params: Any) -> None:
+        """Nowe wartości parametrów (typowo: stan widgetów z bieżącego rerunu)."""
+        with self._lock:
+            changed = {k for k, v in params.items() if k not in self._params or self._params[k] != v}
+            self._params.update(params)
+            if changed:
+                self._fingerprints.clear()
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        return dict(self._params)
+
+    def begin_run(self) -> None:
+        """Początek rerunu – statusy etapów wracają na „skipped”."""
+        for stats in self._stats.values():
+            stats.status = "skipped"
+
+    # ---------------------------
+    # liczenie
+    # ---------------------------
+
+    def fingerprint(self, name: str) -> str:
+        """Odcisk etapu: jego parametry + odciski wejść (bez liczenia czegokolwiek)."""
+        with self._lock:
+            fp = self._fingerprints.get(name)
+            if fp is not None:
+                return fp
+            stage = self._stages[name]
+            missing = [p for p in stage.params if p not in self._params]
+            if missing:
+                raise KeyError(f"Etap {name!r}: brak parametrów {missing}")
+            payload = json.dumps(
+                {
+                    "stage": name,
+                    "params": {p: self._params[p] for p in stage.params},
+                    "inputs": [self.fingerprint(dep) for dep in stage.inputs],
+                },
+                sort_keys=True,
+                default=repr,
+            )
+            fp = hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+            self._fingerprints[name] = fp
+            return fp
+
+    def get(self, name: str) -> Any:
+        """Wynik etapu – z cache albo liczony (razem z potrzebnymi etapami nadrzędnymi)."""
+        with self._lock:
+            stage = self._stages[name]
+            fp = self.fingerprint(name)
+            cache = self._cache[name].entries
+            stats = self._stats[name]
+            if fp in cache:
+                cache.move_to_end(fp)
+                stats.hits += 1
+                if stats.status == "skipped":
+                    stats.status = "cached"
+                return cache[fp]
+
+            kwargs = {dep: self.get(dep) for dep in stage.inputs}
+            kwargs.update({p: self._params[p] for p in stage.params})
+            t0 = time.perf_counter()
+            value = stage.func(**kwargs)
+            elapsed_ms = (time.perf_counter() - t0) * 1000.0
+
+            if value is not None:
+                cache[fp] = value
+                while len(cache) > max(1, stage.max_entries):
+                    cache.popitem(last=False)
+            stats.computed += 1
+            stats.last_ms = elapsed_ms
+            stats.total_ms += elapsed_ms
+            stats.status = "computed"
+            logger.debug("Etap %s policzony w %.1f ms", name, elapsed_ms)
+            return value
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """Czyści cache etapu (albo wszystkich) – np. „odśwież na siłę”."""
+        with self._lock:
+            for stage_name in [name] if name else list(self._cache):
+                self._cache[stage_name].entries.clear()
+
+    # ---------------------------
+    # diagnostyka
+    # ---------------------------
+
+    def stages(self) -> List[Stage]:
+        return list(self._stages.values())
+
+    def timings(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {
+                "status": s.status,
+                "last_ms": round(s.last_ms, 2),
+                "total_ms": round(s.total_ms, 2),
+                "computed": s.computed,
+                "hits": s.hits,
+            }
+            for name, s in self._stats.items()
+        }
+
+
+# ---------------------------
+# pipeline aplikacji
+# ---------------------------
+
+def _stage_cell(lat: float, lon: float, source: str) -> Any:
+    from weather.services import snap_to_grid
+
+    return snap_to_grid(lat, lon, source)
+
+
+def _default_fetch(lat: float, lon: float, timezone: str, days: int, source: str, model_run: str) -> Any:
+    from weather.services import get_hourly_dataframe_cached
+
+    # popyt dla prefetchu zlicza wołający (app.py) – tu już za cache etapu
+    return get_hourly_dataframe_cached(lat=lat, lon=lon, timezone=timezone, days=days, source=source, track=False)
+
+
+def _stage_slot(forecast: Any, slot_name: str, lat: float, lon: float) -> Tuple[Any, List[str]]:
+    from ai.memo import memoized_model_slot
+
+    if forecast is None or forecast.empty:
+        return forecast, []
+    return memoized_model_slot(forecast, slot_name=slot_name, lat=lat, lon=lon)
+
+
+def _stage_postprocess(slot: Tuple[Any, List[str]], use_ai: bool) -> Tuple[Any, List[str]]:
+    from ai.memo import memoized_corrections
+
+    df, model_notes = slot
+    if df is None or df.empty:
+        return df, list(model_notes)
+    if use_ai:
+        df_ai, ai_notes = memoized_corrections(df)
+    else:
+        df_ai, ai_notes = df, []
+    return df_ai, list(model_notes) + list(ai_notes)
+
+
+def _stage_view(postprocess: Tuple[Any, List[str]], cell: Any, timezone: str, days: int, model_run: str) -> Any:
+    from weather.variables import LazyForecast
+
+    # w cache etapu – leniwie dociągnięte kolumny zostają między rerunami
+    return LazyForecast(
+        cell.lat, cell.lon, timezone=timezone, days=days, base=postprocess[0], model_run=model_run
+    )
+
+
+def _stage_text(postprocess: Tuple[Any, List[str]], lang: str, city_name: Optional[str]) -> str:
+    from ai.text_forecast import build_text_forecast
+
+    return build_text_forecast(postprocess[0], lang=lang, city_name=city_name)
+
+
+def _stage_audio(text: str, lang: str) -> Optional[bytes]:
+    from ai.tts import synthesize_speech_to_bytes
+
+    return synthesize_speech_to_bytes(text, lang=lang) if text.strip() else None
+
+
+def build_forecast_pipeline(fetch: Optional[Callable[..., Any]] = None) -> Pipeline:
+    """
+    Etapy aplikacji. `fetch(lat, lon, timezone, days, source, model_run)` można podmienić
+    (app.py podaje wersję z st.cache_data).
+    """
+    fetch = fetch or _default_fetch
+
+    def _stage_forecast(cell: Any, timezone: str, days: int, source: str, model_run: str) -> Any:
+        return fetch(cell.lat, cell.lon, timezone, days, source, model_run)
+
+    return Pipeline([
+        Stage("cell", _stage_cell, params=("lat", "lon", "source")),
+        Stage("forecast", _stage_forecast, inputs=("cell",), params=("timezone", "days", "source", "model_run")),
+        Stage("slot", _stage_slot, inputs=("forecast",), params=("slot_name", "lat", "lon")),
+        Stage("postprocess", _stage_postprocess, inputs=("slot",), params=("use_ai",)),
+        Stage("view", _stage_view, inputs=("postprocess", "cell"), params=("timezone", "days", "model_run")),
+        Stage("text", _stage_text, inputs=("postprocess",), params=("lang", "city_name")),
+        Stage("audio", _stage_audio, inputs=("text",), params=("lang",), max_entries=2),
+    ])
+
+
+def get_session_pipeline(
+    session_state: MutableMapping[str, Any],
+    fetch: Optional[Callable[..., Any]] = None,
+) -> Pipeline:
+    """Pipeline sesji Streamlita (tworzony raz, potem z st.session_state)."""
+    pipeline = session_state.get(SESSION_KEY)
+    if not isinstance(pipeline, Pipeline):
+        pipeline = build_forecast_pipeline(fetch)
+        session_state[SESSION_KEY] = pipeline
+    return pipeline
@@ -1,24 +1,87 @@
 from __future__ import annotations
-from typing import List, Tuple, Optional, Dict, Any
+from typing import List, Tuple, Optional, Dict, Any, Union
+import numpy as np
 import pandas as pd
 
+from weather.block import ForecastBlock, rolling_mean
+
+# wersja logiki postprocessingu – zmień przy każdej zmianie wyniku (klucz memoizacji w ai/memo.py)
+POSTPROCESS_VERSION = "2"
+
+
+def _corrections_on_block(
+    block: ForecastBlock,
+    *,
+    max_precip_mm: float,
+    temp_smooth_window: int,
+    enable_precip_clip: bool,
+    enable_temp_smooth: bool,
+) -> Tuple[ForecastBlock, List[str]]:
+    """To samo co wersja pandasowa, ale naraz dla wszystkich punktów bloku (float32)."""
+    if block.empty:
+        return block, ["Brak danych – pominięto postprocessing."]
+
+    out = block.copy()
+    notes: List[str] = []
+
+    if enable_precip_clip and out.has("precip_mm"):
+        precip = out.var("precip_mm")
+        too_high = precip > max_precip_mm
+        n_high = int(too_high.sum())
+        if n_high:
+            original_max = float(precip[too_high].max())
+            np.minimum(precip, max_precip_mm, out=precip, where=np.isfinite(precip))
+            notes.append(
+                f"Przycięto {n_high} wartości opadu powyżej {max_precip_mm} mm "
+                f"w {int(too_high.any(axis=1).sum())} punktach (oryginalne maksimum: {original_max:.1f} mm)."
+            )
+
+    if enable_temp_smooth and out.has("temperature_c"):
+        temp = out.var("temperature_c")
+        # średnie odchylenie per punkt – odpowiednik std() z wersji pandasowej
+        before_std = float(np.nanmean(np.nanstd(temp, axis=1, ddof=1))) if temp.shape[1] > 1 else 0.0
+        temp[...] = rolling_mean(temp, temp_smooth_window, center=True)
+        after_std = float(np.nanmean(np.nanstd(temp, axis=1, ddof=1))) if temp.shape[1] > 1 else 0.0
+        if after_std < before_std:
+            notes.append(
+                f"Wygładzono temperaturę oknem {temp_smooth_window}h "
+                f"(średnie odchylenie spadło z {before_std:.2f} do {after_std:.2f})."
+            )
+        else:
+            notes.append("Wykonano wygładzanie temperatury, ale nie wykryto spadku zmienności.")
+
+    if not notes:
+        notes.append("Postprocessing AI nie wprowadził zmian (dane wyglądały OK).")
+
+    return out, notes
+
 
 def apply_basic_ai_corrections(
-    df: pd.DataFrame,
+    df: Union[pd.DataFrame, ForecastBlock],
     *,
     max_precip_mm: float = 80.0,
     temp_smooth_window: int = 3,
     enable_precip_clip: bool = True,
     enable_temp_smooth: bool = True,
-) -> Tuple[pd.DataFrame, List[str]]:
+) -> Tuple[Union[pd.DataFrame, ForecastBlock], List[str]]:
     """
     Bardzo lekki postprocessing AI:
     - przycina absurdalnie wysokie opady (np. błędy źródła),
     - wygładza ząbki temperatury ruchomym oknem,
     - zwraca listę notatek, które można pokazać w UI.
 
+    Przyjmuje też ForecastBlock – wtedy liczy wektorowo dla wszystkich punktów.
     Parametry są jawne, więc możesz je potem trzymać w configu/DB.
     """
+    if isinstance(df, ForecastBlock):
+        return _corrections_on_block(
+            df,
+            max_precip_mm=max_precip_mm,
+            temp_smooth_window=temp_smooth_window,
+            enable_precip_clip=enable_precip_clip,
+            enable_temp_smooth=enable_temp_smooth,
+        )
+
     df = df.copy()
     notes: List[str] = []
 
@@ -0,0 +1,326 @@
+"""
+Rejestr slotów AI z metadanymi i leniwym ładowaniem.
+
+Prawdziwe sloty to ciężkie importy (torch / jax) i wagi liczone w GB, więc:
+- slot jest opisany `SlotSpec` (wersja, szacowana zajętość pamięci, limit paczki,
+  wymagane zmienne) i wskazany ścieżką "moduł:obiekt" – moduł slotu importuje się
+  dopiero przy pierwszym użyciu albo jawnym `warm_up()`,
+- budżet pamięci (AI_SLOT_MEMORY_BUDGET_MB) dla slotów "model": po przekroczeniu
+  wyrzucamy najdawniej używane; liczy się zajętość zgłoszona przez instancję
+  (`memory_mb`), a przed załadowaniem – szacunek ze specyfikacji. Sloty "batch" /
+  "frame" to funkcje modułu – eviction nic by nie zwolniła, więc budżetu nie zajmują,
+- statystyki: czas ładowania, zimny start (ładowanie + pierwsze wywołanie)
+  vs średnia latencja „na ciepło”.
+
+Rodzaje celu (`kind`):
+- "batch" – funkcja slotu wsadowego (ai/model_slot.py: BatchModelSlot),
+- "frame" – stary slot ramkowy (opakowany adapterem),
+- "model" – fabryka modelu; instancja ma `predict(values, lats, lons, variables)`
+  (opcjonalnie `memory_mb`) i to ona trzyma wagi (zwalniane przy eviction).
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+import importlib
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from ai.model_slot import BatchModelSlot
+    from weather.block import ForecastBlock
+
+logger = logging.getLogger(__name__)
+
+SLOT_MEMORY_BUDGET_MB = float(os.getenv("AI_SLOT_MEMORY_BUDGET_MB", "2048"))
+
+
+@dataclass(frozen=True)
+class SlotSpec:
+    name: str
+    target: str
+    version: str = "1"
+    kind: str = "batch"
+    memory_mb: float = 0.0
+    max_batch_locations: int = 1024
+    required_variables: Tuple[str, ...] = ()
+    label: str = ""
+    description: str = ""
+
+    def display(self) -> str:
+        return f"{self.label or self.name} (v{self.version})"
+
+    @property
+    def budgeted(self) -> bool:
+        """Czy slot zajmuje budżet – funkcja modułu ("batch" / "frame") nic nie zwalnia przy eviction."""
+        return self.kind == "model"
+
+
+@dataclass
+class _SlotState:
+    slot: Optional["BatchModelSlot"] = None
+    loaded_at: float = 0.0
+    last_used: float = 0.0
+    load_s: float = 0.0
+    cold_ms: Optional[float] = None
+    warm_calls: int = 0
+    warm_total_ms: float = 0.0
+    loads: int = 0
+    evictions: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class SlotRegistry:
+    def __init__(self, *, memory_budget_mb: float = SLOT_MEMORY_BUDGET_MB) -> None:
+        self.memory_budget_mb = memory_budget_mb
+        self._specs: Dict[str, SlotSpec] = {}
+        self._state: Dict[str, _SlotState] = {}
+        self._lock = threading.Lock()
+
+    # ---------------------------
+    # metadane
+    # ---------------------------
+
+    def register(self, spec: SlotSpec) -> SlotSpec:
+        with self._lock:
+            old = self._specs.get(spec.name)
+            self._specs[spec.name] = spec
+            if old is None or old != spec:
+                self._state[spec.name] = _SlotState()
+        return spec
+
+    def get_spec(self, name: str) -> Optional[SlotSpec]:
+        return self._specs.get(name)
+
+    def specs(self) -> List[SlotSpec]:
+        return list(self._specs.values())
+
+    def names(self) -> List[str]:
+        return list(self._specs)
+
+    def version(self, name: str) -> str:
+        spec = self._specs.get(name)
+        return spec.version if spec is not None else "0"
+
+    def loaded(self) -> List[str]:
+        return [n for n, s in self._state.items() if s.slot is not None]
+
+    def memory_mb(self, name: str) -> float:
+        """Zajętość slotu liczona do budżetu: zgłoszona przez załadowany model albo szacunek ze spec."""
+        spec = self._specs[name]
+        if not spec.budgeted:
+            return 0.0
+        # `predict` załadowanej instancji – pytamy właściciela (wagi mogą dochodzić leniwie)
+        owner = getattr(self._state[name].slot, "__self__", None)
+        measured = getattr(owner, "memory_mb", None)
+        return float(measured) if measured is not None else spec.memory_mb
+
+    def loaded_memory_mb(self) -> float:
+        return sum(self.memory_mb(n) for n in self.loaded())
+
+    # ---------------------------
+    # ładowanie / eviction
+    # ---------------------------
+
+    @staticmethod
+    def _import(spec: SlotSpec) -> "BatchModelSlot":
+        module_name, _, attr = spec.target.partition(":")
+        obj = getattr(importlib.import_module(module_name), attr)
+        if spec.kind == "frame":
+            from ai.model_slot import batch_from_frame_slot
+
+            return batch_from_frame_slot(obj)
+        if spec.kind == "model":
+            return obj().predict
+        return obj
+
+    def load(self, name: str) -> Optional[BatchModelSlot]:
+        """Slot gotowy do wywołania (import + załadowanie przy pierwszym użyciu); None – nieznany / błąd."""
+        spec = self._specs.get(name)
+        if spec is None:
+            return None
+        state = self._state[name]
+        with state.lock:
+            if state.slot is None:
+                self._make_room(spec)
+                t0 = time.perf_counter()
+                try:
+                    state.slot = self._import(spec)
+                except Exception as exc:
+                    logger.error("Nie udało się załadować slotu %s (%s): %s", name, spec.target, exc)
+                    return None
+                state.load_s = time.perf_counter() - t0
+                state.loaded_at = time.monotonic()
+                state.loads += 1
+                state.cold_ms = None
+                logger.info("Slot %s załadowany w %.0f ms", name, state.load_s * 1000.0)
+            state.last_used = time.monotonic()
+            return state.slot
+
+    def warm_up(self, names: Optional[Sequence[str]] = None) -> Dict[str, float]:
+        """Ładuje sloty z wyprzedzeniem (np. przy starcie serwera); zwraca czasy ładowania [s]."""
+        out: Dict[str, float] = {}
+        for name in names if names is not None else self.names():
+            if self.load(name) is not None:
+                out[name] = self._state[name].load_s
+        return out
+
+    def evict(self, name: str) -> bool:
+        state = self._state.get(name)
+        if state is None or state.slot is None:
+            return False
+        state.slot = None
+        state.evictions += 1
+        logger.info("Slot %s wyrzucony z pamięci", name)
+        return True
+
+    def _make_room(self, spec: SlotSpec) -> None:
+        # LRU po ostatnim użyciu, aż nowy slot (wg szacunku ze spec) zmieści się w budżecie
+        if not spec.budgeted:
+            return
+        candidates = sorted(
+            (s.last_used, n)
+            for n, s in self._state.items()
+            if s.slot is not None and n != spec.name and self._specs[n].budgeted
+        )
+        used = self.loaded_memory_mb()
+        for _last, name in candidates:
+            if used + spec.memory_mb <= self.memory_budget_mb:
+                break
+            freed = self.memory_mb(name)
+            if self.evict(name):
+                used -= freed
+
+    # ---------------------------
+    # wywołanie
+    # ---------------------------
+
+    def run(
+        self,
+        name: str,
+        values: np.ndarray,
+        lats: np.ndarray,
+        lons: np.ndarray,
+        variables: Sequence[str],
+    ) -> Tuple[np.ndarray, List[str]]:
+        """
+        Slot na paczce (punkty × czas × zmienne). Paczki większe niż `max_batch_locations`
+        są dzielone; brak wymaganych zmiennych / błąd ładowania → dane bez zmian + notatka.
+        """
+        spec = self._specs.get(name)
+        if spec is None:
+            return values, [f"slot={name}: nieznany slot modelu – dane bez zmian."]
+        missing = [v for v in spec.required_variables if v not in variables]
+        if missing:
+            return values, [f"slot={name}: brak zmiennych {', '.join(missing)} – dane bez zmian."]
+        slot = self.load(name)
+        if slot is None:
+            return values, [f"slot={name}: nie udało się załadować modelu – dane bez zmian."]
+
+        state = self._state[name]
+        t0 = time.perf_counter()
+        step = max(1, spec.max_batch_locations)
+        if values.shape[0] <= step:
+            out, notes = slot(values, lats, lons, variables)
+        else:
+            parts: List[np.ndarray] = []
+            notes = []
+            for start in range(0, values.shape[0], step):
+                sl = slice(start, start + step)
+                part, part_notes = slot(values[sl], lats[sl], lons[sl], variables)
+                parts.append(part)
+                notes.extend(n for n in part_notes if n not in notes)
+            out = np.concatenate(parts, axis=0)
+        elapsed_ms = (time.perf_counter() - t0) * 1000.0
+        with state.lock:
+            if state.cold_ms is None:
+                state.cold_ms = state.load_s * 1000.0 + elapsed_ms
+            else:
+                state.warm_calls += 1
+                state.warm_total_ms += elapsed_ms
+            state.last_used = time.monotonic()
+        return out, notes
+
+    def run_frame(self, name: str, df: pd.DataFrame, lat: float, lon: float) -> Tuple[pd.DataFrame, List[str]]:
+        from ai.model_slot import run_batch_slot_on_frame
+
+        return run_batch_slot_on_frame(
+            lambda v, la, lo, names: self.run(name, v, la, lo, names), df, lat, lon
+        )
+
+    def run_block(self, name: str, block: "ForecastBlock") -> Tuple["ForecastBlock", List[str]]:
+        if block.empty:
+            return block, []
+        out, notes = self.run(name, np.moveaxis(block.values, 1, 2), block.lats, block.lons, block.variables)
+        return block.with_values(np.ascontiguousarray(np.moveaxis(out, 2, 1), dtype=np.float32)), notes
+
+    # ---------------------------
+    # statystyki
+    # ---------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        slots: Dict[str, Any] = {}
+        for name, spec in self._specs.items():
+            s = self._state[name]
+            slots[name] = {
+                "version": spec.version,
+                "loaded": s.slot is not None,
+                "budgeted": spec.budgeted,
+                "memory_mb": round(self.memory_mb(name), 3) if spec.budgeted else None,
+                "load_ms": round(s.load_s * 1000.0, 2),
+                "cold_start_ms": round(s.cold_ms, 2) if s.cold_ms is not None else None,
+                "warm_ms": round(s.warm_total_ms / s.warm_calls, 3) if s.warm_calls else None,
+                "warm_calls": s.warm_calls,
+                "loads": s.loads,
+                "evictions": s.evictions,
+            }
+        return {
+            "memory_budget_mb": self.memory_budget_mb,
+            "loaded_memory_mb": self.loaded_memory_mb(),
+            "slots": slots,
+        }
+
+
+SLOT_REGISTRY = SlotRegistry()
+
+# wbudowane sloty – kolejne (np. prawdziwy GraphCast) dopisuj tutaj albo przez SLOT_REGISTRY.register
+for _spec in (
+    SlotSpec(
+        "none", "ai.model_slot:batch_slot_none",
+        label="Brak (surowa prognoza)", description="Bez modelu – dane źródła bez zmian.",
+    ),
+    SlotSpec(
+        "mock-graphcast", "ai.model_slot:batch_slot_mock_graphcast", version="3",
+        max_batch_locations=4096,
+        label="Mock GraphCast", description="Makieta globalnego modelu: wygładzona temperatura, mniejszy opad.",
+    ),
+    SlotSpec(
+        "mock-downscaler", "ai.model_slot:batch_slot_mock_downscaler", version="3",
+        max_batch_locations=4096,
+        required_variables=("temperature_c",),
+        label="Mock downscaler", description="Makieta lokalnej korekty temperatury zależnej od położenia.",
+    ),
+    SlotSpec(
+        # instancja trzyma wagi do liczenia lokalnie – jedyny wbudowany slot w budżecie pamięci
+        "mock-cpu", "ai.inference_pool:PooledModelSlot", version="1", kind="model",
+        memory_mb=0.5, max_batch_locations=256,
+        label="Mock CPU net", description="Makieta sieci na CPU (pula procesów, gdy AI_INFERENCE_POOL=1).",
+    ),
+):
+    SLOT_REGISTRY.register(_spec)
+
+
+if __name__ == "__main__":
+    # zimny start vs na ciepło dla wbudowanych slotów
+    rng = np.random.default_rng(0)
+    values = np.stack([rng.normal(8, 5, (64, 168)), rng.gamma(0.3, 2.0, (64, 168))], axis=-1).astype(np.float32)
+    lats = rng.uniform(49, 55, 64)
+    lons = rng.uniform(14, 24, 64)
+    for name in SLOT_REGISTRY.names():
+        for _ in range(5):
+            SLOT_REGISTRY.run(name, values, lats, lons, ["temperature_c", "precip_mm"])
+    print(pd.DataFrame(SLOT_REGISTRY.stats()["slots"]).T.to_string())
@@ -3,6 +3,8 @@ from typing import Optional, List
 import pandas as pd
 from datetime import datetime
 
+from weather.aggregation import get_pyramid
+
 
 def _safe_val(row, col: str, default: float = 0.0) -> float:
     val = row.get(col)
@@ -28,14 +30,19 @@ def build_text_forecast(
     hours: int = 12,
 ) -> str:
     """
-    Buduje mówioną prognozę na najbliższe `hours` godzin.
+    Buduje mówioną prognozę na najbliższe `hours` godzin: podsumowanie doby
+    (min/max, suma opadu) + bloki 3-godzinne z piramidy agregatów.
     Zwraca tekst, który można od razu puścić do TTS.
     """
     if df.empty:
         return "Brak danych prognozy." if lang == "pl" else "No forecast data available."
 
-    # posortuj i przytnij
-    df_sort = df.sort_index().iloc[:hours].copy()
+    # agregaty 3h / dobowe – liczone raz na wersję prognozy (weather/aggregation.py)
+    pyramid = get_pyramid(df)
+    if pyramid is None:
+        return "Brak danych prognozy." if lang == "pl" else "No forecast data available."
+    horizon_end = pyramid.hourly.index[min(hours, len(pyramid.hourly)) - 1]
+    blocks = pyramid.three_hourly.loc[: horizon_end]
 
     now = datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")
     place = city_name or ("wybranej lokalizacji" if lang == "pl" else "the selected location")
@@ -47,28 +54,37 @@ def build_text_forecast(
     else:
         lines.append(f"Weather forecast for {place}, issued at {now}.")
 
-    # pogrupuj po dacie, żeby tekst był bardziej naturalny
-    df_sort["date"] = df_sort.index.date
-    for day, day_df in df_sort.groupby("date"):
-        day_name = day.strftime("%Y-%m-%d")
+    # po dniach (granice doby w czasie lokalnym), w środku bloki 3-godzinne
+    block_days = blocks.index.normalize()
+    for day_start, day in pyramid.daily.iterrows():
+        day_blocks = blocks[block_days == day_start]
+        if day_blocks.empty:
+            continue
+        day_name = day_start.strftime("%Y-%m-%d")
+        t_min = _safe_val(day, "temp_min")
+        t_max = _safe_val(day, "temp_max")
+        p_sum = _safe_val(day, "precip_sum")
         if lang == "pl":
-            lines.append(f"Dzień {day_name}:")
+            line = f"Dzień {day_name}: od {t_min:.0f} do {t_max:.0f} stopni Celsjusza"
+            line += f", suma opadu około {p_sum:.1f} milimetra." if p_sum >= 0.1 else ", bez opadów."
         else:
-            lines.append(f"On {day_name}:")
+            line = f"On {day_name}: from {t_min:.0f} to {t_max:.0f} degrees Celsius"
+            line += f", total precipitation around {p_sum:.1f} millimeters." if p_sum >= 0.1 else ", no precipitation."
+        lines.append(line)
 
-        for ts, row in day_df.iterrows():
-            temp = _safe_val(row, "temperature_c", default=0.0)
-            precip = _safe_val(row, "precip_mm", default=0.0)
+        for ts, row in day_blocks.iterrows():
+            temp = _safe_val(row, "temp_mean", default=0.0)
+            precip = _safe_val(row, "precip_sum", default=0.0)
             hour = _format_hour(ts, lang)
 
             if lang == "pl":
-                sentence = f"O {hour} około {temp:.1f} stopnia Celsjusza."
+                sentence = f"Od {hour} około {temp:.1f} stopnia Celsjusza."
                 if precip > 2.0:
                     sentence += f" Przewidywany opad około {precip:.1f} milimetra."
                 elif 0 < precip <= 2.0:
                     sentence += " Możliwy słaby opad."
             else:
-                sentence = f"At {hour}, about {temp:.1f} degrees Celsius."
+                sentence = f"From {hour}, about {temp:.1f} degrees Celsius."
                 if precip > 2.0:
                     sentence += f" Expected precipitation around {precip:.1f} millimeters."
                 elif 0 < precip <= 2.0:
@@ -26,7 +26,11 @@ from core.storage import init_storage_dir
 
 # === DOMAIN ===
 from ingestion.geocoding_client import search_locations, format_location_option
-from weather.services import get_hourly_dataframe, SUPPORTED_SOURCES
+from ingestion.reverse_geocoding import reverse_geocode
+from ingestion.prefetch import get_hot_key_tracker
+from weather.services import get_hourly_dataframe_cached, SUPPORTED_SOURCES
+from weather.variables import CATALOGUE, DEFAULT_VARIABLES
+from weather.forecast_cache import current_model_run
 
 # === UI ===
 from ui.layout import (
@@ -42,42 +46,48 @@ from ui.business import render_business_panel
 from ui.verification import render_verification_panel
 
 # === AI / POST ===
-from ai.postprocess import apply_basic_ai_corrections
-from ai.text_forecast import build_text_forecast
-from ai.tts import synthesize_speech_to_bytes
-from ai.model_slot import apply_model_slot
+from ai.pipeline import get_session_pipeline
+from ai.registry import SLOT_REGISTRY
 
 
 APP_VERSION = "v0.7+"
 DEFAULT_FORECAST_DAYS = 7
+# dalej niż tyle od najbliższej miejscowości nie podpisujemy punktu nazwą
+REVERSE_GEOCODE_MAX_KM = 30.0
 
 
 # ---------------------------
 # CACHING / HELPERS
 # ---------------------------
 
-@st.cache_data(show_spinner=False)
+@st.cache_data(show_spinner=False, max_entries=1024)
 def cached_forecast(
     lat: float,
     lon: float,
     timezone: str,
     days: int,
     source: str,
+    model_run: str,
 ) -> pd.DataFrame | None:
-    """Proste cachowanie prognozy – żeby przy zmianie UI nie walić co chwilę w API."""
-    return get_hourly_dataframe(
+    """
+    Dwa poziomy cache: w pamięci procesu (st.cache_data) + trwały na dysku.
+    `model_run` jest w kluczu, więc wpis w pamięci też „wygasa” z nowym przebiegiem modelu.
+    """
+    return get_hourly_dataframe_cached(
         lat=lat,
         lon=lon,
         timezone=timezone,
         days=days,
         source=source,
+        track=False,  # popyt liczy main() przed cache – tu trafia tylko pierwsze żądanie w procesie
     )
 
 
 def _select_location_from_search(city_query: str, lang: str) -> Tuple[str | None, float, float]:
     """
     Obsługuje scenariusz: user wpisał miasto → pobierz listę → pozwól wybrać.
-    Zwraca (name, lat, lon) albo (None, default_lat, default_lon) gdy brak wyników.
+    Zwraca (name, lat, lon); przy ręcznych współrzędnych nazwa pochodzi z lokalnego
+    reverse geocodingu albo jest None, gdy w pobliżu nie ma znanej miejscowości.
     """
     locations = []
     if city_query:
@@ -105,7 +115,9 @@ def _select_location_from_search(city_query: str, lang: str) -> Tuple[str | None
     # brak wyników – ręczne współrzędne
     st.info("Brak wyników lub jeszcze nie szukałeś – możesz podać współrzędne ręcznie.")
     lat, lon = render_coords_inputs(CONFIG.default_lat, CONFIG.default_lon, lang)
-    return None, lat, lon
+    # lokalny reverse geocoding (bez sieci) – żeby tekst/karta AI miały nazwę miejsca
+    nearest = reverse_geocode(lat, lon, language=lang, max_distance_km=REVERSE_GEOCODE_MAX_KM)
+    return (nearest["name"] if nearest else None), lat, lon
 
 
 # ---------------------------
@@ -146,12 +158,27 @@ def main() -> None:
     use_ai = st.sidebar.checkbox("AI postprocessing", value=True)
     show_voice = st.sidebar.checkbox("Pokaż tekst prognozy (TTS-ready)", value=True)
     enable_tts = st.sidebar.checkbox("🎧 Wygeneruj audio z prognozy", value=False)
+    extra_variables = st.sidebar.multiselect(
+        "Dodatkowe zmienne / Extra variables",
+        options=[name for name in CATALOGUE if name not in DEFAULT_VARIABLES],
+        default=[],
+        format_func=lambda name: CATALOGUE[name].label(lang),
+        help="Pobierane dopiero, gdy są potrzebne (wykres / alert).",
+    )
+    # lista slotów z rejestru (metadane – nic się tu nie importuje ani nie ładuje)
+    slot_specs = {spec.name: spec for spec in SLOT_REGISTRY.specs()}
     model_slot_name = st.sidebar.selectbox(
         "AI Model slot",
-        options=["none", "mock-graphcast", "mock-downscaler"],
+        options=list(slot_specs),
         index=0,
-        help="Slot na prawdziwy model (GraphCast / HF). Teraz makiety.",
+        format_func=lambda name: slot_specs[name].display(),
+        help="Slot na prawdziwy model (GraphCast / HF). Teraz makiety. Ładowany przy pierwszym użyciu.",
     )
+    model_spec = slot_specs[model_slot_name]
+    if model_spec.description:
+        # zajętość pamięci tylko dla slotów z własnymi wagami (kind="model") – szacunek ze spec
+        memory = f" (~{model_spec.memory_mb:g} MB)" if model_spec.budgeted and model_spec.memory_mb else ""
+        st.sidebar.caption(f"{model_spec.description}{memory}")
 
     # ============ HEADER + PANEL ============
     render_header(lang)
@@ -161,16 +188,39 @@ def main() -> None:
     city_query = render_location_search(lang)
     selected_city_name, selected_lat, selected_lon = _select_location_from_search(city_query, lang)
 
-    # ============ FETCH FORECAST ============
+    # ============ PIPELINE ============
+    # etapy (pobranie → slot → postprocessing → widok / tekst / audio) liczone leniwie
+    # i trzymane w sesji – zmiana np. show_voice albo języka nie pobiera prognozy
+    # ani nie puszcza slotu ponownie
     real_source = source if source in SUPPORTED_SOURCES else "open-meteo"
-    try:
-        df = cached_forecast(
-            lat=selected_lat,
-            lon=selected_lon,
-            timezone=CONFIG.default_timezone,
-            days=DEFAULT_FORECAST_DAYS,
-            source=real_source,
+    pipeline = get_session_pipeline(st.session_state, fetch=cached_forecast)
+    pipeline.begin_run()
+    pipeline.update(
+        lat=selected_lat,
+        lon=selected_lon,
+        source=real_source,
+        timezone=CONFIG.default_timezone,
+        days=DEFAULT_FORECAST_DAYS,
+        model_run=current_model_run(real_source).isoformat(),
+        slot_name=model_slot_name,
+        use_ai=use_ai,
+        lang=lang,
+        city_name=selected_city_name,
+    )
+
+    # ============ FETCH FORECAST ============
+    # cache i pobranie idą po komórce siatki modelu; selected_lat/lon zostają do wyświetlania
+    cell = pipeline.get("cell")
+    # popyt dla prefetchu: każde wejście sesji na klucz (nie każdy rerun po kliknięciu
+    # widgetu), liczone przed cache w pamięci, żeby nie zliczać tylko „pierwszy w procesie”
+    demand_key = pipeline.fingerprint("forecast")
+    if st.session_state.get("prefetch_demand_key") != demand_key:
+        st.session_state["prefetch_demand_key"] = demand_key
+        get_hot_key_tracker().record(
+            real_source, cell.lat, cell.lon, days=DEFAULT_FORECAST_DAYS, timezone=CONFIG.default_timezone
         )
+    try:
+        df = pipeline.get("forecast")
     except Exception as exc:
         log.exception("Błąd przy pobieraniu prognozy: %s", exc)
         df = None
@@ -179,38 +229,28 @@ def main() -> None:
         st.error(t("error_fetch", lang))
         st.stop()
 
-    # ============ AI MODEL SLOT ============
-    df_after_slot, model_notes = apply_model_slot(
-        df,
-        slot_name=model_slot_name,
-        lat=selected_lat,
-        lon=selected_lon,
-    )
-
-    # ============ AI POSTPROCESS ============
-    if use_ai:
-        df_ai, ai_notes = apply_basic_ai_corrections(df_after_slot)
-    else:
-        df_ai, ai_notes = df_after_slot, []
-
-    all_notes = list(model_notes) + list(ai_notes)
+    # ============ AI MODEL SLOT + POSTPROCESS ============
+    # notatki slotu i postprocessingu razem (etap "postprocess" dokleja swoje do slotu)
+    df_ai, all_notes = pipeline.get("postprocess")
 
     # ============ VISUALS ============
-    render_forecast_charts(df_ai, lang)
-    render_alerts(df_ai, lang=lang)
+    # dodatkowe zmienne (wiatr, wilgotność, ...) dociągane leniwie przy pierwszym odczycie
+    forecast_view = pipeline.get("view")
+    render_forecast_charts(forecast_view, lang, extra_variables=extra_variables)
+    render_alerts(forecast_view, lang=lang, extra_variables=extra_variables)
     render_ai_summary_card(df_ai, all_notes, lang=lang, city_name=selected_city_name)
 
     # ============ TTS / TEXT ============
     if show_voice:
         voice_title = t("voice.title", lang) or "Tekst prognozy"
         st.subheader("🗣️ " + voice_title)
-        forecast_text = build_text_forecast(df_ai, lang=lang, city_name=selected_city_name)
+        forecast_text = pipeline.get("text")
         st.text_area("Tekst do przeczytania", forecast_text, height=160)
 
         if enable_tts and forecast_text.strip():
             if check_feature_access(user, "tts"):
                 if st.button("🔊 Wygeneruj i odtwórz prognozę"):
-                    audio_bytes = synthesize_speech_to_bytes(forecast_text, lang=lang)
+                    audio_bytes = pipeline.get("audio")
                     if audio_bytes:
                         st.audio(audio_bytes, format="audio/mp3")
                     else:
@@ -231,8 +271,15 @@ def main() -> None:
     if dev_mode or check_feature_access(user, "verification"):
         render_verification_panel(df_ai)
 
+    if dev_mode:
+        with st.expander("🧠 Sloty AI – załadowane modele i latencje"):
+            st.json(SLOT_REGISTRY.stats())
+        with st.expander("⏱️ Pipeline – etapy w tym przebiegu"):
+            st.dataframe(pd.DataFrame(pipeline.timings()).T)
+
     # ============ FOOTER ============
     st.caption(f"{t('last_update', lang)} {df.index.max()}")
+    st.caption(f"Siatka modelu / model grid cell: {cell.lat:.4f}, {cell.lon:.4f}")
     st.markdown("---")
     st.caption(f"{APP_VERSION} • modular, cached, AI-slot-first")
 
@@ -0,0 +1,104 @@
+from __future__ import annotations
+from typing import Callable, Dict, List, Optional, Tuple
+import os
+import threading
+
+
+class DiskBudget:
+    """
+    Licznik zajętości katalogu z plikami cache + eviction LRU (po mtime).
+
+    - suma bajtów i liczba wpisów są trzymane w pamięci i aktualizowane przy
+      zapisie / usunięciu – `put()` nie przechodzi całego drzewa katalogów,
+    - stan jest budowany raz, leniwie (pierwsze użycie po starcie procesu),
+    - drzewo skanujemy dopiero, gdy suma przekroczy limit; skan przy okazji
+      koryguje liczniki (pliki dopisane / usunięte przez inne procesy).
+    """
+
+    def __init__(self, base_dir: str, max_bytes: int, *, suffix: str = ".npz") -> None:
+        self.base_dir = base_dir
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self._sizes: Optional[Dict[str, int]] = None
+        self._total = 0
+
+    def scan(self) -> List[Tuple[str, float, int]]:
+        """Pełny skan: (ścieżka, mtime, rozmiar) dla każdego wpisu."""
+        out: List[Tuple[str, float, int]] = []
+        if not os.path.isdir(self.base_dir):
+            return out
+        for root, _dirs, files in os.walk(self.base_dir):
+            for name in files:
+                if not name.endswith(self.suffix):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                out.append((path, st.st_mtime, st.st_size))
+        return out
+
+    def _rebuild(self, entries: List[Tuple[str, float, int]]) -> None:
+        self._sizes = {path: size for path, _mtime, size in entries}
+        self._total = sum(self._sizes.values())
+
+    def _ensure(self) -> Dict[str, int]:
+        if self._sizes is None:
+            self._rebuild(self.scan())
+        return self._sizes  # type: ignore[return-value]
+
+    def added(self, path: str) -> None:
+        """Plik zapisany (nowy albo nadpisany)."""
+        try:
+            size = os.stat(path).st_size
+        except OSError:
+            return
+        with self._lock:
+            sizes = self._ensure()
+            self._total += size - sizes.get(path, 0)
+            sizes[path] = size
+
+    def removed(self, path: str) -> None:
+        with self._lock:
+            if self._sizes is not None and path in self._sizes:
+                self._total -= self._sizes.pop(path)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._sizes = None
+            self._total = 0
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            self._ensure()
+            return self._total
+
+    @property
+    def entries(self) -> int:
+        with self._lock:
+            return len(self._ensure())
+
+    def enforce(self, remove: Callable[[str], None]) -> int:
+        """
+        Po przekroczeniu limitu: skan (mtime + korekta liczników) i usuwanie
+        najdawniej używanych wpisów przez `remove(path)`. Zwraca liczbę usuniętych.
+        """
+        with self._lock:
+            self._ensure()
+            if self._total <= self.max_bytes:
+                return 0
+            entries = self.scan()
+            self._rebuild(entries)
+            total = self._total
+        removed = 0
+        for path, _mtime, size in sorted(entries, key=lambda e: e[1]):
+            if total <= self.max_bytes:
+                break
+            remove(path)
+            self.removed(path)
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,101 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+import threading
+import time
+
+
+# znacznik braku wpisu – None też może być poprawną wartością w cache
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Ograniczony cache LRU z TTL, bezpieczny wątkowo.
+
+    - `maxsize` – po przekroczeniu wyrzucamy najdawniej używany wpis,
+    - `ttl` – ile sekund żyje zwykły wpis,
+    - `negative_ttl` – krótszy TTL dla „negatywnych” wyników (np. pusta lista
+      z geocodingu), żeby literówki nie waliły w API przy każdym rerunie,
+    - `stats()` – hit rate, trafienia negatywne, wygaśnięcia, eviction.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 3600.0,
+        *,
+        negative_ttl: Optional[float] = None,
+        name: str = "cache",
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.name = name
+        self._lock = threading.Lock()
+        # key -> (expires_at, negative, value)
+        self._data: "OrderedDict[Hashable, Tuple[float, bool, Any]]" = OrderedDict()
+        self._stats = {"hits": 0, "negative_hits": 0, "misses": 0, "expirations": 0, "evictions": 0, "sets": 0}
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return default
+            expires_at, negative, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            if negative:
+                self._stats["negative_hits"] += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, *, negative: bool = False, ttl: Optional[float] = None) -> None:
+        if ttl is None:
+            ttl = self.negative_ttl if negative else self.ttl
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            self._data[key] = (expires_at, negative, value)
+            self._data.move_to_end(key)
+            self._stats["sets"] += 1
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[2]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[0] > time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["size"] = len(self._data)
+        lookups = out["hits"] + out["misses"]
+        out["hit_ratio"] = out["hits"] / lookups if lookups else 0.0
+        out["maxsize"] = self.maxsize
+        return out
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            for k in self._stats:
+                self._stats[k] = 0
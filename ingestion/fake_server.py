@@ -0,0 +1,245 @@
+"""
+Lokalny fake-serwer Open-Meteo – do testów i benchmarków bez internetu.
+
+Użycie:
+    with FakeOpenMeteoServer(latency_ms=20) as srv:
+        with use_fake_open_meteo(srv):
+            df = get_hourly_dataframe(52.23, 21.01)
+
+Benchmark end-to-end (`get_hourly_dataframe` przez pulę vs nowe połączenie co wywołanie):
+    python -m ingestion.fake_server --calls 200 --latency-ms 5
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import parse_qs, urlparse
+import gzip
+import json
+import math
+import threading
+import time
+import zlib
+
+import ingestion.open_meteo_client as open_meteo_client
+from ingestion.http_session import reset_session
+
+
+def _synthetic_series(
+    var: str, lat: float, lon: float, n_hours: int, first_hour: int = 0
+) -> List[Optional[float]]:
+    """
+    Deterministyczne, „pogodopodobne” dane – zależą od zmiennej, punktu i godziny doby
+    (`first_hour` = godzina doby pierwszej wartości, żeby wycinki zgadzały się z pełną serią).
+    """
+    seed = (zlib.crc32(var.encode("utf-8")) % 97) / 97.0
+    out: List[Optional[float]] = []
+    for h in range(n_hours):
+        phase = 2 * math.pi * ((first_hour + h) % 24) / 24.0
+        if var == "precipitation":
+            val = max(0.0, 3.0 * math.sin(phase + lon / 10.0) - 1.5)
+        elif var == "temperature_2m":
+            val = 15.0 - abs(lat) / 5.0 + 6.0 * math.sin(phase - math.pi / 2)
+        else:
+            val = 50.0 + 40.0 * math.sin(phase + seed * 6.0)
+        out.append(round(val, 2))
+    return out
+
+
+def build_fake_forecast(
+    lat: float,
+    lon: float,
+    hourly: List[str],
+    forecast_days: int,
+    *,
+    start: Optional[datetime] = None,
+    n_hours: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Buduje odpowiedź w formacie Open-Meteo (jeden punkt).
+    `start` + `n_hours` – wycinek godzin (jak start_hour/end_hour w API).
+    """
+    n_hours = int(forecast_days) * 24 if n_hours is None else int(n_hours)
+    start = start or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    times = [(start + timedelta(hours=h)).strftime("%Y-%m-%dT%H:%M") for h in range(n_hours)]
+    payload: Dict[str, Any] = {
+        "latitude": lat,
+        "longitude": lon,
+        "generationtime_ms": 0.1,
+        "utc_offset_seconds": 0,
+        "timezone": "GMT",
+        "timezone_abbreviation": "GMT",
+        "hourly_units": {"time": "iso8601"},
+        "hourly": {"time": times},
+    }
+    for var in hourly:
+        payload["hourly"][var] = _synthetic_series(var, lat, lon, n_hours, start.hour)
+    return payload
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive – inaczej benchmark puli nie ma sensu
+    disable_nagle_algorithm = True  # bez tego keep-alive łapie 40 ms delayed-ACK
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        # cisza w konsoli – serwer jest tylko do testów
+        return
+
+    def do_GET(self) -> None:  # noqa: N802
+        server: "FakeOpenMeteoServer" = self.server.owner  # type: ignore[attr-defined]
+        server.request_count += 1
+        if server.latency_ms:
+            time.sleep(server.latency_ms / 1000.0)
+
+        parsed = urlparse(self.path)
+        qs = parse_qs(parsed.query)
+        try:
+            lats = [float(v) for v in qs["latitude"][0].split(",")]
+            lons = [float(v) for v in qs["longitude"][0].split(",")]
+        except (KeyError, ValueError):
+            self._send_json({"error": True, "reason": "latitude/longitude required"}, status=400)
+            return
+        if len(lats) != len(lons):
+            self._send_json({"error": True, "reason": "latitude/longitude length mismatch"}, status=400)
+            return
+
+        hourly = [h for h in (qs.get("hourly", [""])[0]).split(",") if h]
+        days = int(qs.get("forecast_days", ["7"])[0])
+        start: Optional[datetime] = None
+        n_hours: Optional[int] = None
+        if "start_hour" in qs and "end_hour" in qs:
+            try:
+                start = datetime.fromisoformat(qs["start_hour"][0])
+                end = datetime.fromisoformat(qs["end_hour"][0])
+            except ValueError:
+                self._send_json({"error": True, "reason": "invalid start_hour/end_hour"}, status=400)
+                return
+            n_hours = int((end - start).total_seconds() // 3600) + 1
+        payloads = [
+            build_fake_forecast(lat, lon, hourly, days, start=start, n_hours=n_hours)
+            for lat, lon in zip(lats, lons)
+        ]
+        # jak prawdziwe API: jeden punkt → obiekt, wiele punktów → lista
+        self._send_json(payloads[0] if len(payloads) == 1 else payloads)
+
+    def _send_json(self, payload: Any, status: int = 200) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        use_gzip = "gzip" in (self.headers.get("Accept-Encoding") or "")
+        if use_gzip:
+            body = gzip.compress(body)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeOpenMeteoServer:
+    """
+    Serwer HTTP w wątku tła udający endpoint /v1/forecast Open-Meteo.
+
+    - `latency_ms` – sztuczne opóźnienie odpowiedzi (symulacja sieci/upstreamu),
+    - `request_count` – ile zapytań faktycznie doszło do „upstreamu”.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, *, latency_ms: float = 0.0) -> None:
+        self.latency_ms = latency_ms
+        self.request_count = 0
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.owner = self  # type: ignore[attr-defined]
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1/forecast"
+
+    def start(self) -> "FakeOpenMeteoServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "FakeOpenMeteoServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+@contextmanager
+def use_fake_open_meteo(server: FakeOpenMeteoServer) -> Iterator[FakeOpenMeteoServer]:
+    """Na czas bloku przełącza klienta Open-Meteo na lokalny fake-serwer."""
+    previous = open_meteo_client.BASE_URL
+    open_meteo_client.BASE_URL = server.base_url
+    try:
+        yield server
+    finally:
+        open_meteo_client.BASE_URL = previous
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def benchmark_get_hourly_dataframe(calls: int = 100, latency_ms: float = 0.0) -> Dict[str, Dict[str, float]]:
+    """
+    Mierzy end-to-end latencję `get_hourly_dataframe` na fake-serwerze:
+    - "pooled" – domyślna ścieżka przez współdzieloną sesję,
+    - "no-pool" – dla porównania nowe połączenie przy każdym wywołaniu.
+
+    Uwaga: lokalnie nie ma TLS, więc różnica to tylko handshake TCP –
+    na prawdziwym HTTPS zysk z puli jest wielokrotnie większy.
+    """
+    from weather.services import get_hourly_dataframe
+
+    results: Dict[str, Dict[str, float]] = {}
+    with FakeOpenMeteoServer(latency_ms=latency_ms) as srv, use_fake_open_meteo(srv):
+        timings: List[float] = []
+        for i in range(calls):
+            t0 = time.perf_counter()
+            get_hourly_dataframe(52.0 + i * 1e-3, 21.0)
+            timings.append((time.perf_counter() - t0) * 1000.0)
+        results["pooled"] = {
+            "p50_ms": _percentile(timings, 0.5),
+            "p95_ms": _percentile(timings, 0.95),
+            "mean_ms": sum(timings) / len(timings),
+        }
+
+        timings = []
+        for i in range(calls):
+            t0 = time.perf_counter()
+            reset_session()
+            get_hourly_dataframe(52.0 + i * 1e-3, 21.0)
+            timings.append((time.perf_counter() - t0) * 1000.0)
+        results["no-pool"] = {
+            "p50_ms": _percentile(timings, 0.5),
+            "p95_ms": _percentile(timings, 0.95),
+            "mean_ms": sum(timings) / len(timings),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark klienta Open-Meteo na lokalnym fake-serwerze.")
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    for mode, stats in benchmark_get_hourly_dataframe(args.calls, args.latency_ms).items():
+        print(f"{mode:>8}: " + ", ".join(f"{k}={v:.2f}" for k, v in stats.items()))
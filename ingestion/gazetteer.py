@@ -0,0 +1,501 @@
+"""
+Lokalny gazetteer (GeoNames) do natychmiastowego autocomplete lokalizacji.
+
+- budowany z dumpu GeoNames (np. cities15000.txt) + opcjonalnie alternateNamesV2.txt
+  (nazwy per język, np. "Warszawa" dla pl) i countryInfo.txt (nazwy krajów),
+- trzymany w tablicach NumPy (blob bajtów + offsety, bez milionów obiektów Pythona),
+- indeks prefiksowy: posortowane znormalizowane klucze → bisect, O(log n),
+- indeks trigramowy (CSR) jako fallback na literówki / fragmenty nazw,
+- zapis/odczyt do jednego pliku .npz.
+
+Budowa i benchmark:
+    python -m ingestion.gazetteer build cities15000.txt --alternate-names alternateNamesV2.txt \
+        --country-info countryInfo.txt
+    python -m ingestion.gazetteer bench --query Warsz --lang pl
+"""
+from __future__ import annotations
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+import os
+import threading
+import unicodedata
+
+import numpy as np
+
+from core.storage import BASE_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.getenv("GAZETTEER_PATH", os.path.join(BASE_DIR, "gazetteer", "gazetteer.npz"))
+# języki UI (core.i18n) – dla nich trzymamy nazwy wyświetlane
+DEFAULT_LANGUAGES: Tuple[str, ...] = ("pl", "en")
+MIN_TRIGRAM_SCORE = 0.5
+
+# litery, których NFKD nie rozkłada na literę bazową + znak diakrytyczny
+_SPECIAL_FOLD = str.maketrans({"ł": "l", "đ": "d", "ø": "o", "ħ": "h", "ı": "i", "æ": "ae", "œ": "oe", "þ": "th"})
+
+
+def normalize_name(text: str) -> str:
+    """„Kraków” → „krakow”, „Łódź” → „lodz” – bez diakrytyków, casefold, pojedyncze spacje."""
+    folded = (text or "").casefold().translate(_SPECIAL_FOLD)
+    decomposed = unicodedata.normalize("NFKD", folded)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.replace("-", " ").split())
+
+
+def _trigrams(key: str) -> List[str]:
+    padded = f"  {key} "
+    return sorted({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+class _BlobStrings(Sequence[bytes]):
+    """Widok sekwencji na blob bajtów + offsety – pozwala na `bisect` bez listy stringów."""
+
+    __slots__ = ("_blob", "_offsets")
+
+    def __init__(self, blob: bytes, offsets: np.ndarray) -> None:
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: Any) -> Any:  # type: ignore[override]
+        return self._blob[int(self._offsets[i]):int(self._offsets[i + 1])]
+
+
+def _pack_strings(values: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8).copy()
+    return blob, offsets
+
+
+class Gazetteer:
+    """
+    Tablicowy gazetteer z indeksem prefiksowym i trigramowym.
+
+    Wyniki `search()` mają ten sam kształt co wyniki geocodingu Open-Meteo
+    (name, latitude, longitude, country_code, population, timezone…),
+    więc UI (`format_location_option`) nie widzi różnicy.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]) -> None:
+        self.ids = arrays["ids"]
+        self.lat = arrays["lat"]
+        self.lon = arrays["lon"]
+        self.population = arrays["population"]
+        self.country = arrays["country"]
+        self.feature_code = arrays["feature_code"]
+        self.languages: Tuple[str, ...] = tuple(str(x) for x in arrays["languages"])
+        self.lang_name_idx = arrays["lang_name_idx"]  # (n_lang, n_places), -1 = brak
+        self._arrays = arrays
+
+        self._names_blob = arrays["names_blob"].tobytes()
+        self._names_offsets = arrays["names_offsets"]
+        self._tz_blob = arrays["tz_blob"].tobytes()
+        self._tz_offsets = arrays["tz_offsets"]
+        self._keys = _BlobStrings(arrays["keys_blob"].tobytes(), arrays["keys_offsets"])
+        self._key_place = arrays["key_place"]
+        self._tri = _BlobStrings(arrays["tri_blob"].tobytes(), arrays["tri_offsets"])
+        self._tri_postings_offsets = arrays["tri_postings_offsets"]
+        self._tri_postings = arrays["tri_postings"]
+        # nazwy krajów: wiersz 0 – domyślna (countryInfo), dalej per język; starsze pliki ich nie mają
+        country_codes = arrays.get("country_codes", np.empty(0, dtype="U2"))
+        self._country_row = {str(code): i for i, code in enumerate(country_codes)}
+        self._country_names = arrays.get("country_names", np.empty((1, 0), dtype="U1"))
+
+    def __len__(self) -> int:
+        return int(len(self.ids))
+
+    # ---------------------------
+    # budowa
+    # ---------------------------
+
+    @classmethod
+    def from_records(
+        cls,
+        records: Iterable[Dict[str, Any]],
+        *,
+        languages: Sequence[str] = DEFAULT_LANGUAGES,
+        countries: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> "Gazetteer":
+        """
+        Buduje indeks z rekordów:
+            {"id", "name", "latitude", "longitude", "country_code", "population",
+             "feature_code", "timezone", "alternate_names": [...],
+             "lang_names": {"pl": "Warszawa", ...}}
+
+        `countries`: kod ISO → {"name": "Poland", "lang_names": {"pl": "Polska", ...}}.
+        """
+        languages = tuple(languages)
+        ids: List[int] = []
+        lat: List[float] = []
+        lon: List[float] = []
+        pop: List[int] = []
+        country: List[str] = []
+        fcode: List[str] = []
+        tz: List[str] = []
+        names: List[str] = []
+        extra_names: List[str] = []
+        lang_idx: List[List[int]] = [[] for _ in languages]
+        key_pairs: Dict[Tuple[str, int], None] = {}
+        tri_map: Dict[str, List[int]] = {}
+
+        for place, rec in enumerate(records):
+            name = str(rec.get("name") or "")
+            ids.append(int(rec.get("id") or 0))
+            lat.append(float(rec["latitude"]))
+            lon.append(float(rec["longitude"]))
+            pop.append(int(rec.get("population") or 0))
+            country.append(str(rec.get("country_code") or ""))
+            fcode.append(str(rec.get("feature_code") or ""))
+            tz.append(str(rec.get("timezone") or ""))
+            names.append(name)
+
+            lang_names = rec.get("lang_names") or {}
+            for li, lang in enumerate(languages):
+                ln = lang_names.get(lang)
+                if ln:
+                    lang_idx[li].append(len(extra_names))
+                    extra_names.append(str(ln))
+                else:
+                    lang_idx[li].append(-1)
+
+            variants = [name] + list(rec.get("alternate_names") or []) + list(lang_names.values())
+            for variant in variants:
+                key = normalize_name(variant)
+                if key:
+                    key_pairs[(key, place)] = None
+
+            # trigramy tylko z nazw głównych + językowych – indeks zostaje mały
+            for variant in [name] + list(lang_names.values()):
+                for tri in _trigrams(normalize_name(variant)):
+                    postings = tri_map.setdefault(tri, [])
+                    if not postings or postings[-1] != place:
+                        postings.append(place)
+
+        sorted_keys = sorted(key_pairs, key=lambda kp: (kp[0].encode("utf-8"), kp[1]))
+        keys_blob, keys_offsets = _pack_strings(k for k, _ in sorted_keys)
+        # nazwy główne pod indeksem = numer miejsca, nazwy językowe doklejone za nimi
+        names_blob, names_offsets = _pack_strings(names + extra_names)
+        lang_arr = np.asarray(lang_idx, dtype=np.int32).reshape(len(languages), len(ids))
+        lang_arr[lang_arr >= 0] += len(names)
+        tz_blob, tz_offsets = _pack_strings(tz)
+
+        tri_sorted = sorted(tri_map, key=lambda t: t.encode("utf-8"))
+        tri_blob, tri_offsets = _pack_strings(tri_sorted)
+        post_offsets = np.zeros(len(tri_sorted) + 1, dtype=np.int64)
+        if tri_sorted:
+            post_offsets[1:] = np.cumsum([len(tri_map[t]) for t in tri_sorted])
+        postings = np.fromiter(
+            (p for t in tri_sorted for p in tri_map[t]), dtype=np.int32, count=int(post_offsets[-1])
+        )
+
+        country_codes = sorted(countries or {})
+        country_names = [
+            [str((countries or {})[code].get("name") or code) for code in country_codes]
+        ] + [
+            [str(((countries or {})[code].get("lang_names") or {}).get(lang) or "") for code in country_codes]
+            for lang in languages
+        ]
+
+        arrays = {
+            "ids": np.asarray(ids, dtype=np.int64),
+            "lat": np.asarray(lat, dtype=np.float32),
+            "lon": np.asarray(lon, dtype=np.float32),
+            "population": np.asarray(pop, dtype=np.int64),
+            "country": np.asarray(country, dtype="U2"),
+            "feature_code": np.asarray(fcode, dtype="U10"),
+            "languages": np.asarray(languages, dtype="U8"),
+            "lang_name_idx": lang_arr,
+            "names_blob": names_blob,
+            "names_offsets": names_offsets,
+            "tz_blob": tz_blob,
+            "tz_offsets": tz_offsets,
+            "keys_blob": keys_blob,
+            "keys_offsets": keys_offsets,
+            "key_place": np.asarray([p for _, p in sorted_keys], dtype=np.int32),
+            "tri_blob": tri_blob,
+            "tri_offsets": tri_offsets,
+            "tri_postings_offsets": post_offsets,
+            "tri_postings": postings,
+            "country_codes": np.asarray(country_codes, dtype="U2"),
+            "country_names": np.asarray(country_names, dtype=str).reshape(1 + len(languages), len(country_codes)),
+        }
+        return cls(arrays)
+
+    @classmethod
+    def from_geonames(
+        cls,
+        path: str,
+        *,
+        alternate_names_path: Optional[str] = None,
+        country_info_path: Optional[str] = None,
+        languages: Sequence[str] = DEFAULT_LANGUAGES,
+        min_population: int = 0,
+    ) -> "Gazetteer":
+        """
+        Czyta dump GeoNames (TSV, 19 kolumn) i opcjonalnie alternateNamesV2.txt
+        (nazwy per język – bierzemy nazwy preferowane, a w drugiej kolejności dowolne)
+        oraz countryInfo.txt (nazwy krajów; ich nazwy per język też z alternateNamesV2.txt).
+        """
+        records: List[Dict[str, Any]] = []
+        by_id: Dict[int, Dict[str, Any]] = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                cols = line.rstrip("\n").split("\t")
+                if len(cols) < 19:
+                    continue
+                population = int(cols[14] or 0)
+                if population < min_population:
+                    continue
+                rec = {
+                    "id": int(cols[0]),
+                    "name": cols[1],
+                    "alternate_names": [cols[2]] + [a for a in cols[3].split(",") if a],
+                    "latitude": float(cols[4]),
+                    "longitude": float(cols[5]),
+                    "feature_code": cols[7],
+                    "country_code": cols[8],
+                    "population": population,
+                    "timezone": cols[17],
+                    "lang_names": {},
+                }
+                records.append(rec)
+                by_id[rec["id"]] = rec
+
+        countries: Dict[str, Dict[str, Any]] = {}
+        if country_info_path:
+            with open(country_info_path, encoding="utf-8") as f:
+                for line in f:
+                    if line.startswith("#"):
+                        continue
+                    cols = line.rstrip("\n").split("\t")
+                    if len(cols) < 17 or not cols[0]:
+                        continue
+                    country = {"name": cols[4], "lang_names": {}}
+                    countries[cols[0]] = country
+                    if cols[16].isdigit():
+                        by_id.setdefault(int(cols[16]), country)
+
+        if alternate_names_path:
+            wanted = set(languages)
+            with open(alternate_names_path, encoding="utf-8") as f:
+                for line in f:
+                    cols = line.rstrip("\n").split("\t")
+                    if len(cols) < 5 or cols[2] not in wanted:
+                        continue
+                    rec = by_id.get(int(cols[1]))
+                    if rec is None:
+                        continue
+                    preferred = cols[4] == "1"
+                    if preferred or cols[2] not in rec["lang_names"]:
+                        rec["lang_names"][cols[2]] = cols[3]
+
+        return cls.from_records(records, languages=languages, countries=countries)
+
+    # ---------------------------
+    # zapis / odczyt
+    # ---------------------------
+
+    def save(self, path: str = DEFAULT_PATH) -> str:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **self._arrays)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_PATH) -> "Gazetteer":
+        with np.load(path, allow_pickle=False) as npz:
+            arrays = {k: npz[k] for k in npz.files}
+        return cls(arrays)
+
+    # ---------------------------
+    # wyszukiwanie
+    # ---------------------------
+
+    def _string(self, blob: bytes, offsets: np.ndarray, i: int) -> str:
+        return blob[int(offsets[i]):int(offsets[i + 1])].decode("utf-8")
+
+    def display_name(self, place: int, language: str) -> str:
+        if language in self.languages:
+            idx = int(self.lang_name_idx[self.languages.index(language), place])
+            if idx >= 0:
+                return self._string(self._names_blob, self._names_offsets, idx)
+        return self._string(self._names_blob, self._names_offsets, place)
+
+    def country_name(self, code: str, language: str = "pl") -> str:
+        """Nazwa kraju w danym języku → domyślna (countryInfo) → sam kod ISO."""
+        row = self._country_row.get(code)
+        if row is None:
+            return code
+        if language in self.languages:
+            name = str(self._country_names[1 + self.languages.index(language), row])
+            if name:
+                return name
+        return str(self._country_names[0, row]) or code
+
+    def to_result(self, place: int, language: str = "pl") -> Dict[str, Any]:
+        country = str(self.country[place])
+        return {
+            "id": int(self.ids[place]),
+            "name": self.display_name(place, language),
+            "latitude": float(self.lat[place]),
+            "longitude": float(self.lon[place]),
+            "country_code": country,
+            "country": self.country_name(country, language),
+            "population": int(self.population[place]),
+            "feature_code": str(self.feature_code[place]),
+            "timezone": self._string(self._tz_blob, self._tz_offsets, place),
+            "source": "gazetteer",
+        }
+
+    def _top_by_population(self, places: np.ndarray, count: int) -> np.ndarray:
+        places = np.unique(places)
+        if len(places) > count:
+            pops = self.population[places]
+            part = np.argpartition(-pops, count - 1)[:count]
+            places = places[part]
+        order = np.argsort(-self.population[places], kind="stable")
+        return places[order]
+
+    def prefix_places(self, query: str, count: int = 5) -> np.ndarray:
+        key = normalize_name(query).encode("utf-8")
+        if not key:
+            return np.empty(0, dtype=np.int32)
+        lo = bisect_left(self._keys, key)
+        hi = bisect_left(self._keys, key + b"\xff", lo)
+        if lo >= hi:
+            return np.empty(0, dtype=np.int32)
+        places = self._key_place[lo:hi]
+        # dokładne trafienia nazwy mają pierwszeństwo przed samymi prefiksami
+        exact_hi = bisect_left(self._keys, key + b"\x00", lo, hi)
+        exact = self._key_place[lo:exact_hi]
+        top_exact = self._top_by_population(exact, count) if len(exact) else exact
+        if len(top_exact) >= count:
+            return top_exact
+        rest = self._top_by_population(places, count)
+        rest = rest[~np.isin(rest, top_exact)]
+        return np.concatenate([top_exact, rest])[:count]
+
+    def trigram_places(self, query: str, count: int = 5, min_score: float = MIN_TRIGRAM_SCORE) -> np.ndarray:
+        return self._trigram_scored(query, count, min_score)[0]
+
+    def _trigram_scored(self, query: str, count: int, min_score: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Miejsca + ich wynik (odsetek trigramów zapytania, które mają wspólne)."""
+        empty = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64))
+        tris = _trigrams(normalize_name(query))
+        if not tris:
+            return empty
+        chunks = []
+        for tri in tris:
+            b = tri.encode("utf-8")
+            i = bisect_left(self._tri, b)
+            if i < len(self._tri) and self._tri[i] == b:
+                chunks.append(self._tri_postings[self._tri_postings_offsets[i]:self._tri_postings_offsets[i + 1]])
+        if not chunks:
+            return empty
+        hits = np.bincount(np.concatenate(chunks), minlength=0)
+        candidates = np.flatnonzero(hits >= max(1, int(np.ceil(min_score * len(tris)))))
+        if len(candidates) == 0:
+            return empty
+        # najpierw liczba wspólnych trigramów, potem populacja
+        order = np.lexsort((-self.population[candidates], -hits[candidates]))[:count]
+        return candidates[order].astype(np.int32), hits[candidates[order]] / len(tris)
+
+    def search(self, query: str, *, count: int = 5, language: str = "pl", fuzzy: bool = True) -> List[Dict[str, Any]]:
+        """Prefiks (z rankingiem po populacji), a gdy pusto – trigramy."""
+        return self.search_scored(query, count=count, language=language, fuzzy=fuzzy)[0]
+
+    def search_scored(
+        self, query: str, *, count: int = 5, language: str = "pl", fuzzy: bool = True
+    ) -> Tuple[List[Dict[str, Any]], float]:
+        """
+        Jak `search()`, plus pewność dopasowania: 1.0 dla trafień prefiksowych
+        (w tym dokładnych), dla samych trigramów – najlepszy wynik trigramowy (0..1).
+        """
+        places = self.prefix_places(query, count)
+        score = 1.0 if len(places) else 0.0
+        if len(places) == 0 and fuzzy:
+            places, scores = self._trigram_scored(query, count, MIN_TRIGRAM_SCORE)
+            score = float(scores.max()) if len(scores) else 0.0
+        return [self.to_result(int(p), language) for p in places], score
+
+
+_default: Optional[Gazetteer] = None
+_default_loaded = False
+_default_lock = threading.Lock()
+
+
+def get_default_gazetteer() -> Optional[Gazetteer]:
+    """
+    Leniwie ładuje gazetteer z GAZETTEER_PATH (albo BASE_DIR/gazetteer/gazetteer.npz).
+    Brak pliku → None i geocoding idzie po staremu do API.
+    """
+    global _default, _default_loaded
+    if not _default_loaded:
+        with _default_lock:
+            if not _default_loaded:
+                if os.path.exists(DEFAULT_PATH):
+                    try:
+                        _default = Gazetteer.load(DEFAULT_PATH)
+                        logger.info("Załadowano gazetteer: %d miejsc z %s", len(_default), DEFAULT_PATH)
+                    except Exception as exc:
+                        logger.warning("Nie udało się wczytać gazetteera %s: %s", DEFAULT_PATH, exc)
+                else:
+                    logger.info("Brak lokalnego gazetteera (%s) – geocoding tylko przez API.", DEFAULT_PATH)
+                _default_loaded = True
+    return _default
+
+
+def set_default_gazetteer(gazetteer: Optional[Gazetteer]) -> None:
+    """Podmienia współdzielony gazetteer (np. po przebudowie albo w testach)."""
+    global _default, _default_loaded
+    with _default_lock:
+        _default = gazetteer
+        _default_loaded = True
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Budowa / benchmark lokalnego gazetteera.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_build = sub.add_parser("build")
+    p_build.add_argument("geonames")
+    p_build.add_argument("--alternate-names")
+    p_build.add_argument("--country-info", help="countryInfo.txt (nazwy krajów); domyślnie obok dumpu, jeśli jest")
+    p_build.add_argument("--min-population", type=int, default=0)
+    p_build.add_argument("--out", default=DEFAULT_PATH)
+    p_bench = sub.add_parser("bench")
+    p_bench.add_argument("--path", default=DEFAULT_PATH)
+    p_bench.add_argument("--query", default="Warsz")
+    p_bench.add_argument("--lang", default="pl")
+    p_bench.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        t0 = time.perf_counter()
+        country_info = args.country_info or os.path.join(os.path.dirname(args.geonames), "countryInfo.txt")
+        gaz = Gazetteer.from_geonames(
+            args.geonames,
+            alternate_names_path=args.alternate_names,
+            country_info_path=country_info if os.path.exists(country_info) else None,
+            min_population=args.min_population,
+        )
+        out = gaz.save(args.out)
+        print(f"{len(gaz)} miejsc → {out} ({os.path.getsize(out) / 1e6:.1f} MB, {time.perf_counter() - t0:.1f} s)")
+    else:
+        gaz = Gazetteer.load(args.path)
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            res = gaz.search(args.query, language=args.lang)
+        per_ms = (time.perf_counter() - t0) * 1000.0 / args.repeat
+        print(f"{args.query!r} [{args.lang}]: {per_ms:.3f} ms/zapytanie → {[r['name'] for r in res]}")
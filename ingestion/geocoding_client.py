@@ -1,12 +1,34 @@
 from __future__ import annotations
 from typing import List, Dict, Any, Optional
 import logging
+import os
 import requests
 
+from core.ttl_cache import MISSING, TTLCache
+from ingestion.gazetteer import get_default_gazetteer
+from ingestion.http_session import timed_get
+from ingestion.singleflight import GEOCODING_FLIGHTS
+
 logger = logging.getLogger(__name__)
 
 BASE_URL = "https://geocoding-api.open-meteo.com/v1/search"
 
+# memoizacja wyników – Streamlit odpala skrypt przy każdej interakcji z widżetem
+GEOCODING_CACHE = TTLCache(
+    maxsize=int(os.getenv("GEOCODING_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("GEOCODING_CACHE_TTL_S", "86400")),
+    # puste wyniki (literówki, śmieci) pamiętamy krótko – żeby nie walić w API, ale i nie utrwalać
+    negative_ttl=float(os.getenv("GEOCODING_NEGATIVE_TTL_S", "300")),
+    name="geocoding",
+)
+# lokalne trafienia z samych trigramów (bez prefiksu / dokładnej nazwy) poniżej tego
+# wyniku traktujemy jako niepewne – pytamy API, a lokalne zostają tylko na zapas
+LOCAL_FUZZY_MIN_SCORE = float(os.getenv("GEOCODING_LOCAL_FUZZY_MIN_SCORE", "0.8"))
+
+
+def _cache_key(name: str, count: int, language: str, use_local: bool) -> tuple:
+    return (" ".join(name.casefold().split()), int(count), language, use_local)
+
 
 def search_locations(
     name: str,
@@ -15,19 +37,39 @@ def search_locations(
     language: str = "pl",
     session: Optional[requests.Session] = None,
     timeout: int = 10,
+    use_local: bool = True,
 ) -> List[Dict[str, Any]]:
     """
-    Szuka lokalizacji po nazwie w geocodingu Open-Meteo.
+    Szuka lokalizacji po nazwie – najpierw w lokalnym gazetteerze
+    (ingestion/gazetteer.py, < 1 ms), a gdy ten nie ma trafienia prefiksowego
+    ani mocnego trigramowego (LOCAL_FUZZY_MIN_SCORE) albo go nie ma – w geocodingu
+    Open-Meteo. Słabe lokalne trafienia wracają tylko wtedy, gdy API nic nie da.
 
     Zwraca listę dictów, albo pustą listę, jeśli nic nie znaleziono
     albo był problem z siecią.
 
     Uwaga: specjalnie NIE rzucamy wyjątku – UI ma działać dalej.
+    Wyniki są w cache LRU+TTL (GEOCODING_CACHE, puste wyniki krócej),
+    a równoczesne identyczne zapytania idą do API tylko raz (single-flight).
+    Błędy sieci NIE są cache'owane.
     """
     name = (name or "").strip()
     if not name:
         return []
 
+    key = _cache_key(name, count, language, use_local)
+    cached = GEOCODING_CACHE.get(key)
+    if cached is not MISSING:
+        return list(cached)
+
+    gazetteer = get_default_gazetteer() if use_local else None
+    local: List[Dict[str, Any]] = []
+    if gazetteer is not None:
+        local, score = gazetteer.search_scored(name, count=count, language=language)
+        if local and score >= LOCAL_FUZZY_MIN_SCORE:
+            GEOCODING_CACHE.set(key, local)
+            return list(local)
+
     params = {
         "name": name,
         "count": count,
@@ -35,22 +77,46 @@ def search_locations(
         "format": "json",
     }
 
-    sess = session or requests
+    # każdy wołający dostaje własną listę – wynik lidera jest współdzielony
+    results = GEOCODING_FLIGHTS.do(key, _search_remote, params, session, timeout)
+    if results is None:
+        # błąd sieci – słabe lokalne trafienia są lepsze niż nic (bez cache)
+        return list(local)
+    if not results and local:
+        # API nic nie zna – oddajemy słabe lokalne zgadywanie, ale pamiętamy je krótko
+        # (jak wynik pusty), żeby nie przesłaniało API na pełne TTL
+        GEOCODING_CACHE.set(key, local, negative=True)
+        return list(local)
+    GEOCODING_CACHE.set(key, results, negative=not results)
+    return list(results)
+
+
+def _search_remote(
+    params: Dict[str, Any],
+    session: Optional[requests.Session],
+    timeout: int,
+) -> Optional[List[Dict[str, Any]]]:
+    """Zapytanie do API; None = błąd sieci/odpowiedzi (nie cache'ujemy), [] = brak wyników."""
+    name = params["name"]
     try:
-        resp = sess.get(BASE_URL, params=params, timeout=timeout)
-        resp.raise_for_status()
+        resp = timed_get(BASE_URL, params=params, timeout=timeout, session=session, name="geocoding")
         data = resp.json()
     except Exception as exc:
         logger.warning("Geocoding failed for %r: %s", name, exc)
-        return []
+        return None
 
     results = data.get("results") or []
     # upewniamy się, że to lista dictów
     if not isinstance(results, list):
-        return []
+        return None
     return results
 
 
+def get_geocoding_cache_stats() -> Dict[str, Any]:
+    """Hit rate cache geocodingu (łącznie z trafieniami negatywnymi)."""
+    return GEOCODING_CACHE.stats()
+
+
 def get_first_location(
     name: str,
     *,
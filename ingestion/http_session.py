@@ -0,0 +1,141 @@
+from __future__ import annotations
+from typing import Dict, Optional
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# parametry puli – można nadpisać w .env, jeśli serwer obsługuje dużo sesji Streamlita
+POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "32"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.3"))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+DEFAULT_HEADERS = {
+    "Accept": "application/json",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+    "User-Agent": "ai-weather-platform/0.7",
+}
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, float]] = {}
+
+
+def _build_session() -> requests.Session:
+    retry = Retry(
+        total=MAX_RETRIES,
+        connect=MAX_RETRIES,
+        read=MAX_RETRIES,
+        status=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=retry,
+    )
+    sess = requests.Session()
+    sess.headers.update(DEFAULT_HEADERS)
+    sess.mount("https://", adapter)
+    sess.mount("http://", adapter)
+    return sess
+
+
+def get_session() -> requests.Session:
+    """
+    Zwraca współdzieloną (modułową) sesję HTTP.
+
+    - keep-alive + pula połączeń → brak nowego handshake TCP/TLS przy każdym wywołaniu,
+    - ograniczone retry z backoffem na 429/5xx i błędy połączenia,
+    - gzip w nagłówkach (requests sam rozpakowuje odpowiedź).
+
+    Sesja jest tworzona leniwie i współdzielona przez wszystkie wątki Streamlita.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def reset_session() -> None:
+    """Zamyka pulę połączeń (np. w testach albo po zmianie konfiguracji)."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def timed_get(
+    url: str,
+    *,
+    params: Optional[dict] = None,
+    timeout: float = 10,
+    session: Optional[requests.Session] = None,
+    name: str = "http",
+) -> requests.Response:
+    """
+    GET przez pulę z pomiarem czasu wywołania.
+
+    Czas (ms) ląduje w statystykach pod kluczem `name` – patrz `get_call_stats()`.
+    Wyjątki z requests lecą dalej, klient decyduje, co z nimi zrobić.
+    """
+    sess = session or get_session()
+    start = time.perf_counter()
+    ok = False
+    try:
+        resp = sess.get(url, params=params, timeout=timeout)
+        resp.raise_for_status()
+        ok = True
+        return resp
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        _record_call(name, elapsed_ms, ok)
+        logger.debug("%s GET %s took %.1f ms (ok=%s)", name, url, elapsed_ms, ok)
+
+
+def _record_call(name: str, elapsed_ms: float, ok: bool) -> None:
+    with _stats_lock:
+        st = _stats.setdefault(
+            name,
+            {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0},
+        )
+        st["calls"] += 1
+        if not ok:
+            st["errors"] += 1
+        st["total_ms"] += elapsed_ms
+        st["last_ms"] = elapsed_ms
+        st["max_ms"] = max(st["max_ms"], elapsed_ms)
+
+
+def get_call_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Zwraca kopię statystyk wywołań HTTP (per nazwa klienta), z policzoną średnią.
+    """
+    with _stats_lock:
+        out = {k: dict(v) for k, v in _stats.items()}
+    for st in out.values():
+        st["avg_ms"] = st["total_ms"] / st["calls"] if st["calls"] else 0.0
+    return out
+
+
+def reset_call_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
@@ -1,99 +1,220 @@
 from __future__ import annotations
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 import logging
+import os
+
 import requests
 
+from ingestion.http_session import timed_get
+from ingestion.singleflight import FORECAST_FLIGHTS
+
 logger = logging.getLogger(__name__)
 
-BASE_URL = "https://geocoding-api.open-meteo.com/v1/search"
+# można przestawić na lokalny fake-serwer (patrz ingestion/fake_server.py) albo własne proxy
+BASE_URL = os.getenv("OPEN_METEO_BASE_URL", "https://api.open-meteo.com/v1/forecast")
+
+DEFAULT_HOURLY = ("temperature_2m", "precipitation")
+
+# limity dla zapytań wielopunktowych (współrzędne po przecinku w jednym URL-u)
+MAX_LOCATIONS_PER_REQUEST = int(os.getenv("OPEN_METEO_MAX_LOCATIONS", "100"))
+MAX_URL_CHARS = int(os.getenv("OPEN_METEO_MAX_URL_CHARS", "8000"))
+# ~ liczba wartości (punkty × godziny × zmienne) w jednej odpowiedzi – żeby JSON nie puchł
+MAX_VALUES_PER_REQUEST = int(os.getenv("OPEN_METEO_MAX_VALUES", "2000000"))
 
 
-def search_locations(
-    name: str,
+def _coord_str(value: float) -> str:
+    return f"{float(value):.4f}"
+
+
+def fetch_hourly_forecast(
+    lat: float,
+    lon: float,
     *,
-    count: int = 5,
-    language: str = "pl",
+    timezone: str = "auto",
+    forecast_days: int = 7,
+    hourly: Iterable[str] = DEFAULT_HOURLY,
     session: Optional[requests.Session] = None,
-    timeout: int = 10,
-) -> List[Dict[str, Any]]:
+    timeout: float = 10,
+    base_url: Optional[str] = None,
+    start_hour: Optional[str] = None,
+    end_hour: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
     """
-    Szuka lokalizacji po nazwie w geocodingu Open-Meteo.
+    Pobiera godzinową prognozę z Open-Meteo dla jednego punktu.
+
+    `start_hour` / `end_hour` (czas lokalny, "YYYY-MM-DDTHH:MM", oba włącznie)
+    zawężają odpowiedź do wycinka godzin – zamiast `forecast_days`. Używa tego
+    przyrostowe odświeżanie w weather/services.py.
 
-    Zwraca listę dictów, albo pustą listę, jeśli nic nie znaleziono
-    albo był problem z siecią.
+    Idzie przez współdzieloną pulę połączeń (keep-alive, retry z backoffem, gzip),
+    więc kolejne wywołania nie płacą za nowy handshake TCP/TLS.
 
+    Równoczesne identyczne zapytania (ten sam URL, punkt i parametry) są sklejane
+    w jedno wywołanie upstreamu – patrz `ingestion.singleflight`.
+
+    Zwraca surowy JSON (dict) albo None, jeśli był problem z siecią / odpowiedzią.
     Uwaga: specjalnie NIE rzucamy wyjątku – UI ma działać dalej.
     """
-    name = (name or "").strip()
-    if not name:
-        return []
-
     params = {
-        "name": name,
-        "count": count,
-        "language": language,
-        "format": "json",
+        "latitude": _coord_str(lat),
+        "longitude": _coord_str(lon),
+        "hourly": ",".join(hourly),
+        "timezone": timezone,
     }
+    params.update(_window_params(forecast_days, start_hour, end_hour))
+
+    url = base_url or BASE_URL
+    key = (url,) + tuple(sorted((k, str(v)) for k, v in params.items()))
+    return FORECAST_FLIGHTS.do(key, _fetch_single, url, params, timeout, session, lat, lon)
+
 
-    sess = session or requests
+def _window_params(forecast_days: int, start_hour: Optional[str], end_hour: Optional[str]) -> Dict[str, Any]:
+    """Zakres godzin: albo wycinek start_hour..end_hour, albo cały horyzont forecast_days."""
+    if start_hour and end_hour:
+        return {"start_hour": start_hour, "end_hour": end_hour}
+    return {"forecast_days": int(forecast_days)}
+
+
+def _fetch_single(
+    url: str,
+    params: Dict[str, Any],
+    timeout: float,
+    session: Optional[requests.Session],
+    lat: float,
+    lon: float,
+) -> Optional[Dict[str, Any]]:
     try:
-        resp = sess.get(BASE_URL, params=params, timeout=timeout)
-        resp.raise_for_status()
+        resp = timed_get(url, params=params, timeout=timeout, session=session, name="open-meteo")
         data = resp.json()
     except Exception as exc:
-        logger.warning("Geocoding failed for %r: %s", name, exc)
-        return []
+        logger.warning("Open-Meteo forecast failed for lat=%s lon=%s: %s", lat, lon, exc)
+        return None
 
-    results = data.get("results") or []
-    # upewniamy się, że to lista dictów
-    if not isinstance(results, list):
-        return []
-    return results
+    if not isinstance(data, dict):
+        logger.warning("Open-Meteo zwrócił nieoczekiwany format: %r", type(data))
+        return None
+    if data.get("error"):
+        logger.warning("Open-Meteo error: %s", data.get("reason"))
+        return None
+    return data
 
 
-def get_first_location(
-    name: str,
-    *,
-    language: str = "pl",
-    session: Optional[requests.Session] = None,
-    timeout: int = 10,
-) -> Optional[Dict[str, Any]]:
-    """
-    Szybki helper: zwróć tylko pierwszy wynik albo None.
-    Przydatny na backendzie.
-    """
-    results = search_locations(
-        name,
-        count=1,
-        language=language,
-        session=session,
-        timeout=timeout,
-    )
-    return results[0] if results else None
+def _window_hours(start_hour: Optional[str], end_hour: Optional[str], *, default: int) -> int:
+    try:
+        span = datetime.fromisoformat(str(end_hour)) - datetime.fromisoformat(str(start_hour))
+    except ValueError:
+        return default
+    return max(1, int(span.total_seconds() // 3600) + 1)
 
 
-def format_location_option(loc: Dict[str, Any]) -> str:
+def chunk_locations(
+    coords: Sequence[Tuple[float, float]],
+    *,
+    values_per_location: int,
+    max_locations: int = MAX_LOCATIONS_PER_REQUEST,
+    max_url_chars: int = MAX_URL_CHARS,
+    max_values: int = MAX_VALUES_PER_REQUEST,
+    base_url_len: int = 200,
+) -> List[Tuple[int, int]]:
     """
-    Buduje ładną etykietę do selecta w UI.
-
-    Przykład:
-    "Warsaw, Masovian Voivodeship, Poland (52.23, 21.01)"
+    Dzieli listę punktów na paczki (start, stop) tak, żeby każde zapytanie
+    mieściło się w limicie punktów, długości URL-a i rozmiaru odpowiedzi.
+    `base_url_len` to zapas na host + pozostałe parametry.
+    """
+    per_values = max(1, max_values // max(1, values_per_location))
+    limit = max(1, min(max_locations, per_values))
+
+    chunks: List[Tuple[int, int]] = []
+    start = 0
+    url_len = base_url_len
+    for i, (lat, lon) in enumerate(coords):
+        # +6 na przecinki (lat i lon w osobnych parametrach, "," → "%2C" w URL-u)
+        add = len(_coord_str(lat)) + len(_coord_str(lon)) + 6
+        if i > start and (i - start >= limit or url_len + add > max_url_chars):
+            chunks.append((start, i))
+            start = i
+            url_len = base_url_len
+        url_len += add
+    if start < len(coords):
+        chunks.append((start, len(coords)))
+    return chunks
+
+
+def fetch_hourly_forecast_multi(
+    coords: Sequence[Tuple[float, float]],
+    *,
+    timezone: str = "auto",
+    forecast_days: int = 7,
+    hourly: Iterable[str] = DEFAULT_HOURLY,
+    session: Optional[requests.Session] = None,
+    timeout: float = 30,
+    base_url: Optional[str] = None,
+    max_locations: int = MAX_LOCATIONS_PER_REQUEST,
+    max_workers: int = 4,
+    start_hour: Optional[str] = None,
+    end_hour: Optional[str] = None,
+) -> List[Optional[Dict[str, Any]]]:
     """
-    name = loc.get("name") or "Unknown"
-    country = loc.get("country") or ""
-    admin1 = loc.get("admin1") or ""
+    Pobiera prognozę dla wielu punktów naraz – Open-Meteo przyjmuje
+    współrzędne po przecinku i zwraca listę obiektów w tej samej kolejności.
 
-    parts = [name]
-    if admin1:
-        parts.append(admin1)
-    if country:
-        parts.append(country)
+    Punkty są dzielone na paczki (limit punktów / URL-a / rozmiaru odpowiedzi),
+    a paczki lecą równolegle przez wspólną pulę połączeń.
+    `start_hour` / `end_hour` – jak w `fetch_hourly_forecast` (wspólne dla wszystkich punktów).
 
-    lat = loc.get("latitude")
-    lon = loc.get("longitude")
+    Zwraca listę wyników wyrównaną do `coords` – None tam, gdzie paczka się nie udała.
+    """
+    hourly = tuple(hourly)
+    coords = [(float(lat), float(lon)) for lat, lon in coords]
+    results: List[Optional[Dict[str, Any]]] = [None] * len(coords)
+    if not coords:
+        return results
+
+    url = base_url or BASE_URL
+    window = _window_params(forecast_days, start_hour, end_hour)
+    n_hours = int(forecast_days) * 24
+    if "start_hour" in window:
+        n_hours = _window_hours(start_hour, end_hour, default=n_hours)
+    chunks = chunk_locations(
+        coords,
+        values_per_location=n_hours * max(1, len(hourly)),
+        max_locations=max_locations,
+        base_url_len=len(url) + 120 + len(",".join(hourly)),
+    )
 
-    label = ", ".join(parts)
+    def _fetch_chunk(bounds: Tuple[int, int]) -> None:
+        start, stop = bounds
+        part = coords[start:stop]
+        params = {
+            "latitude": ",".join(_coord_str(lat) for lat, _ in part),
+            "longitude": ",".join(_coord_str(lon) for _, lon in part),
+            "hourly": ",".join(hourly),
+            "timezone": timezone,
+            **window,
+        }
+        try:
+            resp = timed_get(url, params=params, timeout=timeout, session=session, name="open-meteo")
+            data = resp.json()
+        except Exception as exc:
+            logger.warning("Open-Meteo multi forecast failed for %d points: %s", len(part), exc)
+            return
+
+        # jeden punkt → API zwraca obiekt, wiele → listę
+        items = data if isinstance(data, list) else [data]
+        if len(items) != len(part):
+            logger.warning("Open-Meteo zwrócił %d wyników dla %d punktów", len(items), len(part))
+            return
+        for offset, item in enumerate(items):
+            if isinstance(item, dict) and not item.get("error"):
+                results[start + offset] = item
+
+    if len(chunks) == 1 or max_workers <= 1:
+        for bounds in chunks:
+            _fetch_chunk(bounds)
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+            list(pool.map(_fetch_chunk, chunks))
 
-    if lat is not None and lon is not None:
-        return f"{label} ({float(lat):.2f}, {float(lon):.2f})"
-    return label
+    return results
@@ -0,0 +1,380 @@
+"""
+Prefetch: podgrzewanie cache dla najpopularniejszych lokalizacji po każdym przebiegu modelu.
+
+- `HotKeyTracker` – liczy zapytania per (źródło, komórka siatki, dni, strefa) z wygaszaniem
+  wykładniczym; procesy aplikacji okresowo zrzucają liczniki do pliku w BASE_DIR,
+  więc osobny proces schedulera widzi ruch ze wszystkich serwerów,
+- `PrefetchScheduler` – gdy pojawi się nowy przebieg modelu, odświeża top-N kluczy
+  z ograniczoną współbieżnością i budżetem zapytań/s (token bucket),
+- status + metryki (`status()`), tryb dry-run na lokalnym fake-serwerze.
+
+Uruchomienie:
+    python -m ingestion.prefetch              # pętla co --interval sekund
+    python -m ingestion.prefetch --once --dry-run
+"""
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+try:  # blokada pliku między procesami (POSIX); na Windows scalanie bez blokady
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+from core.storage import BASE_DIR
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_DIR = os.path.join(BASE_DIR, "prefetch")
+HOT_KEYS_PATH = os.getenv("PREFETCH_HOT_KEYS_PATH", os.path.join(PREFETCH_DIR, "hot_keys.json"))
+# po ilu godzinach popularność klucza spada o połowę
+HALF_LIFE_HOURS = float(os.getenv("PREFETCH_HALF_LIFE_HOURS", "24"))
+FLUSH_INTERVAL_S = float(os.getenv("PREFETCH_FLUSH_INTERVAL_S", "30"))
+
+
+@dataclass(frozen=True)
+class HotKey:
+    source: str
+    lat: float
+    lon: float
+    days: int
+    timezone: str
+
+    def as_str(self) -> str:
+        return f"{self.source}|{self.lat:.6f}|{self.lon:.6f}|{self.days}|{self.timezone}"
+
+    @classmethod
+    def from_str(cls, raw: str) -> "HotKey":
+        source, lat, lon, days, tz = raw.split("|", 4)
+        return cls(source, float(lat), float(lon), int(days), tz)
+
+
+def _decay(score: float, age_s: float) -> float:
+    return score * math.pow(0.5, age_s / (HALF_LIFE_HOURS * 3600.0))
+
+
+class HotKeyTracker:
+    """
+    Liczniki popularności kluczy. `record()` jest tanie (tylko pamięć),
+    `flush()` scala przyrosty z plikiem (read-modify-write + atomowy replace)
+    pod blokadą `flock` na pliku `.lock` obok – kilka procesów serwera
+    nie nadpisuje sobie nawzajem przyrostów.
+
+    Popyt liczy warstwa aplikacji (app.py), przed cache w pamięci – tu trafia
+    każde wejście użytkownika na klucz, a nie tylko pobranie z dysku / sieci.
+    """
+
+    def __init__(self, path: str = HOT_KEYS_PATH, *, flush_interval_s: float = FLUSH_INTERVAL_S) -> None:
+        self.path = path
+        self.flush_interval_s = flush_interval_s
+        self._lock = threading.Lock()
+        self._pending: Dict[str, float] = {}
+        self._last_flush = time.time()
+
+    def record(self, source: str, lat: float, lon: float, *, days: int, timezone: str) -> None:
+        key = HotKey((source or "").lower(), float(lat), float(lon), int(days), timezone or "").as_str()
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0.0) + 1.0
+            due = time.time() - self._last_flush >= self.flush_interval_s
+        if due:
+            self.flush()
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"updated_at": time.time(), "scores": {}}
+
+    def _locked(self) -> Any:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        f = open(f"{self.path}.lock", "a+")
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return f
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.time()
+        if not pending:
+            return
+        try:
+            lock_file = self._locked()
+        except OSError as exc:
+            logger.warning("Nie udało się zablokować hot keys %s: %s", self.path, exc)
+            self._restore(pending)
+            return
+        try:
+            state = self._load()
+            now = time.time()
+            age = max(0.0, now - float(state.get("updated_at", now)))
+            scores = {k: _decay(float(v), age) for k, v in state.get("scores", {}).items()}
+            for k, v in pending.items():
+                scores[k] = scores.get(k, 0.0) + v
+            # wyrzucamy klucze, które praktycznie wygasły
+            scores = {k: v for k, v in scores.items() if v >= 0.01}
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"updated_at": now, "scores": scores}, f)
+            os.replace(tmp_path, self.path)
+        except Exception as exc:
+            logger.warning("Nie udało się zapisać hot keys %s: %s", self.path, exc)
+            self._restore(pending)
+        finally:
+            lock_file.close()  # zamknięcie zwalnia flock
+
+    def _restore(self, pending: Dict[str, float]) -> None:
+        # nieudany zapis – przyrosty wracają do kolejnego flush()
+        with self._lock:
+            for k, v in pending.items():
+                self._pending[k] = self._pending.get(k, 0.0) + v
+
+    def top(self, n: int, source: Optional[str] = None) -> List[Tuple[HotKey, float]]:
+        """Top-N kluczy (z uwzględnieniem jeszcze niezapisanych przyrostów)."""
+        state = self._load()
+        age = max(0.0, time.time() - float(state.get("updated_at", time.time())))
+        scores = {k: _decay(float(v), age) for k, v in state.get("scores", {}).items()}
+        with self._lock:
+            for k, v in self._pending.items():
+                scores[k] = scores.get(k, 0.0) + v
+        items = []
+        for raw, score in scores.items():
+            try:
+                key = HotKey.from_str(raw)
+            except ValueError:
+                continue
+            if source is None or key.source == source:
+                items.append((key, score))
+        items.sort(key=lambda kv: kv[1], reverse=True)
+        return items[:n]
+
+
+_tracker: Optional[HotKeyTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_hot_key_tracker() -> HotKeyTracker:
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = HotKeyTracker()
+    return _tracker
+
+
+class TokenBucket:
+    """Budżet zapytań: średnio `rate` na sekundę, chwilowo do `burst`."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waits = 0
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+                self.waits += 1
+            time.sleep(wait)
+
+
+FetchFn = Callable[[HotKey], bool]
+
+
+def _default_fetch(key: HotKey) -> bool:
+    # import lokalny – warstwa weather importuje ingestion, nie odwrotnie
+    from weather.services import get_hourly_dataframe_cached
+
+    df = get_hourly_dataframe_cached(
+        key.lat, key.lon, timezone=key.timezone, days=key.days, source=key.source, track=False
+    )
+    return df is not None
+
+
+class PrefetchScheduler:
+    """
+    Po publikacji nowego przebiegu modelu odświeża najpopularniejsze klucze,
+    zanim przyjdą po nie użytkownicy.
+
+    `fetch_fn(key) -> bool` – domyślnie przechodzi przez cache dyskowy
+    (`get_hourly_dataframe_cached`), więc wynik ląduje tam, gdzie czyta aplikacja.
+    """
+
+    def __init__(
+        self,
+        *,
+        tracker: Optional[HotKeyTracker] = None,
+        fetch_fn: Optional[FetchFn] = None,
+        top_n: int = 200,
+        max_workers: int = 4,
+        rate_per_s: float = 5.0,
+        sources: Optional[List[str]] = None,
+    ) -> None:
+        self.tracker = tracker or get_hot_key_tracker()
+        self.fetch_fn = fetch_fn or _default_fetch
+        self.top_n = top_n
+        self.max_workers = max_workers
+        self.bucket = TokenBucket(rate_per_s)
+        self.sources = sources or ["open-meteo"]
+        self._last_run: Dict[str, datetime] = {}
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Any] = {
+            "cycles": 0,
+            "refreshed": 0,
+            "failed": 0,
+            "last_cycle_s": 0.0,
+            "last_cycle_keys": 0,
+            "last_cycle_at": None,
+            "in_progress": False,
+        }
+
+    def _refresh(self, key: HotKey) -> bool:
+        self.bucket.acquire()
+        try:
+            ok = bool(self.fetch_fn(key))
+        except Exception as exc:
+            logger.warning("Prefetch %s nie powiódł się: %s", key.as_str(), exc)
+            ok = False
+        with self._lock:
+            self._metrics["refreshed" if ok else "failed"] += 1
+        return ok
+
+    def run_once(self, now: Optional[datetime] = None, *, force: bool = False) -> Dict[str, int]:
+        """
+        Jeden obieg: dla każdego źródła z nowym przebiegiem modelu odśwież top-N kluczy.
+        Zwraca {źródło: liczba odświeżonych kluczy}.
+        """
+        from weather.forecast_cache import current_model_run
+
+        self.tracker.flush()
+        done: Dict[str, int] = {}
+        for source in self.sources:
+            run = current_model_run(source, now)
+            if not force and self._last_run.get(source) == run:
+                continue
+            keys = [k for k, _ in self.tracker.top(self.top_n, source=source)]
+            if not keys:
+                self._last_run[source] = run
+                continue
+
+            with self._lock:
+                self._metrics["in_progress"] = True
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                results = list(pool.map(self._refresh, keys))
+            elapsed = time.perf_counter() - t0
+
+            self._last_run[source] = run
+            done[source] = sum(results)
+            with self._lock:
+                self._metrics.update(
+                    in_progress=False,
+                    last_cycle_s=elapsed,
+                    last_cycle_keys=len(keys),
+                    last_cycle_at=datetime.utcnow().isoformat(),
+                )
+                self._metrics["cycles"] += 1
+            logger.info(
+                "Prefetch %s run=%s: %d/%d kluczy w %.1f s",
+                source, run.isoformat(), done[source], len(keys), elapsed,
+            )
+        return done
+
+    def run_forever(self, stop: threading.Event, interval_s: float = 60.0) -> None:
+        while not stop.is_set():
+            try:
+                self.run_once()
+            except Exception as exc:
+                logger.exception("Prefetch cycle failed: %s", exc)
+            stop.wait(interval_s)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._metrics)
+        out["last_model_run"] = {s: r.isoformat() for s, r in self._last_run.items()}
+        out["rate_limited_waits"] = self.bucket.waits
+        out["top_n"] = self.top_n
+        out["max_workers"] = self.max_workers
+        out["rate_per_s"] = self.bucket.rate
+        return out
+
+
+def dry_run(*, keys: int = 20, top_n: int = 10, rate_per_s: float = 50.0) -> Dict[str, Any]:
+    """
+    Pełny obieg na lokalnym fake-serwerze i tymczasowych plikach – nic nie idzie do
+    prawdziwego API ani do produkcyjnego cache/hot keys.
+    """
+    import tempfile
+
+    from ingestion.fake_server import FakeOpenMeteoServer, use_fake_open_meteo
+    from weather.forecast_cache import ForecastDiskCache
+
+    with tempfile.TemporaryDirectory() as tmp, FakeOpenMeteoServer(latency_ms=5) as srv, use_fake_open_meteo(srv):
+        tracker = HotKeyTracker(os.path.join(tmp, "hot_keys.json"), flush_interval_s=3600)
+        for i in range(keys):
+            for _ in range(keys - i):  # malejąca popularność
+                tracker.record("open-meteo", 50.0 + i * 0.0625, 20.0, days=7, timezone="auto")
+        cache = ForecastDiskCache(os.path.join(tmp, "cache"))
+
+        def _fetch(key: HotKey) -> bool:
+            from weather.services import get_hourly_dataframe_cached
+
+            return get_hourly_dataframe_cached(
+                key.lat, key.lon, timezone=key.timezone, days=key.days, source=key.source,
+                cache=cache, track=False,
+            ) is not None
+
+        scheduler = PrefetchScheduler(tracker=tracker, fetch_fn=_fetch, top_n=top_n, rate_per_s=rate_per_s)
+        scheduler.run_once()
+        status = scheduler.status()
+        status["upstream_requests"] = srv.request_count
+        status["cache"] = cache.stats()
+    return status
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from core.logging_config import setup_logging
+
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Scheduler prefetchu popularnych lokalizacji.")
+    parser.add_argument("--once", action="store_true", help="jeden obieg i wyjście")
+    parser.add_argument("--dry-run", action="store_true", help="obieg na lokalnym fake-serwerze")
+    parser.add_argument("--top-n", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=5.0, help="maks. zapytań/s do upstreamu")
+    parser.add_argument("--interval", type=float, default=60.0)
+    args = parser.parse_args()
+
+    if args.dry_run:
+        print(json.dumps(dry_run(top_n=args.top_n, rate_per_s=args.rate), indent=2, default=str))
+    else:
+        sched = PrefetchScheduler(top_n=args.top_n, max_workers=args.workers, rate_per_s=args.rate)
+        if args.once:
+            sched.run_once(force=True)
+            print(json.dumps(sched.status(), indent=2, default=str))
+        else:
+            stop_event = threading.Event()
+            try:
+                sched.run_forever(stop_event, interval_s=args.interval)
+            except KeyboardInterrupt:
+                stop_event.set()
@@ -0,0 +1,301 @@
+"""
+Reverse geocoding bez sieci: (lat, lon) → najbliższe miejsce z lokalnego gazetteera.
+
+Indeks to regularna siatka lat/lon nad tablicami NumPy (punkty posortowane po id komórki
++ tablica początków komórek). Zapytania wsadowe są w pełni zwektoryzowane:
+kandydaci z sąsiednich komórek są rozwijani do par (zapytanie, punkt), a najbliższy
+wybierany przez `np.maximum.reduceat` na iloczynach skalarnych wektorów jednostkowych.
+Punkty, dla których sąsiedztwo nie gwarantuje wyniku, idą do szerszego pierścienia,
+a na końcu do brute-force (też wektorowo, w paczkach).
+
+Benchmark:
+    python -m ingestion.reverse_geocoding --points 2000000
+"""
+from __future__ import annotations
+from typing import Any, Dict, Optional, Tuple
+import math
+import threading
+import weakref
+
+import numpy as np
+
+from ingestion.gazetteer import Gazetteer, get_default_gazetteer
+
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_CELL_DEG = 0.5
+# po przekroczeniu tego promienia (w stopniach) przechodzimy na brute-force
+_MAX_RING_DEG = 8.0
+_QUERY_CHUNK = 65536
+_BRUTE_CHUNK_PAIRS = 4_000_000
+
+
+def _unit_vectors(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    lat_r = np.radians(np.asarray(lat, dtype=np.float64))
+    lon_r = np.radians(np.asarray(lon, dtype=np.float64))
+    cos_lat = np.cos(lat_r)
+    return np.stack([cos_lat * np.cos(lon_r), cos_lat * np.sin(lon_r), np.sin(lat_r)], axis=1)
+
+
+class GridIndex:
+    """
+    Indeks siatkowy nad punktami (lat, lon) – najbliższy sąsiad po odległości po kole wielkim.
+    """
+
+    def __init__(self, lat: np.ndarray, lon: np.ndarray, *, cell_deg: float = DEFAULT_CELL_DEG) -> None:
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        self.cell_deg = float(cell_deg)
+        self.n_rows = int(math.ceil(180.0 / self.cell_deg))
+        self.n_cols = int(math.ceil(360.0 / self.cell_deg))
+        self.n_points = int(len(lat))
+
+        cell = self._cell_ids(*self._rows_cols(lat, lon))
+        self.order = np.argsort(cell, kind="stable")
+        sorted_cells = cell[self.order]
+        self.cell_start = np.searchsorted(sorted_cells, np.arange(self.n_rows * self.n_cols + 1))
+        # wektory jednostkowe w kolejności komórek – ciągły dostęp przy liczeniu odległości
+        self.xyz = _unit_vectors(lat, lon)[self.order]
+        self.x, self.y, self.z = (np.ascontiguousarray(self.xyz[:, k]) for k in range(3))
+
+    def _rows_cols(self, lat: np.ndarray, lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        rows = np.clip(np.floor((lat + 90.0) / self.cell_deg).astype(np.int64), 0, self.n_rows - 1)
+        cols = np.floor((lon + 180.0) / self.cell_deg).astype(np.int64) % self.n_cols
+        return rows, cols
+
+    def _cell_ids(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        return rows * self.n_cols + cols
+
+    # ---------------------------
+    # zapytania
+    # ---------------------------
+
+    def query(
+        self,
+        lat: Any,
+        lon: Any,
+        *,
+        max_distance_km: Optional[float] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Zwraca (indeksy punktów, odległości w km) dla każdego zapytania.
+        Brak punktu (pusty indeks albo dalej niż `max_distance_km`) → indeks -1, odległość inf.
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        n = len(lat)
+        best_idx = np.full(n, -1, dtype=np.int64)
+        best_dot = np.full(n, -2.0)
+        if n == 0 or self.n_points == 0:
+            return best_idx, np.full(n, np.inf)
+
+        for start in range(0, n, _QUERY_CHUNK):
+            sl = slice(start, start + _QUERY_CHUNK)
+            self._query_chunk(lat[sl], lon[sl], best_idx[sl], best_dot[sl], max_distance_km)
+
+        dist = np.where(best_idx >= 0, np.arccos(np.clip(best_dot, -1.0, 1.0)) * EARTH_RADIUS_KM, np.inf)
+        if max_distance_km is not None:
+            too_far = dist > max_distance_km
+            best_idx[too_far] = -1
+            dist[too_far] = np.inf
+        return best_idx, dist
+
+    def _query_chunk(
+        self,
+        lat: np.ndarray,
+        lon: np.ndarray,
+        best_idx: np.ndarray,
+        best_dot: np.ndarray,
+        max_distance_km: Optional[float],
+    ) -> None:
+        q_xyz = _unit_vectors(lat, lon)
+        rows, cols = self._rows_cols(lat, lon)
+        pending = np.arange(len(lat))
+        max_angle = max_distance_km / EARTH_RADIUS_KM if max_distance_km is not None else np.inf
+
+        ring = 1
+        while len(pending) and ring * self.cell_deg <= _MAX_RING_DEG:
+            self._scan_square(q_xyz, rows, cols, pending, ring, best_idx, best_dot)
+            bound = self._ring_bound(rows[pending], ring)
+            found = best_idx[pending] >= 0
+            # gotowe: mamy kandydata bliżej niż cokolwiek spoza kwadratu
+            # (kąt ≤ bound ⇔ cos ≥ cos(bound)), albo spoza kwadratu i tak
+            # wszystko jest dalej niż max_distance
+            done = (found & (best_dot[pending] >= np.cos(np.minimum(bound, np.pi)))) | (bound >= max_angle)
+            pending = pending[~done]
+            ring *= 2
+
+        if len(pending):
+            self._brute_force(q_xyz[pending], pending, best_idx, best_dot)
+
+    def _ring_bound(self, rows: np.ndarray, ring: int) -> np.ndarray:
+        """Dolne ograniczenie kąta (rad) do dowolnego punktu spoza kwadratu (2·ring+1)²."""
+        span = ring * self.cell_deg
+        lat_bound = np.radians(span) if 2 * ring + 1 < self.n_rows else np.inf
+        if 2 * ring + 1 >= self.n_cols:
+            lon_bound = np.full(len(rows), np.inf)
+        else:
+            # najbardziej „biegunowa” szerokość w pasie wierszy kwadratu
+            edge_lat = np.minimum(
+                90.0,
+                np.maximum(
+                    np.abs((rows - ring) * self.cell_deg - 90.0),
+                    np.abs((rows + ring + 1) * self.cell_deg - 90.0),
+                ),
+            )
+            lon_bound = np.radians(span) * np.cos(np.radians(edge_lat))
+        return np.minimum(lat_bound, lon_bound) * 0.999
+
+    def _scan_square(
+        self,
+        q_xyz: np.ndarray,
+        rows: np.ndarray,
+        cols: np.ndarray,
+        pending: np.ndarray,
+        ring: int,
+        best_idx: np.ndarray,
+        best_dot: np.ndarray,
+    ) -> None:
+        offs = np.arange(-ring, ring + 1)
+        d_rows = np.repeat(offs, len(offs))
+        d_cols = np.tile(offs, len(offs))
+        n_rows_nb = rows[pending, None] + d_rows[None, :]
+        valid = (n_rows_nb >= 0) & (n_rows_nb < self.n_rows)
+        n_cols_nb = (cols[pending, None] + d_cols[None, :]) % self.n_cols
+        cell = np.where(valid, self._cell_ids(np.clip(n_rows_nb, 0, self.n_rows - 1), n_cols_nb), 0)
+        starts = self.cell_start[cell]
+        counts = np.where(valid, self.cell_start[cell + 1] - starts, 0)
+
+        # rozwinięcie (zapytanie × komórka) → pary (zapytanie, punkt) bez pętli w Pythonie
+        seg_len = counts.ravel()
+        total = int(seg_len.sum())
+        if total == 0:
+            return
+        seg_off = np.cumsum(seg_len) - seg_len
+        within = np.arange(total) - np.repeat(seg_off, seg_len)
+        point = np.repeat(starts.ravel(), seg_len) + within
+        per_query = counts.sum(axis=1)
+        q_local = np.repeat(np.arange(len(pending)), per_query)
+
+        q = q_xyz[pending]
+        dots = q[q_local, 0] * self.x[point]
+        dots += q[q_local, 1] * self.y[point]
+        dots += q[q_local, 2] * self.z[point]
+        has = per_query > 0
+        q_off = (np.cumsum(per_query) - per_query)[has]
+        seg_max = np.maximum.reduceat(dots, q_off)
+
+        # pozycja pierwszego maksimum w każdym segmencie (liniowo, bez sortowania)
+        is_max = dots == np.repeat(seg_max, per_query[has])
+        pos = np.where(is_max, np.arange(total), total)
+        first = np.minimum.reduceat(pos, q_off)
+        cand_point = point[first]
+
+        target = pending[has]
+        better = seg_max > best_dot[target]
+        best_dot[target[better]] = seg_max[better]
+        best_idx[target[better]] = self.order[cand_point[better]]
+
+    def _brute_force(
+        self,
+        q_xyz: np.ndarray,
+        targets: np.ndarray,
+        best_idx: np.ndarray,
+        best_dot: np.ndarray,
+    ) -> None:
+        step = max(1, _BRUTE_CHUNK_PAIRS // max(1, self.n_points))
+        for start in range(0, len(targets), step):
+            dots = q_xyz[start:start + step] @ self.xyz.T
+            arg = np.argmax(dots, axis=1)
+            best = dots[np.arange(len(arg)), arg]
+            tgt = targets[start:start + step]
+            better = best > best_dot[tgt]
+            best_dot[tgt[better]] = best[better]
+            best_idx[tgt[better]] = self.order[arg[better]]
+
+
+_indexes: "weakref.WeakKeyDictionary[Gazetteer, GridIndex]" = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def get_spatial_index(gazetteer: Gazetteer, *, cell_deg: float = DEFAULT_CELL_DEG) -> GridIndex:
+    """Indeks budowany raz per gazetteer (leniwie, przy pierwszym zapytaniu)."""
+    with _indexes_lock:
+        index = _indexes.get(gazetteer)
+        if index is None or index.cell_deg != cell_deg:
+            index = GridIndex(gazetteer.lat, gazetteer.lon, cell_deg=cell_deg)
+            _indexes[gazetteer] = index
+    return index
+
+
+def reverse_geocode_batch(
+    lats: Any,
+    lons: Any,
+    *,
+    max_distance_km: Optional[float] = None,
+    gazetteer: Optional[Gazetteer] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Wsadowy reverse geocoding dla tablic współrzędnych (np. surowe punkty GPS floty).
+
+    Zwraca (indeksy miejsc w gazetteerze, odległości w km); -1 / inf gdy brak dopasowania.
+    Etykiety: `gazetteer.to_result(i)` albo `gazetteer.display_name(i, lang)`.
+    """
+    gazetteer = gazetteer or get_default_gazetteer()
+    lats = np.asarray(lats, dtype=np.float64)
+    if gazetteer is None:
+        return np.full(lats.shape, -1, dtype=np.int64), np.full(lats.shape, np.inf)
+    return get_spatial_index(gazetteer).query(lats, lons, max_distance_km=max_distance_km)
+
+
+def reverse_geocode(
+    lat: float,
+    lon: float,
+    *,
+    language: str = "pl",
+    max_distance_km: Optional[float] = None,
+    gazetteer: Optional[Gazetteer] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Najbliższe miejsce dla jednego punktu – w formacie wyników geocodingu
+    (+ `distance_km`), albo None gdy nie ma gazetteera / nic w zasięgu.
+    """
+    gazetteer = gazetteer or get_default_gazetteer()
+    if gazetteer is None:
+        return None
+    idx, dist = reverse_geocode_batch([lat], [lon], max_distance_km=max_distance_km, gazetteer=gazetteer)
+    if idx[0] < 0:
+        return None
+    result = gazetteer.to_result(int(idx[0]), language)
+    result["distance_km"] = float(dist[0])
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Benchmark wsadowego reverse geocodingu.")
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--places", type=int, default=30_000, help="rozmiar syntetycznego gazetteera")
+    parser.add_argument("--path", help="prawdziwy gazetteer .npz zamiast syntetycznego")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.path:
+        lat_p, lon_p = Gazetteer.load(args.path).lat, Gazetteer.load(args.path).lon
+    else:
+        lat_p = np.degrees(np.arcsin(rng.uniform(-0.9, 0.95, args.places)))
+        lon_p = rng.uniform(-180, 180, args.places)
+    t0 = time.perf_counter()
+    grid = GridIndex(lat_p, lon_p)
+    build_s = time.perf_counter() - t0
+
+    q_lat = np.degrees(np.arcsin(rng.uniform(-0.9, 0.95, args.points)))
+    q_lon = rng.uniform(-180, 180, args.points)
+    t0 = time.perf_counter()
+    idx, dist = grid.query(q_lat, q_lon)
+    query_s = time.perf_counter() - t0
+    print(
+        f"indeks: {len(lat_p)} miejsc w {build_s * 1000:.0f} ms; "
+        f"{args.points} punktów w {query_s:.2f} s → {args.points / query_s / 1e6:.2f} M pkt/s"
+    )
@@ -0,0 +1,97 @@
+"""
+Single-flight: sklejanie równoczesnych, identycznych zapytań do upstreamu.
+
+Gdy setki sesji Streamlita proszą o to samo miasto w tej samej chwili,
+tylko pierwsze wywołanie („lider”) idzie do API – reszta czeka na jego wynik.
+Działa między wątkami jednego procesu.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, Hashable, Optional
+import threading
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "waiters")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    `do(key, fn)` – jeśli dla `key` już trwa wywołanie, czekamy na nie i zwracamy
+    jego wynik (albo ten sam wyjątek). W przeciwnym razie wołamy `fn` sami.
+
+    Liczniki (`stats()`):
+      - calls – wszystkie wywołania `do`,
+      - executed – ile razy faktycznie wołaliśmy `fn`,
+      - coalesced – ile wywołań dostało cudzy wynik,
+      - max_waiters – najwięcej wywołań sklejonych z jednym wywołaniem lidera,
+      - in_flight – ile kluczy jest w tej chwili w locie,
+      - waiting – ile wywołań w tej chwili czeka na lidera.
+    """
+
+    def __init__(self, name: str = "singleflight") -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats = {"calls": 0, "executed": 0, "coalesced": 0, "max_waiters": 0}
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._stats["coalesced"] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._stats["executed"] += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            # najpierw zdejmujemy klucz – kolejne wywołania po tym momencie idą już „na świeżo”
+            with self._lock:
+                self._calls.pop(key, None)
+                self._stats["max_waiters"] = max(self._stats["max_waiters"], call.waiters)
+            call.event.set()
+        return call.result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["in_flight"] = len(self._calls)
+            out["waiting"] = sum(call.waiters for call in self._calls.values())
+        out["coalesced_ratio"] = out["coalesced"] / out["calls"] if out["calls"] else 0.0
+        return out
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            for k in self._stats:
+                self._stats[k] = 0
+
+
+# współdzielone instancje dla klientów z pakietu ingestion
+FORECAST_FLIGHTS = SingleFlight("open-meteo")
+GEOCODING_FLIGHTS = SingleFlight("geocoding")
+
+
+def get_singleflight_stats() -> Dict[str, Dict[str, Any]]:
+    """Liczniki sklejonych wywołań per klient – do metryk / panelu admina."""
+    return {sf.name: sf.stats() for sf in (FORECAST_FLIGHTS, GEOCODING_FLIGHTS)}
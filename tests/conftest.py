@@ -0,0 +1,11 @@
+"""Wspólna konfiguracja testów: katalog główny repo na sys.path, storage w katalogu tymczasowym."""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# przed importem core.storage – testy nie piszą do /mnt/data
+os.environ.setdefault("STORAGE_BASE_DIR", tempfile.mkdtemp(prefix="ai-weather-tests-"))
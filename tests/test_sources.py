@@ -0,0 +1,59 @@
+"""Fan-out źródeł – offline, na fałszywych dostawcach."""
+import asyncio
+import time
+
+from weather.sources import FakeProvider, SourceRegistry, SyncFakeProvider, register_fake_providers
+
+
+def test_sync_provider_timeout_does_not_block_caller():
+    registry = SourceRegistry()
+    registry.register(FakeProvider("fast", latency_s=0.01))
+    registry.register(SyncFakeProvider("blocking", latency_s=4.0, timeout_s=0.5))
+
+    t0 = time.perf_counter()
+    res = registry.fetch_many_sync(52.23, 21.01, ["fast", "blocking"], days=1, deadline_s=1.0)
+    wall_s = time.perf_counter() - t0
+
+    assert "fast" in res.frames
+    assert res.timed_out == ["blocking"]
+    assert wall_s < 1.5
+
+
+def test_sync_provider_deadline_does_not_block_caller():
+    registry = SourceRegistry()
+    registry.register(SyncFakeProvider("blocking", latency_s=4.0, timeout_s=10.0))
+
+    t0 = time.perf_counter()
+    res = registry.fetch_many_sync(52.23, 21.01, ["blocking"], days=1, deadline_s=0.5)
+
+    assert res.timed_out == ["blocking"]
+    assert time.perf_counter() - t0 < 1.0
+
+
+def test_semaphore_wait_counts_towards_provider_timeout():
+    registry = SourceRegistry()
+    registry.register(FakeProvider("busy", latency_s=0.3, timeout_s=0.5, max_concurrency=1))
+
+    async def two_callers():
+        return await asyncio.gather(
+            registry.fetch_many(52.23, 21.01, ["busy"], days=1),
+            registry.fetch_many(52.23, 21.01, ["busy"], days=1),
+        )
+
+    first, second = asyncio.run(two_callers())
+    # drugi czeka 0.3 s na semafor + 0.3 s pobrania > timeout 0.5 s
+    assert "busy" in first.frames
+    assert "busy" not in second.frames
+
+
+def test_fake_providers_demo_respects_deadline():
+    registry = SourceRegistry()
+    fakes = register_fake_providers(registry)
+
+    t0 = time.perf_counter()
+    res = registry.fetch_many_sync(52.23, 21.01, fakes, deadline_s=2.0)
+
+    assert {"fake-fast", "fake-slow"} <= set(res.frames)
+    assert "fake-flaky" in res.errors
+    assert "fake-blocking" in res.timed_out
+    assert time.perf_counter() - t0 < 2.5
@@ -0,0 +1,103 @@
+"""Weryfikacja strumieniowa i wsadowa vs `verify_forecast_vs_actuals` w pamięci."""
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from weather.verification import verify_forecast_stream, verify_forecast_vs_actuals
+from weather.verification_batch import make_synthetic_batch, verify_batch
+
+
+def _synthetic(seed: int = 0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2024-01-01", periods=72, freq="h")
+    forecast = pd.DataFrame(
+        {"temperature_c": rng.normal(5, 4, len(index)).round(2), "precip_mm": rng.gamma(0.4, 1.5, len(index)).round(2)},
+        index=index,
+    )
+    # obserwacje co 20 min z przesunięciem, część timestampów powtórzona
+    times = pd.date_range("2024-01-01 00:05", periods=200, freq="20min")
+    times = times.append(times[[7, 8, 40, 41, 120]])
+    obs = pd.DataFrame({
+        "time": times,
+        "temperature_c": rng.normal(5, 4, len(times)).round(2),
+        "precip_mm": rng.gamma(0.4, 1.5, len(times)).round(2),
+    })
+    # po sortowaniu duplikaty sąsiadują – przy małych paczkach lądują po obu stronach granicy
+    obs = obs.sort_values("time", kind="stable").reset_index(drop=True)
+    obs.loc[::17, "temperature_c"] = np.nan
+    return forecast, obs
+
+
+def _csv(df: pd.DataFrame) -> io.StringIO:
+    buf = io.StringIO()
+    df.to_csv(buf, index=False)
+    buf.seek(0)
+    return buf
+
+
+def _assert_same(expected, actual):
+    assert expected.keys() == actual.keys()
+    for key, value in expected.items():
+        assert actual[key] == pytest.approx(value, rel=1e-9, abs=1e-12, nan_ok=True), key
+
+
+@pytest.mark.parametrize("chunksize", [1, 7, 16, 1000])
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"time_tolerance": "10min"},
+        {"align": "nearest", "time_tolerance": "30min"},
+        {"align": "backward", "time_tolerance": "1h"},
+        {"align": "interpolate", "time_tolerance": "1h"},
+    ],
+)
+def test_stream_matches_in_memory(chunksize, kwargs):
+    forecast, obs = _synthetic()
+    expected = verify_forecast_vs_actuals(forecast, obs, **kwargs)
+    actual = verify_forecast_stream(forecast, _csv(obs), chunksize=chunksize, **kwargs)
+    assert expected["n_samples"] > 0
+    _assert_same(expected, actual)
+
+
+def test_stream_matches_in_memory_exact_duplicates():
+    forecast, obs = _synthetic()
+    # obserwacje dokładnie na godzinach prognozy, powtórzone godziny na granicach paczek po 4;
+    # dokładny join liczy każdy powtórzony wiersz – wersja strumieniowa też
+    times = forecast.index[[0, 1, 2, 3, 3, 4, 5, 6, 7, 7, 8, 9, 10]]
+    exact = pd.DataFrame({"time": times, "temperature_c": np.arange(len(times), dtype=float)})
+    expected = verify_forecast_vs_actuals(forecast, exact)
+    assert expected["n_samples"] == len(times)
+    for chunksize in (1, 4, 100):
+        _assert_same(expected, verify_forecast_stream(forecast, _csv(exact), chunksize=chunksize))
+
+
+def test_verify_batch_matches_per_station():
+    forecasts, observations = make_synthetic_batch(n_stations=5, n_runs=1, horizon_h=72, seed=1)
+    # powtórzone obserwacje (ostatnia wygrywa) i wiersz bez stacji – ignorowany
+    dup = observations.iloc[::11].assign(temperature_c=lambda d: d["temperature_c"] + 1.0)
+    observations = pd.concat([observations, dup], ignore_index=True)
+    observations["station"] = observations["station"].astype(object)
+    observations.loc[len(observations)] = [None, observations["time"].iloc[0], 0.0, 0.0]
+    edges = (0, 24, 48)
+
+    result = verify_batch(forecasts, observations, lead_buckets_h=edges)
+
+    lead_h = (forecasts["valid_time"] - forecasts["issue_time"]) / pd.Timedelta(hours=1)
+    bucket = np.searchsorted(edges, lead_h, side="right") - 1
+    labels = ["0-24h", "24-48h", "48h+"]
+    checked = 0
+    for (station, b), fc in forecasts.groupby([forecasts["station"].astype(str), bucket]):
+        obs = observations[observations["station"] == station].drop_duplicates("time", keep="last")
+        expected = verify_forecast_vs_actuals(
+            fc.set_index("valid_time")[["temperature_c", "precip_mm"]],
+            obs[["time", "temperature_c", "precip_mm"]],
+        )
+        for variable, prefix in (("temperature_c", "temp"), ("precip_mm", "precip")):
+            row = result.loc[(station, labels[b], variable)]
+            assert row["n"] == expected[f"{prefix}_n"]
+            for metric in ("mae", "rmse", "bias", "corr"):
+                assert row[metric] == pytest.approx(expected[f"{prefix}_{metric}"], rel=1e-6, abs=1e-6)
+            checked += 1
+    assert checked == 5 * len(labels) * 2
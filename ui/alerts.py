@@ -1,14 +1,24 @@
 from __future__ import annotations
 import streamlit as st
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Sequence
 
+from weather.aggregation import aggregate_block, get_pyramid
+from weather.block import ForecastBlock
+
+
+# reguły na zmiennych spoza domyślnego zestawu: liczone tylko, gdy kolumna jest już
+# pobrana albo wybrana przez użytkownika – alert nie wymusza dodatkowego zapytania
+OPTIONAL_ALERT_VARIABLES = ("wind_gusts_kmh",)
 
 # możesz to potem wynieść do configa
 ALERT_THRESHOLDS = {
     "rain_mm": 20.0,
     "very_cold_c": -10.0,
     "very_hot_c": 35.0,
+    "gust_kmh": 75.0,
+    "rain_day_mm": 40.0,
 }
 
 
@@ -20,46 +30,111 @@ def _translate(key: str, lang: str) -> str:
             "rain": "Silne opady w najbliższych godzinach (>= {mm} mm).",
             "cold": "Bardzo niska temperatura (poniżej {c} °C).",
             "hot": "Bardzo wysoka temperatura (powyżej {c} °C).",
+            "gust": "Silne porywy wiatru (>= {kmh} km/h).",
+            "rain_day": "Duża dobowa suma opadu (>= {mm} mm).",
         },
         "en": {
             "header": "⚠️ Weather alerts",
             "rain": "Heavy rainfall expected in the next hours (>= {mm} mm).",
             "cold": "Very low temperature expected (below {c} °C).",
             "hot": "Very high temperature expected (above {c} °C).",
+            "gust": "Strong wind gusts expected (>= {kmh} km/h).",
+            "rain_day": "High daily precipitation total expected (>= {mm} mm).",
         },
     }
     return STR.get(lang, STR["en"]).get(key, key)
 
 
-def render_alerts(df: pd.DataFrame, lang: str = "pl") -> None:
+def compute_alert_flags(data: Any, *, requested: Sequence[str] = ()) -> Dict[str, np.ndarray]:
+    """
+    Flagi alertów per punkt: {"rain"/"rain_day"/"cold"/"hot"/"gust": bool[n_punktów]}.
+    DataFrame / LazyForecast to jeden punkt; ForecastBlock liczymy wektorowo dla wszystkich naraz.
+    Zmienne z OPTIONAL_ALERT_VARIABLES LazyForecast dociąga tylko, gdy są w `requested`.
+    """
+    if isinstance(data, ForecastBlock):
+        temp = data.var("temperature_c") if data.has("temperature_c") else None
+        precip = data.var("precip_mm") if data.has("precip_mm") else None
+        gusts = data.var("wind_gusts_kmh") if data.has("wind_gusts_kmh") else None
+        _starts, daily = aggregate_block(data, "1d")
+        daily_precip = daily.get("precip_sum")
+    else:
+        # LazyForecast: odczyt kolumny = pobranie jej przy pierwszym użyciu
+        temp = _column(data, "temperature_c")
+        precip = _column(data, "precip_mm")
+        gusts = _column(data, "wind_gusts_kmh", fetch="wind_gusts_kmh" in requested)
+        # sumy dobowe z piramidy (cache per wersja prognozy)
+        pyramid = get_pyramid(data)
+        daily_precip = None
+        if pyramid is not None and "precip_sum" in pyramid.daily.columns:
+            daily_precip = pyramid.daily["precip_sum"].to_numpy()[None, :]
+
+    flags: Dict[str, np.ndarray] = {}
+    # NaN porównuje się jako False – brak danych nie odpala alertu
+    if precip is not None:
+        flags["rain"] = (precip >= ALERT_THRESHOLDS["rain_mm"]).any(axis=1)
+    if temp is not None:
+        flags["cold"] = (temp <= ALERT_THRESHOLDS["very_cold_c"]).any(axis=1)
+        flags["hot"] = (temp >= ALERT_THRESHOLDS["very_hot_c"]).any(axis=1)
+    if gusts is not None:
+        flags["gust"] = (gusts >= ALERT_THRESHOLDS["gust_kmh"]).any(axis=1)
+    if daily_precip is not None:
+        flags["rain_day"] = (daily_precip >= ALERT_THRESHOLDS["rain_day_mm"]).any(axis=1)
+    return flags
+
+
+def _column(data: Any, name: str, *, fetch: bool = True) -> Optional[np.ndarray]:
+    # LazyForecast: `loaded` = kolumny już w pamięci; odczyt innej = zapytanie do API
+    if name not in (data.columns if fetch else getattr(data, "loaded", data.columns)):
+        return None
+    try:
+        return data[name].to_numpy()[None, :]
+    except KeyError:
+        return None
+
+
+def render_alerts(
+    df: Any,
+    lang: str = "pl",
+    *,
+    location: int = 0,
+    extra_variables: Sequence[str] = (),
+) -> None:
     # brak danych → brak alertów
     if df is None or df.empty:
         return
 
+    flags = compute_alert_flags(df, requested=extra_variables)
     alerts: List[str] = []
 
     # opady
-    if "precip_mm" in df.columns:
-        high_rain = df["precip_mm"] >= ALERT_THRESHOLDS["rain_mm"]
-        if high_rain.any():
-            alerts.append(
-                _translate("rain", lang).format(mm=ALERT_THRESHOLDS["rain_mm"])
-            )
+    if "rain" in flags and flags["rain"][location]:
+        alerts.append(
+            _translate("rain", lang).format(mm=ALERT_THRESHOLDS["rain_mm"])
+        )
+
+    # duża suma dobowa (nawet gdy żadna pojedyncza godzina nie przekracza progu)
+    if "rain_day" in flags and flags["rain_day"][location] and not ("rain" in flags and flags["rain"][location]):
+        alerts.append(
+            _translate("rain_day", lang).format(mm=ALERT_THRESHOLDS["rain_day_mm"])
+        )
 
     # bardzo zimno
-    if "temperature_c" in df.columns:
-        very_cold = df["temperature_c"] <= ALERT_THRESHOLDS["very_cold_c"]
-        if very_cold.any():
-            alerts.append(
-                _translate("cold", lang).format(c=ALERT_THRESHOLDS["very_cold_c"])
-            )
-
-        # bardzo gorąco
-        very_hot = df["temperature_c"] >= ALERT_THRESHOLDS["very_hot_c"]
-        if very_hot.any():
-            alerts.append(
-                _translate("hot", lang).format(c=ALERT_THRESHOLDS["very_hot_c"])
-            )
+    if "cold" in flags and flags["cold"][location]:
+        alerts.append(
+            _translate("cold", lang).format(c=ALERT_THRESHOLDS["very_cold_c"])
+        )
+
+    # bardzo gorąco
+    if "hot" in flags and flags["hot"][location]:
+        alerts.append(
+            _translate("hot", lang).format(c=ALERT_THRESHOLDS["very_hot_c"])
+        )
+
+    # porywy wiatru
+    if "gust" in flags and flags["gust"][location]:
+        alerts.append(
+            _translate("gust", lang).format(kmh=ALERT_THRESHOLDS["gust_kmh"])
+        )
 
     if not alerts:
         return
@@ -1,7 +1,9 @@
 from __future__ import annotations
-from typing import Any
+from typing import Any, Sequence
 import streamlit as st
 from core.i18n import t
+from weather.aggregation import get_pyramid
+from weather.variables import get_spec
 
 
 def render_header(lang: str = "pl") -> None:
@@ -60,9 +62,12 @@ def render_coords_inputs(default_lat: float, default_lon: float, lang: str = "pl
     return lat, lon
 
 
-def render_forecast_charts(df: Any, lang: str = "pl") -> None:
+def render_forecast_charts(df: Any, lang: str = "pl", extra_variables: Sequence[str] = ()) -> None:
     """
     Rysuje podstawowe wykresy, ale bez wywalania się jeśli brakuje kolumn.
+
+    `extra_variables` – dodatkowe zmienne z katalogu (wiatr, wilgotność, ...);
+    przy LazyForecast są pobierane dopiero tutaj, przy pierwszym odczycie.
     """
     st.subheader("📈 " + t("forecast_header", lang))
 
@@ -70,6 +75,26 @@ def render_forecast_charts(df: Any, lang: str = "pl") -> None:
         st.info("Brak danych do wykresu.")
         return
 
+    resolution = st.radio(
+        "Rozdzielczość" if lang == "pl" else "Resolution",
+        options=["1h", "3h", "1d"],
+        format_func=lambda r: {"1h": "1 h", "3h": "3 h", "1d": "doba" if lang == "pl" else "day"}[r],
+        horizontal=True,
+    )
+    if resolution != "1h":
+        # agregaty z piramidy – liczone raz na wersję prognozy, nie przy każdym rerunie
+        pyramid = get_pyramid(df)
+        if pyramid is not None:
+            summary = pyramid.at(resolution)
+            temp_cols = [c for c in ("temp_min", "temp_mean", "temp_max") if c in summary.columns]
+            if temp_cols:
+                st.line_chart(summary[temp_cols])
+            if "precip_sum" in summary.columns:
+                st.bar_chart(
+                    summary[["precip_sum"]].rename(columns={"precip_sum": t("precipitation", lang)})
+                )
+            return
+
     # temperatura
     if "temperature_c" in df.columns:
         st.line_chart(
@@ -85,3 +110,15 @@ def render_forecast_charts(df: Any, lang: str = "pl") -> None:
         )
     else:
         st.warning("Brak kolumny opadu – pomijam wykres opadów.")
+
+    # dodatkowe zmienne – tylko te wybrane przez usera
+    for name in extra_variables:
+        spec = get_spec(name)
+        if spec is None or name not in df.columns:
+            continue
+        try:
+            series = df[name]
+        except KeyError:
+            st.warning(f"Brak danych dla {spec.label(lang)}.")
+            continue
+        st.line_chart(series.rename(spec.label(lang)).to_frame())
@@ -1,15 +1,31 @@
 from __future__ import annotations
 import streamlit as st
 import pandas as pd
+from typing import Union
 
-from weather.verification import verify_forecast_vs_actuals
+from weather.block import ForecastBlock
+from weather.alignment import ALIGN_POLICIES
+from weather.verification import (
+    BRIER_THRESHOLDS_MM,
+    ensemble_cube,
+    stream_observation_matrix,
+    verify_ensemble,
+    verify_forecast_stream,
+)
 from core.storage import save_verification_result
 
 
 REQUIRED_COLS = {"time", "temperature_c", "precip_mm"}
 
+ALIGN_LABELS = {
+    "exact": "dokładny timestamp",
+    "nearest": "najbliższa obserwacja",
+    "backward": "ostatnia wcześniejsza",
+    "interpolate": "interpolacja w czasie",
+}
 
-def render_verification_panel(forecast_df: pd.DataFrame) -> None:
+
+def render_verification_panel(forecast_df: Union[pd.DataFrame, ForecastBlock]) -> None:
     st.subheader("🛠️ Walidacja prognozy")
 
     st.write(
@@ -24,25 +40,54 @@ def render_verification_panel(forecast_df: pd.DataFrame) -> None:
         st.info("Nie wgrano pliku – brak walidacji.")
         return
 
-    # wczytaj jako DataFrame
+    # podgląd – tylko początek pliku; całość idzie strumieniowo paczkami
     try:
-        actuals_df = pd.read_csv(uploaded)
+        preview_df = pd.read_csv(uploaded, nrows=30)
+        uploaded.seek(0)
     except Exception as exc:
         st.error(f"Nie udało się wczytać CSV: {exc}")
         return
 
     # pokaż userowi, co wgrał
     st.caption("Podgląd wgranych danych:")
-    st.dataframe(actuals_df.head(30), use_container_width=True)
+    st.dataframe(preview_df, use_container_width=True)
 
     # sprawdź kolumny
-    missing = REQUIRED_COLS.difference(actuals_df.columns)
+    missing = REQUIRED_COLS.difference(preview_df.columns)
     if missing:
         st.error(f"Brakuje kolumn: {', '.join(missing)}. Uzupełnij plik i wgraj ponownie.")
         return
 
-    # licz metryki
-    metrics = verify_forecast_vs_actuals(forecast_df, actuals_df)
+    # dopasowanie czasów (obserwacje o 10:05 vs prognoza o 10:00)
+    col_policy, col_tol = st.columns(2)
+    with col_policy:
+        policy = st.selectbox(
+            "Dopasowanie obserwacji",
+            ALIGN_POLICIES,
+            format_func=lambda p: ALIGN_LABELS.get(p, p),
+        )
+    with col_tol:
+        tolerance_min = st.number_input(
+            "Tolerancja [min] (0 = bez limitu)",
+            min_value=0,
+            max_value=180,
+            value=0 if policy == "exact" else 30,
+            step=5,
+            disabled=policy == "exact",
+        )
+    time_tolerance = f"{int(tolerance_min)}min" if policy != "exact" and tolerance_min > 0 else None
+
+    # licz metryki – obserwacje czytane paczkami, stała pamięć niezależnie od rozmiaru pliku
+    try:
+        metrics = verify_forecast_stream(
+            forecast_df,
+            uploaded,
+            time_tolerance=time_tolerance,
+            align=None if policy == "exact" else policy,
+        )
+    except Exception as exc:
+        st.error(f"Nie udało się policzyć metryk: {exc}")
+        return
 
     st.success("Metryki policzone:")
     st.json(metrics)
@@ -57,3 +102,61 @@ def render_verification_panel(forecast_df: pd.DataFrame) -> None:
         st.warning("Uwaga: brak wspólnych timestampów między prognozą a obserwacjami – metryki mogą być puste.")
     else:
         st.info(f"Porównano {n_samples} rekordów prognozy z obserwacjami.")
+
+    _render_ensemble_section(uploaded, policy=policy, time_tolerance=time_tolerance)
+
+
+def _render_ensemble_section(observations_file, *, policy: str = "exact", time_tolerance: str | None = None) -> None:
+    """Opcjonalnie: ensemble (CSV w formacie długim) vs te same obserwacje – CRPS, Brier, histogram rang."""
+    with st.expander("🎲 Prognoza ensemble (CRPS / Brier / histogram rang)"):
+        st.write(
+            "CSV z członkami ensemble: `time, member, temperature_c, precip_mm` "
+            "(opcjonalnie `station` – wtedy obserwacje też muszą ją mieć)."
+        )
+        ens_file = st.file_uploader("Wgraj CSV z ensemble", type=["csv"], key="ensemble_csv")
+        if ens_file is None:
+            return
+        variable = st.selectbox("Zmienna", ["precip_mm", "temperature_c"], key="ensemble_var")
+        try:
+            ens_df = pd.read_csv(ens_file)
+        except Exception as exc:
+            st.error(f"Nie udało się wczytać CSV: {exc}")
+            return
+        missing = {"time", "member", variable}.difference(ens_df.columns)
+        if missing:
+            st.error(f"Brakuje kolumn w ensemble: {', '.join(sorted(missing))}.")
+            return
+
+        cube, times, members, stations = ensemble_cube(ens_df, variable)
+        # obserwacje paczkami (jak panel wyżej) – ta sama polityka dopasowania i tolerancja
+        try:
+            observations_file.seek(0)
+            obs = stream_observation_matrix(
+                observations_file, variable, times, stations, align=policy, time_tolerance=time_tolerance
+            )
+        except Exception as exc:
+            st.error(f"Nie udało się wczytać obserwacji: {exc}")
+            return
+        # progi Brier: opad – stałe progi w mm, temperatura – 0 °C (przymrozek / odwilż)
+        thresholds = BRIER_THRESHOLDS_MM if variable == "precip_mm" else (0.0,)
+        scores = verify_ensemble(cube, obs, thresholds=thresholds)
+        if scores.get("n", 0) == 0:
+            st.warning("Brak wspólnych timestampów ensemble i obserwacji.")
+            return
+
+        cols = st.columns(3)
+        cols[0].metric("CRPS", f"{scores['crps']:.3f}")
+        cols[1].metric("Członkowie", scores["members"])
+        cols[2].metric("Próbki", scores["n"])
+        st.caption("Brier score (i skill względem klimatologii próby) per próg:")
+        st.dataframe(
+            pd.DataFrame({"brier": scores["brier"], "brier_skill": scores["brier_skill"], "base_rate": scores["base_rate"]}),
+            use_container_width=True,
+        )
+        st.caption("Histogram rang (płaski = dobrze skalibrowany rozrzut):")
+        st.bar_chart(pd.Series(scores["rank_histogram"], name="liczba"))
+        threshold_key = st.selectbox("Diagram niezawodności – próg", list(scores["reliability"]), key="ensemble_thr")
+        rel = scores["reliability"][threshold_key]
+        st.line_chart(
+            pd.DataFrame({"obserwowana częstość": rel["obs_freq"], "idealnie": rel["p_mean"]}, index=rel["p_mean"])
+        )
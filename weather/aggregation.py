@@ -0,0 +1,182 @@
+"""
+Piramida agregatów prognozy: godziny → 3 godziny → doby.
+
+Liczona raz na wersję prognozy (przebieg modelu + zawartość po slotach /
+postprocessingu) i trzymana w cache obok danych godzinowych – tekst, alerty
+i wykresy biorą gotową rozdzielczość zamiast grupować od nowa przy każdym rerunie.
+
+Wszystko wektorowo (NumPy reduceat po posortowanej osi czasu), działa też dla
+ForecastBlock (punkty × czas naraz).
+
+Granice doby są w czasie lokalnym punktu:
+- indeks bez strefy (Open-Meteo z timezone=auto) to już czas lokalny,
+- indeks ze strefą – liczymy na „ściennym” czasie tej strefy (z DST).
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from core.ttl_cache import MISSING, TTLCache
+from weather.block import ForecastBlock
+
+# godzina „mokra” = opad co najmniej tyle mm
+WET_HOUR_MM = float(os.getenv("AGGREGATION_WET_HOUR_MM", "0.1"))
+
+PERIODS: Dict[str, np.timedelta64] = {
+    "3h": np.timedelta64(3, "h"),
+    "1d": np.timedelta64(1, "D"),
+}
+
+SUMMARY_COLUMNS = ("temp_min", "temp_max", "temp_mean", "precip_sum", "wet_hours", "n_hours")
+
+_PYRAMID_CACHE = TTLCache(
+    int(os.getenv("AGGREGATION_CACHE_SIZE", "512")),
+    float(os.getenv("AGGREGATION_CACHE_TTL_S", "21600")),
+    name="aggregation",
+)
+
+
+@dataclass(frozen=True)
+class ForecastPyramid:
+    """Ta sama prognoza w trzech rozdzielczościach (indeks = początek okresu, czas lokalny)."""
+    hourly: pd.DataFrame
+    three_hourly: pd.DataFrame
+    daily: pd.DataFrame
+
+    def at(self, resolution: str) -> pd.DataFrame:
+        if resolution in ("1h", "hourly"):
+            return self.hourly
+        if resolution in ("3h", "three_hourly"):
+            return self.three_hourly
+        if resolution in ("1d", "daily"):
+            return self.daily
+        raise ValueError(f"Nieznana rozdzielczość: {resolution!r}")
+
+
+def _wall_clock(index: pd.DatetimeIndex) -> np.ndarray:
+    """Czas „ścienny” jako datetime64[ns] – po nim wyznaczamy granice doby."""
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.to_numpy(dtype="datetime64[ns]")
+
+
+def aggregate_arrays(
+    wall_times: np.ndarray,
+    temp: Optional[np.ndarray],
+    precip: Optional[np.ndarray],
+    period: np.timedelta64,
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Agregacja wzdłuż ostatniej osi (czas) – wejście (..., T), wyjście (..., B).
+
+    `wall_times` musi być posortowane. Zwraca (początki okresów, {kolumna: tablica}).
+    NaN są pomijane (fmin/fmax, sumy z maską).
+    """
+    n = len(wall_times)
+    if n == 0:
+        return wall_times[:0], {}
+    step = period.astype("timedelta64[ns]").astype(np.int64)
+    buckets = wall_times.astype(np.int64) // step
+    starts_idx = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    starts = (buckets[starts_idx] * step).astype("datetime64[ns]")
+
+    out: Dict[str, np.ndarray] = {}
+    out["n_hours"] = np.diff(np.r_[starts_idx, n]).astype(np.int32)
+    if temp is not None:
+        temp = np.asarray(temp, dtype=np.float32)
+        finite = np.isfinite(temp)
+        sums = np.add.reduceat(np.where(finite, temp, 0.0), starts_idx, axis=-1, dtype=np.float64)
+        counts = np.add.reduceat(finite, starts_idx, axis=-1, dtype=np.int64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out["temp_mean"] = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan).astype(np.float32)
+        out["temp_min"] = np.fmin.reduceat(temp, starts_idx, axis=-1)
+        out["temp_max"] = np.fmax.reduceat(temp, starts_idx, axis=-1)
+    if precip is not None:
+        precip = np.asarray(precip, dtype=np.float32)
+        finite = np.isfinite(precip)
+        out["precip_sum"] = np.add.reduceat(np.where(finite, precip, 0.0), starts_idx, axis=-1).astype(np.float32)
+        out["wet_hours"] = np.add.reduceat(finite & (precip >= WET_HOUR_MM), starts_idx, axis=-1, dtype=np.int32)
+    return starts, out
+
+
+def _summary_frame(starts: np.ndarray, columns: Dict[str, np.ndarray]) -> pd.DataFrame:
+    data = {name: columns[name] for name in SUMMARY_COLUMNS if name in columns}
+    return pd.DataFrame(data, index=pd.DatetimeIndex(starts, name="time"))
+
+
+def build_pyramid(df: Any) -> Optional[ForecastPyramid]:
+    """
+    Liczy 3-godzinne i dobowe podsumowania z ramki godzinowej (DataFrame albo LazyForecast
+    – bierzemy tylko temperaturę i opad, więc nic dodatkowego się nie pobiera).
+    """
+    if df is None or df.empty:
+        return None
+    hourly = df if isinstance(df, pd.DataFrame) else df.to_frame()
+    if not hourly.index.is_monotonic_increasing:
+        hourly = hourly.sort_index()
+    index = pd.DatetimeIndex(hourly.index)
+    wall = _wall_clock(index)
+    temp = hourly["temperature_c"].to_numpy(dtype=np.float32) if "temperature_c" in hourly.columns else None
+    precip = hourly["precip_mm"].to_numpy(dtype=np.float32) if "precip_mm" in hourly.columns else None
+
+    frames = {}
+    for name, period in PERIODS.items():
+        starts, cols = aggregate_arrays(wall, temp, precip, period)
+        frame = _summary_frame(starts, cols)
+        if index.tz is not None:
+            # z powrotem do strefy punktu (granice liczyliśmy na czasie ściennym)
+            frame.index = frame.index.tz_localize(index.tz, ambiguous="NaT", nonexistent="shift_forward")
+        frames[name] = frame
+    return ForecastPyramid(hourly=hourly, three_hourly=frames["3h"], daily=frames["1d"])
+
+
+def forecast_version(df: Any) -> Optional[Tuple[Any, ...]]:
+    """
+    Klucz wersji prognozy: przebieg modelu + odcisk osi czasu i wartości
+    (te same dane surowe po innym slocie / postprocessingu to inna wersja).
+    """
+    if df is None or df.empty:
+        return None
+    frame = df if isinstance(df, pd.DataFrame) else df.to_frame()
+    cols = [c for c in ("temperature_c", "precip_mm") if c in frame.columns]
+    h = hashlib.blake2b(digest_size=16)
+    h.update(pd.DatetimeIndex(frame.index).asi8.tobytes())
+    for c in cols:
+        h.update(c.encode("utf-8"))
+        h.update(np.ascontiguousarray(frame[c].to_numpy(dtype=np.float32)).tobytes())
+    return (frame.attrs.get("model_run"), h.hexdigest())
+
+
+def get_pyramid(df: Any, *, cache: Optional[TTLCache] = _PYRAMID_CACHE) -> Optional[ForecastPyramid]:
+    """Piramida z cache (liczona raz na wersję prognozy) – główny punkt wejścia dla UI."""
+    key = forecast_version(df)
+    if key is None:
+        return None
+    if cache is not None:
+        hit = cache.get(key)
+        if hit is not MISSING:
+            return hit
+    pyramid = build_pyramid(df)
+    if cache is not None and pyramid is not None:
+        cache.set(key, pyramid)
+    return pyramid
+
+
+def aggregate_block(block: ForecastBlock, resolution: str = "1d") -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Agregaty dla wszystkich punktów bloku naraz: (początki okresów, {kolumna: (punkty × okresy)}).
+    Oś bloku jest wspólna, więc granice okresów też.
+    """
+    period = PERIODS["1d" if resolution in ("1d", "daily") else "3h"]
+    temp = block.var("temperature_c") if block.has("temperature_c") else None
+    precip = block.var("precip_mm") if block.has("precip_mm") else None
+    return aggregate_arrays(block.times, temp, precip, period)
+
+
+def get_aggregation_cache_stats() -> Dict[str, Any]:
+    return _PYRAMID_CACHE.stats()
@@ -0,0 +1,250 @@
+"""
+Dopasowanie obserwacji do osi czasu prognozy (semantyka merge-asof).
+
+Polityki:
+- "exact"       – tylko identyczny timestamp,
+- "nearest"     – najbliższa obserwacja w tolerancji (remis → późniejsza),
+- "backward"    – ostatnia obserwacja nie późniejsza niż godzina prognozy,
+- "interpolate" – liniowo w czasie między sąsiadami z lewej i prawej,
+                  oba muszą być w tolerancji (trafienie dokładne → wartość wprost).
+
+Wszystko sprowadza się do dwóch kandydatów na godzinę prognozy – ostatniej obserwacji
+≤ t i pierwszej ≥ t – wyznaczanych jednym searchsorted po posortowanych czasach
+(O((n + m) log n)). Dane już posortowane (typowy CSV ze stacji) omijają argsort.
+Powtórzone timestampy obserwacji: wygrywa ostatni wiersz.
+
+Ten sam podział (kandydaci → `resolve`) działa w weryfikacji strumieniowej:
+kandydatów da się aktualizować paczka po paczce w pamięci O(długość prognozy).
+
+Benchmark:
+    python -m weather.alignment --obs 1000000
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple, Union
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ALIGN_POLICIES: Tuple[str, ...] = ("exact", "nearest", "backward", "interpolate")
+
+_NO_LEFT = np.iinfo(np.int64).min
+_NO_RIGHT = np.iinfo(np.int64).max
+
+
+def tolerance_ns(tolerance: Union[None, str, pd.Timedelta, np.timedelta64]) -> Optional[int]:
+    """'10min' / Timedelta → nanosekundy; None / pusty string → bez limitu."""
+    if tolerance is None or (isinstance(tolerance, str) and not tolerance.strip()):
+        return None
+    return int(pd.Timedelta(tolerance).value)
+
+
+def _as_ns(times: Union[np.ndarray, pd.Index, pd.Series, Sequence]) -> np.ndarray:
+    if isinstance(times, np.ndarray) and times.dtype == np.int64:
+        return times
+    index = pd.DatetimeIndex(pd.to_datetime(times))
+    if index.tz is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+    return index.asi8
+
+
+def sorted_unique(times: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sortuje obserwacje po czasie i zostawia ostatni wiersz z każdego timestampu.
+    Szybka ścieżka: dane już rosnące → bez argsort (tylko O(n) sprawdzenie).
+    """
+    if len(times) > 1 and not (times[1:] >= times[:-1]).all():
+        order = np.argsort(times, kind="stable")
+        times = times[order]
+        values = values[order]
+    if len(times) > 1:
+        last = np.empty(len(times), dtype=bool)
+        np.not_equal(times[1:], times[:-1], out=last[:-1])
+        last[-1] = True
+        if not last.all():
+            times = times[last]
+            values = values[last]
+    return times, values
+
+
+@dataclass
+class Candidates:
+    """Sąsiedzi z lewej (≤ t) i prawej (≥ t) dla każdej godziny prognozy."""
+    left_t: np.ndarray   # (T,) int64, _NO_LEFT gdy brak
+    left_v: np.ndarray   # (T, K) float64
+    right_t: np.ndarray  # (T,) int64, _NO_RIGHT gdy brak
+    right_v: np.ndarray  # (T, K) float64
+
+    @classmethod
+    def empty(cls, n_target: int, n_vars: int) -> "Candidates":
+        return cls(
+            np.full(n_target, _NO_LEFT, dtype=np.int64),
+            np.full((n_target, n_vars), np.nan),
+            np.full(n_target, _NO_RIGHT, dtype=np.int64),
+            np.full((n_target, n_vars), np.nan),
+        )
+
+
+def find_candidates(target: np.ndarray, obs_t: np.ndarray, obs_v: np.ndarray) -> Candidates:
+    """Kandydaci z jednego, posortowanego i unikalnego zbioru obserwacji (`sorted_unique`)."""
+    cand = Candidates.empty(len(target), obs_v.shape[1])
+    m = len(obs_t)
+    if m == 0 or len(target) == 0:
+        return cand
+    right = np.searchsorted(obs_t, target, side="left")
+    left = np.searchsorted(obs_t, target, side="right") - 1
+    has_left = left >= 0
+    has_right = right < m
+    cand.left_t[has_left] = obs_t[left[has_left]]
+    cand.left_v[has_left] = obs_v[left[has_left]]
+    cand.right_t[has_right] = obs_t[right[has_right]]
+    cand.right_v[has_right] = obs_v[right[has_right]]
+    return cand
+
+
+def merge_candidates(acc: Candidates, new: Candidates) -> None:
+    """Łączy kandydatów z kolejnej paczki (w miejscu); ten sam timestamp → nowsza paczka wygrywa."""
+    take_left = new.left_t >= acc.left_t
+    take_left &= new.left_t != _NO_LEFT
+    acc.left_t[take_left] = new.left_t[take_left]
+    acc.left_v[take_left] = new.left_v[take_left]
+    take_right = new.right_t <= acc.right_t
+    take_right &= new.right_t != _NO_RIGHT
+    acc.right_t[take_right] = new.right_t[take_right]
+    acc.right_v[take_right] = new.right_v[take_right]
+
+
+def resolve(
+    target: np.ndarray,
+    cand: Candidates,
+    policy: str = "nearest",
+    tol_ns: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Kandydaci → wartości na osi prognozy.
+    Zwraca (wartości (T, K) z NaN tam, gdzie nic nie pasuje, maska dopasowania (T,)).
+    """
+    if policy not in ALIGN_POLICIES:
+        raise ValueError(f"Nieznana polityka dopasowania: {policy!r} (dostępne: {ALIGN_POLICIES})")
+    big = np.iinfo(np.int64).max
+    has_left = cand.left_t != _NO_LEFT
+    has_right = cand.right_t != _NO_RIGHT
+    d_left = np.where(has_left, target - np.where(has_left, cand.left_t, 0), big)
+    d_right = np.where(has_right, np.where(has_right, cand.right_t, 0) - target, big)
+    limit = big if tol_ns is None else int(tol_ns)
+    ok_left = has_left & (d_left <= limit)
+    ok_right = has_right & (d_right <= limit)
+
+    out = np.full(cand.left_v.shape, np.nan)
+    if policy == "exact":
+        matched = has_left & (d_left == 0)
+        out[matched] = cand.left_v[matched]
+    elif policy == "backward":
+        matched = ok_left
+        out[matched] = cand.left_v[matched]
+    elif policy == "nearest":
+        use_right = ok_right & (~ok_left | (d_right <= d_left))
+        use_left = ok_left & ~use_right
+        out[use_right] = cand.right_v[use_right]
+        out[use_left] = cand.left_v[use_left]
+        matched = use_left | use_right
+    else:  # interpolate
+        hit = has_left & (d_left == 0)
+        between = ok_left & ok_right & ~hit
+        span = (d_left + d_right).astype(np.float64)
+        w = np.divide(d_left, span, out=np.zeros(len(target)), where=between)[:, None]
+        out[between] = ((1.0 - w) * cand.left_v + w * cand.right_v)[between]
+        out[hit] = cand.left_v[hit]
+        matched = hit | between
+    return out, matched
+
+
+def align_arrays(
+    target_times: Union[np.ndarray, pd.Index, Sequence],
+    obs_times: Union[np.ndarray, pd.Index, pd.Series, Sequence],
+    obs_values: np.ndarray,
+    *,
+    policy: str = "nearest",
+    tolerance: Union[None, str, pd.Timedelta] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Wartości obserwacji (n, K) przeniesione na oś prognozy (T,) według polityki.
+    Zwraca (T, K) z NaN dla braków oraz maskę dopasowania.
+    """
+    target = _as_ns(target_times)
+    obs_t = _as_ns(obs_times)
+    obs_v = np.asarray(obs_values, dtype=np.float64)
+    if obs_v.ndim == 1:
+        obs_v = obs_v[:, None]
+    obs_t, obs_v = sorted_unique(obs_t, obs_v)
+    cand = find_candidates(target, obs_t, obs_v)
+    return resolve(target, cand, policy, tolerance_ns(tolerance))
+
+
+def align_frame(
+    forecast_index: pd.Index,
+    actuals_df: pd.DataFrame,
+    *,
+    policy: str = "nearest",
+    tolerance: Union[None, str, pd.Timedelta] = None,
+    time_col: str = "time",
+    columns: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """
+    Obserwacje (kolumna `time_col` albo indeks czasu) przeniesione na indeks prognozy.
+    Wynik ma indeks prognozy; wiersze bez dopasowania są usuwane.
+    """
+    times = actuals_df[time_col] if time_col in actuals_df.columns else actuals_df.index
+    if columns is None:
+        columns = [c for c in actuals_df.columns if c != time_col]
+    columns = list(columns)
+    values = np.column_stack(
+        [pd.to_numeric(actuals_df[c], errors="coerce").to_numpy(dtype=np.float64) for c in columns]
+    ) if columns else np.empty((len(actuals_df), 0))
+    aligned, matched = align_arrays(forecast_index, times, values, policy=policy, tolerance=tolerance)
+    out = pd.DataFrame(aligned, index=forecast_index, columns=columns)
+    return out[matched]
+
+
+def benchmark(n_obs: int = 1_000_000, n_target: int = 200_000, tolerance: str = "30min") -> Dict[str, float]:
+    """Czasy [s] dla każdej polityki (dane posortowane i przetasowane) + pd.merge_asof dla porównania."""
+    import time
+
+    rng = np.random.default_rng(0)
+    start = np.datetime64("2020-01-01T00:00", "ns").astype(np.int64)
+    # obserwacje co ~10 min z jitterem, prognoza co godzinę
+    obs_t = start + np.cumsum(rng.integers(1, 20, n_obs)) * 60_000_000_000
+    obs_v = rng.normal(10, 5, (n_obs, 2))
+    target = start + np.arange(n_target, dtype=np.int64) * 3_600_000_000_000
+    shuffled = rng.permutation(n_obs)
+
+    out: Dict[str, float] = {}
+    for policy in ALIGN_POLICIES:
+        t0 = time.perf_counter()
+        align_arrays(target, obs_t, obs_v, policy=policy, tolerance=tolerance)
+        out[f"{policy}_sorted_s"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    align_arrays(target, obs_t[shuffled], obs_v[shuffled], policy="nearest", tolerance=tolerance)
+    out["nearest_unsorted_s"] = time.perf_counter() - t0
+
+    left = pd.DataFrame({"time": pd.to_datetime(target)})
+    right = pd.DataFrame({"time": pd.to_datetime(obs_t), "a": obs_v[:, 0], "b": obs_v[:, 1]})
+    t0 = time.perf_counter()
+    pd.merge_asof(left, right, on="time", direction="nearest", tolerance=pd.Timedelta(tolerance))
+    out["pandas_merge_asof_nearest_s"] = time.perf_counter() - t0
+    return out
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark dopasowania obserwacji.")
+    parser.add_argument("--obs", type=int, default=1_000_000)
+    parser.add_argument("--target", type=int, default=200_000)
+    parser.add_argument("--tolerance", default="30min")
+    args = parser.parse_args()
+    for k, v in benchmark(args.obs, args.target, args.tolerance).items():
+        print(f"{k:>28}: {v * 1000:8.1f} ms")
@@ -0,0 +1,231 @@
+"""
+ForecastBlock – kolumnowy kontener prognozy dla wielu punktów naraz.
+
+Zamiast listy DataFrame'ów (osobny DatetimeIndex i kolumny float64 per punkt)
+trzymamy jedną oś czasu, jedną oś punktów i jeden blok float32:
+
+    values[punkt, zmienna, czas]
+
+Układ (L, V, T) jest wybrany pod UI: `values[i]` to ciągły blok (zmienne × czas)
+punktu i, więc `to_pandas(i)` to widok bez kopiowania (tak jak frame_from_block
+w weather/parsing.py). Sloty, postprocessing, alerty i weryfikacja przyjmują
+ForecastBlock bezpośrednio.
+"""
+from __future__ import annotations
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from weather.parsing import frame_from_block
+
+
+class ForecastBlock:
+    __slots__ = ("times", "lats", "lons", "variables", "values", "attrs", "_var_index")
+
+    def __init__(
+        self,
+        times: np.ndarray,
+        lats: Sequence[float],
+        lons: Sequence[float],
+        variables: Sequence[str],
+        values: np.ndarray,
+        attrs: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.times = np.asarray(times, dtype="datetime64[ns]")
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.variables: Tuple[str, ...] = tuple(variables)
+        self.values = np.asarray(values, dtype=np.float32)
+        self.attrs: Dict[str, Any] = dict(attrs or {})
+        self._var_index = {name: i for i, name in enumerate(self.variables)}
+
+        expected = (len(self.lats), len(self.variables), len(self.times))
+        if self.values.shape != expected or len(self.lons) != len(self.lats):
+            raise ValueError(f"values ma kształt {self.values.shape}, oczekiwano {expected}")
+
+    # ---------------------------
+    # budowanie
+    # ---------------------------
+
+    @classmethod
+    def allocate(
+        cls,
+        times: np.ndarray,
+        coords: Sequence[Tuple[float, float]],
+        variables: Sequence[str],
+        fill: float = np.nan,
+    ) -> "ForecastBlock":
+        values = np.full((len(coords), len(variables), len(times)), fill, dtype=np.float32)
+        lats = [c[0] for c in coords]
+        lons = [c[1] for c in coords]
+        return cls(times, lats, lons, variables, values)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, lat: float, lon: float) -> "ForecastBlock":
+        """Jeden punkt z DataFrame (indeks czasu, kolumny liczbowe)."""
+        return cls.from_frames([df], [(lat, lon)])
+
+    @classmethod
+    def from_frames(
+        cls,
+        frames: Sequence[Optional[pd.DataFrame]],
+        coords: Sequence[Tuple[float, float]],
+        variables: Optional[Sequence[str]] = None,
+    ) -> "ForecastBlock":
+        """
+        Wiele ramek → jeden blok. Oś czasu to suma osi ramek (zwykle identyczne),
+        brakujące wartości / punkty bez danych → NaN.
+        """
+        present = [f for f in frames if f is not None and not f.empty]
+        if variables is None:
+            variables = list(dict.fromkeys(c for f in present for c in f.columns))
+        times = _union_axis([f.index.to_numpy(dtype="datetime64[ns]") for f in present])
+        block = cls.allocate(times, coords, variables)
+        for i, f in enumerate(frames):
+            if f is None or f.empty:
+                continue
+            pos = _positions(times, f.index.to_numpy(dtype="datetime64[ns]"))
+            for v, name in enumerate(block.variables):
+                if name in f.columns:
+                    block.values[i, v, pos] = f[name].to_numpy(dtype=np.float32)
+        if present:
+            block.attrs.update(present[0].attrs)
+        return block
+
+    @classmethod
+    def from_cube(
+        cls,
+        axes: Sequence[Optional[np.ndarray]],
+        cube: np.ndarray,
+        variables: Sequence[str],
+        coords: Sequence[Tuple[float, float]],
+    ) -> "ForecastBlock":
+        """
+        Z wyniku `parse_open_meteo_multi`. Gdy wszystkie punkty mają tę samą oś
+        (typowo – jedna strefa czasowa), kostka jest przejmowana bez kopiowania.
+        """
+        present = [a for a in axes if a is not None]
+        if not present:
+            return cls.allocate(np.array([], dtype="datetime64[ns]"), coords, variables)
+        first = present[0]
+        if len(first) == cube.shape[2] and all(len(a) == len(first) and (a == first).all() for a in present):
+            values = cube.astype(np.float32, copy=False)
+            for i, a in enumerate(axes):
+                if a is None:
+                    values[i] = np.nan
+            return cls(first, [c[0] for c in coords], [c[1] for c in coords], variables, values)
+
+        times = _union_axis(present)
+        block = cls.allocate(times, coords, variables)
+        for i, a in enumerate(axes):
+            if a is not None:
+                block.values[i][:, _positions(times, a)] = cube[i, :, : len(a)]
+        return block
+
+    # ---------------------------
+    # dostęp
+    # ---------------------------
+
+    @property
+    def n_locations(self) -> int:
+        return int(self.values.shape[0])
+
+    @property
+    def n_times(self) -> int:
+        return int(self.values.shape[2])
+
+    @property
+    def empty(self) -> bool:
+        return self.values.size == 0
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.values.nbytes + self.times.nbytes + self.lats.nbytes + self.lons.nbytes)
+
+    def has(self, name: str) -> bool:
+        return name in self._var_index
+
+    def var(self, name: str) -> np.ndarray:
+        """Widok (punkty × czas) dla zmiennej – zapis zmienia blok."""
+        return self.values[:, self._var_index[name], :]
+
+    def to_pandas(self, location: int = 0) -> pd.DataFrame:
+        """DataFrame dla punktu `location` – widok na blok, bez kopiowania."""
+        df = frame_from_block(self.times, self.values[location], self.variables)
+        df.attrs.update(self.attrs)
+        df.attrs["lat"] = float(self.lats[location])
+        df.attrs["lon"] = float(self.lons[location])
+        return df
+
+    def iter_frames(self) -> Iterable[pd.DataFrame]:
+        for i in range(self.n_locations):
+            yield self.to_pandas(i)
+
+    # ---------------------------
+    # nowe bloki
+    # ---------------------------
+
+    def with_values(self, values: np.ndarray, variables: Optional[Sequence[str]] = None) -> "ForecastBlock":
+        """Nowy blok z innymi wartościami, ale tymi samymi osiami (osie są współdzielone)."""
+        return ForecastBlock(
+            self.times, self.lats, self.lons, variables or self.variables, values, attrs=self.attrs
+        )
+
+    def copy(self) -> "ForecastBlock":
+        return self.with_values(self.values.copy())
+
+    def select(self, locations: Sequence[int]) -> "ForecastBlock":
+        idx = np.asarray(locations, dtype=np.int64)
+        return ForecastBlock(
+            self.times, self.lats[idx], self.lons[idx], self.variables, self.values[idx], attrs=self.attrs
+        )
+
+    def __len__(self) -> int:
+        return self.n_locations
+
+    def __repr__(self) -> str:
+        return (
+            f"ForecastBlock(locations={self.n_locations}, variables={list(self.variables)}, "
+            f"times={self.n_times}, {self.nbytes / 1e6:.1f} MB)"
+        )
+
+
+def _union_axis(axes: Sequence[np.ndarray]) -> np.ndarray:
+    if not axes:
+        return np.array([], dtype="datetime64[ns]")
+    first = axes[0]
+    if all(len(a) == len(first) and (a == first).all() for a in axes[1:]):
+        return first
+    return np.unique(np.concatenate(axes))
+
+
+def _positions(times: np.ndarray, axis: np.ndarray) -> np.ndarray:
+    return np.searchsorted(times, axis)
+
+
+def rolling_mean(values: np.ndarray, window: int, *, center: bool = False) -> np.ndarray:
+    """
+    Średnia ruchoma wzdłuż ostatniej osi (czas) z min_periods=1, pomijająca NaN –
+    `DataFrame.rolling(window, min_periods=1, center=...).mean()` na widoku
+    (czas × wszystkie serie), naraz dla wszystkich punktów / zmiennych.
+
+    Przez pandas, a nie sumy prefiksowe: wynik ma być identyczny co do bitu z ramkową
+    ścieżką – po `.round(2)` różnica o ULP zmienia remisy typu x.xx5.
+    """
+    window = max(1, int(window))
+    n = values.shape[-1]
+    out_dtype = values.dtype if values.dtype.kind == "f" else np.float32
+    if n == 0:
+        return np.empty(values.shape, dtype=out_dtype)
+    x = np.asarray(values, dtype=np.float64)
+    frame = pd.DataFrame(x.reshape(-1, n).T, copy=False)
+    out = frame.rolling(window, min_periods=1, center=center).mean().to_numpy().T.reshape(x.shape)
+    return out.astype(out_dtype, copy=False)
+
+
+def as_frame(data: Any, location: int = 0) -> Optional[pd.DataFrame]:
+    """Ramka dla kodu, który umie tylko pandas: DataFrame bez zmian, ForecastBlock → widok punktu."""
+    if isinstance(data, ForecastBlock):
+        return data.to_pandas(location) if data.n_locations else None
+    return data
@@ -0,0 +1,281 @@
+"""
+Przedziały ufności (block bootstrap) i test różnicy sparowanej dla metryk weryfikacji.
+
+Samo MAE / RMSE nie mówi, czy slot A jest naprawdę lepszy od B – błędy godzinowe
+są silnie autokorelowane, więc zwykły bootstrap (losowanie pojedynczych godzin)
+zawyża pewność. Losujemy całe bloki (domyślnie 24 h, cyklicznie – moving block
+bootstrap z zawijaniem).
+
+Szybko, bo wszystkie metryki to funkcje średnich (|e|, e, e²):
+- sumy w każdym możliwym bloku liczymy raz (sumy prefiksowe),
+- jedna replikacja = suma k ≈ n / L sum blokowych zamiast n próbek,
+- replikacje idą paczkami (macierz startów bloków), opcjonalnie w puli procesów.
+
+Ziarna: SeedSequence(seed).spawn(liczba paczek) – wynik nie zależy od liczby procesów.
+
+Benchmark (rok danych godzinowych, 10k replikacji):
+    python -m weather.bootstrap
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from weather.alignment import align_frame
+
+logger = logging.getLogger(__name__)
+
+BOOTSTRAP_METRICS: Tuple[str, ...] = ("mae", "rmse", "bias")
+DEFAULT_RESAMPLES = int(os.getenv("BOOTSTRAP_RESAMPLES", "10000"))
+DEFAULT_BLOCK_HOURS = int(os.getenv("BOOTSTRAP_BLOCK_HOURS", "24"))
+DEFAULT_BATCH = 1000
+
+
+@dataclass(frozen=True)
+class BootstrapResult:
+    metric: str
+    estimate: float
+    low: float
+    high: float
+    level: float
+    n_samples: int
+    n_resamples: int
+    block_length: int
+
+
+@dataclass(frozen=True)
+class PairedTestResult:
+    """Różnica metryk A − B (ujemna przy MAE / RMSE = A lepszy) + przedział i p-value."""
+    metric: str
+    score_a: float
+    score_b: float
+    diff: float
+    low: float
+    high: float
+    p_value: float
+    level: float
+    n_samples: int
+    n_resamples: int
+    block_length: int
+
+    def significant(self, alpha: Optional[float] = None) -> bool:
+        alpha = 1.0 - self.level if alpha is None else alpha
+        return bool(self.p_value < alpha)
+
+
+def _quantities(errors: np.ndarray, metric: str) -> np.ndarray:
+    """Wielkość uśredniana dla metryki (|e|, e² albo e)."""
+    if metric == "mae":
+        return np.abs(errors)
+    if metric == "rmse":
+        return errors * errors
+    if metric == "bias":
+        return errors
+    raise ValueError(f"Nieznana metryka: {metric!r} (dostępne: {BOOTSTRAP_METRICS})")
+
+
+def _finish(means: np.ndarray, metric: str) -> np.ndarray:
+    return np.sqrt(means) if metric == "rmse" else means
+
+
+def _block_sums(q: np.ndarray, block: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sumy cykliczne dla każdego startu: pełny blok (L) i ostatni, przycięty (r = n − (k − 1)·L).
+    q: (n, kolumny) → dwie tablice (n, kolumny).
+    """
+    n = len(q)
+    k = -(-n // block)
+    tail = n - (k - 1) * block
+    ext = np.concatenate([q, q[:block]], axis=0)
+    csum = np.concatenate([np.zeros((1, q.shape[1])), np.cumsum(ext, axis=0)], axis=0)
+    starts = np.arange(n)
+    return csum[starts + block] - csum[starts], csum[starts + tail] - csum[starts]
+
+
+def _resample_means(
+    full: np.ndarray, tail: np.ndarray, block: int, size: int, seed: np.random.SeedSequence
+) -> np.ndarray:
+    """`size` replikacji → średnie (size, kolumny)."""
+    n = len(full)
+    k = -(-n // block)
+    rng = np.random.default_rng(seed)
+    starts = rng.integers(0, n, size=(size, k))
+    total = tail[starts[:, -1]]
+    if k > 1:
+        total = total + full[starts[:, :-1]].sum(axis=1)
+    return total / n
+
+
+def _resample_worker(args: Tuple[Any, ...]) -> np.ndarray:
+    return _resample_means(*args)
+
+
+def bootstrap_means(
+    q: np.ndarray,
+    *,
+    n_resamples: int = DEFAULT_RESAMPLES,
+    block_length: int = DEFAULT_BLOCK_HOURS,
+    seed: int = 0,
+    batch_size: int = DEFAULT_BATCH,
+    workers: int = 1,
+) -> np.ndarray:
+    """Średnie kolumn `q` (n, kolumny) w `n_resamples` replikacjach block bootstrap."""
+    q = np.asarray(q, dtype=np.float64)
+    if q.ndim == 1:
+        q = q[:, None]
+    block = int(min(max(1, block_length), len(q)))
+    full, tail = _block_sums(q, block)
+    sizes = [min(batch_size, n_resamples - s) for s in range(0, n_resamples, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(full, tail, block, size, child) for size, child in zip(sizes, seeds)]
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_resample_worker, jobs))
+    else:
+        parts = [_resample_worker(job) for job in jobs]
+    return np.concatenate(parts, axis=0)
+
+
+def _clean(*arrays: np.ndarray) -> List[np.ndarray]:
+    """Wspólna maska – pomijamy godziny z brakiem w którejkolwiek serii."""
+    arrays = [np.asarray(a, dtype=np.float64) for a in arrays]
+    valid = np.logical_and.reduce([np.isfinite(a) for a in arrays])
+    return [a[valid] for a in arrays]
+
+
+def block_bootstrap_ci(
+    forecast: np.ndarray,
+    observed: np.ndarray,
+    metric: str = "mae",
+    *,
+    n_resamples: int = DEFAULT_RESAMPLES,
+    block_length: int = DEFAULT_BLOCK_HOURS,
+    level: float = 0.95,
+    seed: int = 0,
+    batch_size: int = DEFAULT_BATCH,
+    workers: int = 1,
+) -> Optional[BootstrapResult]:
+    """Metryka (definicje jak w verify_forecast_vs_actuals, bias = f − a) + percentylowy przedział ufności."""
+    f, a = _clean(forecast, observed)
+    if len(f) < 2:
+        return None
+    q = _quantities(f - a, metric)
+    estimate = float(_finish(q.mean(), metric))
+    stats = _finish(
+        bootstrap_means(q, n_resamples=n_resamples, block_length=block_length, seed=seed,
+                        batch_size=batch_size, workers=workers)[:, 0],
+        metric,
+    )
+    alpha = (1.0 - level) / 2.0
+    low, high = np.quantile(stats, [alpha, 1.0 - alpha])
+    return BootstrapResult(
+        metric, estimate, float(low), float(high), level, len(f), n_resamples, min(block_length, len(f))
+    )
+
+
+def paired_bootstrap_test(
+    forecast_a: np.ndarray,
+    forecast_b: np.ndarray,
+    observed: np.ndarray,
+    metric: str = "mae",
+    *,
+    n_resamples: int = DEFAULT_RESAMPLES,
+    block_length: int = DEFAULT_BLOCK_HOURS,
+    level: float = 0.95,
+    seed: int = 0,
+    batch_size: int = DEFAULT_BATCH,
+    workers: int = 1,
+) -> Optional[PairedTestResult]:
+    """
+    Test różnicy sparowanej A − B: obie prognozy losowane tymi samymi blokami godzin
+    (zachowuje korelację błędów między slotami). p-value dwustronne z rozkładu
+    bootstrapowego przesuniętego do zera (H0: brak różnicy).
+    """
+    fa, fb, a = _clean(forecast_a, forecast_b, observed)
+    if len(a) < 2:
+        return None
+    q = np.column_stack([_quantities(fa - a, metric), _quantities(fb - a, metric)])
+    score_a, score_b = (float(v) for v in _finish(q.mean(axis=0), metric))
+    diff = score_a - score_b
+    means = bootstrap_means(q, n_resamples=n_resamples, block_length=block_length, seed=seed,
+                            batch_size=batch_size, workers=workers)
+    stats = _finish(means, metric)
+    d = stats[:, 0] - stats[:, 1]
+    alpha = (1.0 - level) / 2.0
+    low, high = np.quantile(d, [alpha, 1.0 - alpha])
+    p_value = float((np.abs(d - diff) >= abs(diff)).mean())
+    return PairedTestResult(
+        metric, score_a, score_b, diff, float(low), float(high), p_value, level,
+        len(a), n_resamples, min(block_length, len(a)),
+    )
+
+
+def compare_forecasts(
+    forecast_a: pd.DataFrame,
+    forecast_b: pd.DataFrame,
+    actuals_df: pd.DataFrame,
+    *,
+    variable: str = "temperature_c",
+    metric: str = "mae",
+    align: str = "exact",
+    time_tolerance: Optional[str] = None,
+    **kwargs: Any,
+) -> Optional[PairedTestResult]:
+    """
+    Dwie prognozy (np. wynik dwóch slotów) vs obserwacje z kolumną `time`.
+    Obserwacje są dopasowywane do osi prognozy A (weather/alignment.py).
+    """
+    if variable not in forecast_a.columns or variable not in forecast_b.columns or variable not in actuals_df.columns:
+        return None
+    aligned = align_frame(
+        forecast_a.index, actuals_df, policy=align, tolerance=time_tolerance, columns=[variable]
+    )
+    fa = forecast_a[variable].reindex(aligned.index).to_numpy(dtype=np.float64)
+    fb = forecast_b[variable].reindex(aligned.index).to_numpy(dtype=np.float64)
+    return paired_bootstrap_test(fa, fb, aligned[variable].to_numpy(dtype=np.float64), metric, **kwargs)
+
+
+def benchmark(n_hours: int = 24 * 365, n_resamples: int = 10_000, workers: int = 1) -> Dict[str, float]:
+    import time
+
+    rng = np.random.default_rng(0)
+    # błędy AR(1) – realistyczna autokorelacja godzinowa
+    noise = rng.normal(0, 1, (n_hours, 2))
+    err = np.empty_like(noise)
+    err[0] = noise[0]
+    for i in range(1, n_hours):
+        err[i] = 0.9 * err[i - 1] + noise[i]
+    obs = 10 + 8 * np.sin(np.arange(n_hours) * 2 * np.pi / 24)
+    fa = obs + err[:, 0]
+    fb = obs + 1.05 * err[:, 1]
+
+    out: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    ci = block_bootstrap_ci(fa, obs, "rmse", n_resamples=n_resamples, workers=workers)
+    out["ci_s"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    test = paired_bootstrap_test(fa, fb, obs, "mae", n_resamples=n_resamples, workers=workers)
+    out["paired_s"] = time.perf_counter() - t0
+    out["rmse"] = ci.estimate if ci else float("nan")
+    out["rmse_low"] = ci.low if ci else float("nan")
+    out["rmse_high"] = ci.high if ci else float("nan")
+    out["mae_diff"] = test.diff if test else float("nan")
+    out["p_value"] = test.p_value if test else float("nan")
+    return out
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark block bootstrap.")
+    parser.add_argument("--hours", type=int, default=24 * 365)
+    parser.add_argument("--resamples", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    for k, v in benchmark(args.hours, args.resamples, args.workers).items():
+        print(f"{k:>10}: {v:.4f}")
@@ -0,0 +1,325 @@
+"""
+Trwały cache prognoz na dysku (pod BASE_DIR z core.storage).
+
+- format: .npz (NumPy) – kolumnowo, czas jako int64 [ns], zmienne jako float32,
+- klucz: (źródło, lat/lon przyciągnięte do siatki, dni, strefa czasowa, przebieg modelu),
+- ważność: wpis wygasa, gdy zostanie opublikowany KOLEJNY przebieg modelu
+  (a nie po sztywnym TTL),
+- limit rozmiaru z usuwaniem najdawniej używanych wpisów (LRU po mtime),
+- statystyki: hit ratio, rozmiar, eviction.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from core.disk_budget import DiskBudget
+from core.storage import BASE_DIR
+
+logger = logging.getLogger(__name__)
+
+CACHE_SUBDIR = "forecast-cache"
+DEFAULT_MAX_BYTES = int(os.getenv("FORECAST_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# precyzja klucza, jeśli wywołujący nie przyciągnął współrzędnych do siatki modelu
+DEFAULT_KEY_STEP_DEG = 0.01
+
+
+@dataclass(frozen=True)
+class ModelRunSchedule:
+    """
+    Harmonogram przebiegów modelu: co ile godzin startuje run
+    i po ilu godzinach od startu dane są dostępne w API.
+    """
+    cycle_hours: int = 6
+    publish_delay_hours: float = 4.0
+
+
+# harmonogramy per źródło – dopisz tu kolejne źródła
+MODEL_RUN_SCHEDULES: Dict[str, ModelRunSchedule] = {
+    "open-meteo": ModelRunSchedule(cycle_hours=6, publish_delay_hours=4.0),
+}
+
+
+def _utcnow() -> datetime:
+    return datetime.now(dt_timezone.utc).replace(tzinfo=None)
+
+
+def get_schedule(source: str) -> ModelRunSchedule:
+    return MODEL_RUN_SCHEDULES.get((source or "").lower(), ModelRunSchedule())
+
+
+def current_model_run(source: str, now: Optional[datetime] = None) -> datetime:
+    """
+    Zwraca czas startu (UTC) najnowszego przebiegu modelu, który jest już opublikowany.
+    """
+    sched = get_schedule(source)
+    now = now or _utcnow()
+    available = now - timedelta(hours=sched.publish_delay_hours)
+    floored_hour = (available.hour // sched.cycle_hours) * sched.cycle_hours
+    return available.replace(hour=floored_hour, minute=0, second=0, microsecond=0)
+
+
+def next_publish_time(source: str, model_run: datetime) -> datetime:
+    """Kiedy (UTC) pojawi się przebieg następujący po `model_run`."""
+    sched = get_schedule(source)
+    return model_run + timedelta(hours=sched.cycle_hours + sched.publish_delay_hours)
+
+
+def snap_key_coord(value: float, step: float = DEFAULT_KEY_STEP_DEG) -> float:
+    return round(round(float(value) / step) * step, 6)
+
+
+class ForecastDiskCache:
+    """
+    Cache prognoz w plikach .npz – przeżywa restart / redeploy procesu,
+    więc po wdrożeniu nie walimy stadem zapytań w upstream.
+    """
+
+    def __init__(
+        self,
+        base_dir: Optional[str] = None,
+        *,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        key_step_deg: float = DEFAULT_KEY_STEP_DEG,
+    ) -> None:
+        self.base_dir = base_dir or os.path.join(BASE_DIR, CACHE_SUBDIR)
+        self.max_bytes = max_bytes
+        self.key_step_deg = key_step_deg
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "writes": 0, "errors": 0}
+        # bieżąca suma bajtów / wpisów – bez os.walk przy każdym zapisie
+        self._budget = DiskBudget(self.base_dir, max_bytes)
+
+    # ---------------------------
+    # klucze / ścieżki
+    # ---------------------------
+
+    def make_key(
+        self,
+        source: str,
+        lat: float,
+        lon: float,
+        days: int,
+        timezone: str,
+        model_run: datetime,
+    ) -> str:
+        parts = [
+            (source or "").lower(),
+            f"{snap_key_coord(lat, self.key_step_deg):.6f}",
+            f"{snap_key_coord(lon, self.key_step_deg):.6f}",
+            str(int(days)),
+            timezone or "",
+            model_run.strftime("%Y%m%d%H"),
+        ]
+        return "|".join(parts)
+
+    def _path_for(self, key: str) -> str:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.base_dir, digest[:2], f"{digest}.npz")
+
+    # ---------------------------
+    # get / put
+    # ---------------------------
+
+    def get(
+        self,
+        source: str,
+        lat: float,
+        lon: float,
+        *,
+        days: int,
+        timezone: str = "auto",
+        model_run: Optional[datetime] = None,
+        now: Optional[datetime] = None,
+        allow_expired: bool = False,
+    ) -> Optional[pd.DataFrame]:
+        """
+        Zwraca prognozę z cache albo None (brak / wygasła / uszkodzona).
+
+        `allow_expired=True` oddaje też wpis wygasły (bez kasowania) – baza dla
+        przyrostowego odświeżania, które dociąga tylko zmienioną część.
+        """
+        model_run = model_run or current_model_run(source, now)
+        key = self.make_key(source, lat, lon, days, timezone, model_run)
+        path = self._path_for(key)
+
+        if not os.path.exists(path):
+            self._bump("misses")
+            return None
+
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                meta = json.loads(str(npz["meta"]))
+                if not allow_expired and datetime.fromisoformat(meta["expires_at"]) <= (now or _utcnow()):
+                    expired = True
+                else:
+                    expired = False
+                    df = self._frame_from_npz(npz, meta)
+        except Exception as exc:
+            logger.warning("Uszkodzony wpis cache %s: %s", path, exc)
+            self._bump("errors")
+            self._bump("misses")
+            self._remove(path)
+            return None
+
+        if expired:
+            self._bump("expired")
+            self._bump("misses")
+            self._remove(path)
+            return None
+
+        self._bump("hits")
+        try:
+            os.utime(path)  # LRU – „dotykamy” wpis przy trafieniu
+        except OSError:
+            pass
+        return df
+
+    def put(
+        self,
+        df: pd.DataFrame,
+        source: str,
+        lat: float,
+        lon: float,
+        *,
+        days: int,
+        timezone: str = "auto",
+        model_run: Optional[datetime] = None,
+        now: Optional[datetime] = None,
+    ) -> Optional[str]:
+        """Zapisuje prognozę; zwraca ścieżkę pliku albo None przy błędzie."""
+        if df is None or df.empty:
+            return None
+
+        model_run = model_run or current_model_run(source, now)
+        key = self.make_key(source, lat, lon, days, timezone, model_run)
+        path = self._path_for(key)
+
+        index = pd.DatetimeIndex(df.index)
+        columns = [str(c) for c in df.columns]
+        meta = {
+            "key": key,
+            "source": source,
+            "model_run": model_run.isoformat(),
+            "expires_at": next_publish_time(source, model_run).isoformat(),
+            "columns": columns,
+            "index_name": df.index.name,
+            "tz": str(index.tz) if index.tz is not None else None,
+            "utc_offset_seconds": df.attrs.get("utc_offset_seconds"),
+        }
+        arrays: Dict[str, Any] = {
+            "meta": np.array(json.dumps(meta)),
+            "time": index.asi8,
+        }
+        for i, col in enumerate(columns):
+            arrays[f"c{i}"] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float32)
+
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)  # atomowo – czytelnik nie zobaczy połowy pliku
+        except Exception as exc:
+            logger.warning("Nie udało się zapisać cache %s: %s", path, exc)
+            self._bump("errors")
+            self._remove(tmp_path)
+            return None
+
+        self._bump("writes")
+        self._budget.added(path)
+        self._enforce_budget()
+        return path
+
+    @staticmethod
+    def _frame_from_npz(npz: Any, meta: Dict[str, Any]) -> pd.DataFrame:
+        index = pd.DatetimeIndex(npz["time"].astype("datetime64[ns]"), name=meta.get("index_name"))
+        if meta.get("tz"):
+            index = index.tz_localize("UTC").tz_convert(meta["tz"])
+        data = {col: npz[f"c{i}"] for i, col in enumerate(meta["columns"])}
+        df = pd.DataFrame(data, index=index)
+        df.attrs["model_run"] = meta["model_run"]
+        if meta.get("utc_offset_seconds") is not None:
+            df.attrs["utc_offset_seconds"] = meta["utc_offset_seconds"]
+        return df
+
+    # ---------------------------
+    # sprzątanie / statystyki
+    # ---------------------------
+
+    def _bump(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += n
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        self._budget.removed(path)
+
+    def _entries(self) -> List[Tuple[str, float, int]]:
+        return self._budget.scan()
+
+    def _enforce_budget(self) -> None:
+        # skan drzewa tylko po przekroczeniu limitu; najdawniej używane idą pierwsze
+        self._budget.max_bytes = self.max_bytes
+        evicted = self._budget.enforce(self._remove)
+        if evicted:
+            self._bump("evictions", evicted)
+
+    def purge_expired(self, now: Optional[datetime] = None) -> int:
+        """Usuwa wszystkie wygasłe wpisy (np. z crona). Zwraca ich liczbę."""
+        now = now or _utcnow()
+        removed = 0
+        for path, _mtime, _size in self._entries():
+            try:
+                with np.load(path, allow_pickle=False) as npz:
+                    meta = json.loads(str(npz["meta"]))
+                expired = datetime.fromisoformat(meta["expires_at"]) <= now
+            except Exception:
+                expired = True
+            if expired:
+                self._remove(path)
+                removed += 1
+        if removed:
+            self._bump("expired", removed)
+        return removed
+
+    def clear(self) -> None:
+        for path, _mtime, _size in self._entries():
+            self._remove(path)
+        self._budget.reset()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit ratio, liczba wpisów, rozmiar na dysku i liczniki eviction – do strojenia limitu."""
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+        lookups = out["hits"] + out["misses"]
+        out["hit_ratio"] = out["hits"] / lookups if lookups else 0.0
+        out["entries"] = self._budget.entries
+        out["size_bytes"] = self._budget.total_bytes
+        out["max_bytes"] = self.max_bytes
+        return out
+
+
+_default_cache: Optional[ForecastDiskCache] = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> ForecastDiskCache:
+    """Współdzielona instancja cache dla całego procesu."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = ForecastDiskCache()
+    return _default_cache
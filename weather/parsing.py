@@ -0,0 +1,196 @@
+"""
+Kolumnowe parsowanie JSON-a Open-Meteo prosto do tablic NumPy.
+
+Zamiast DataFrame z list Pythona + `pd.to_datetime` na liście stringów + `set_index`
++ `sort_index` (kilka kopii), robimy:
+- oś czasu liczoną arytmetycznie: start + krok * i (parsujemy tylko 2 pierwsze
+  i ostatni timestamp – pełne parsowanie tylko gdy oś jest nieregularna, np. zmiana czasu),
+- każdą zmienną wpisujemy od razu do prealokowanej tablicy float32,
+- bez sortowania, gdy źródło gwarantuje kolejność (Open-Meteo – tak).
+
+DataFrame dla UI to widok na blok (zmienne × czas) – pandas go nie kopiuje.
+
+Benchmark (16 dni, 50 zmiennych, 1000 punktów):
+    python -m weather.parsing --locations 1000 --variables 50 --days 16
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from weather.variables import CATALOGUE, DEFAULT_VARIABLES
+
+# mapowanie pól open-meteo -> nasze pola (+ wartość, gdy źródło nie zwróciło zmiennej);
+# pełna lista zmiennych i jednostek – weather/variables.py
+OPEN_METEO_VARIABLES: Dict[str, str] = {CATALOGUE[name].open_meteo: name for name in DEFAULT_VARIABLES}
+MISSING_FILL: Dict[str, float] = {
+    spec.name: spec.fill for spec in CATALOGUE.values() if spec.fill is not None
+}
+
+
+def parse_time_axis(times: Sequence[str], *, assume_sorted: bool = True) -> Optional[np.ndarray]:
+    """
+    Zwraca oś czasu jako datetime64[ns].
+
+    Szybka ścieżka: regularny krok → start + krok * arange(n), weryfikowane na ostatnim
+    elemencie. Gdy się nie zgadza (luka, zmiana czasu) – parsujemy wszystko.
+    """
+    n = len(times)
+    if n == 0:
+        return None
+    start = np.datetime64(times[0], "ns")
+    if n == 1:
+        return np.array([start])
+
+    step = np.datetime64(times[1], "ns") - start
+    if step > np.timedelta64(0, "ns"):
+        axis = start + step * np.arange(n)
+        if axis[-1] == np.datetime64(times[-1], "ns"):
+            return axis
+
+    axis = np.array(times, dtype="datetime64[ns]")
+    if not assume_sorted and n > 1 and (np.diff(axis) < np.timedelta64(0, "ns")).any():
+        return None  # sygnał dla wywołującego: trzeba sortować razem z danymi
+    return axis
+
+
+def fill_block(
+    hourly: Mapping[str, Any],
+    out: np.ndarray,
+    variables: Mapping[str, str],
+) -> None:
+    """Wpisuje zmienne z `hourly` do prealokowanego bloku (zmienne × czas)."""
+    for row, (src, name) in enumerate(variables.items()):
+        values = hourly.get(src)
+        if values is None:
+            out[row, :] = MISSING_FILL.get(name, np.nan)
+        else:
+            # None → NaN przy konwersji do float32
+            out[row, :] = values
+
+
+def frame_from_block(times: np.ndarray, block: np.ndarray, columns: Sequence[str]) -> pd.DataFrame:
+    """DataFrame jako widok na blok (zmienne × czas) – bez kopiowania danych."""
+    index = pd.DatetimeIndex(times, name="time")
+    return pd.DataFrame(block.T, index=index, columns=list(columns), copy=False)
+
+
+def parse_open_meteo(
+    data: Optional[Mapping[str, Any]],
+    *,
+    variables: Mapping[str, str] = OPEN_METEO_VARIABLES,
+    assume_sorted: bool = True,
+) -> Optional[pd.DataFrame]:
+    """Jeden punkt Open-Meteo → DataFrame (indeks czasu, kolumny float32)."""
+    if not data or "hourly" not in data:
+        return None
+    hourly = data["hourly"]
+    times = hourly.get("time")
+    if not times:
+        return None
+
+    axis = parse_time_axis(times, assume_sorted=assume_sorted)
+    block = np.empty((len(variables), len(times)), dtype=np.float32)
+    fill_block(hourly, block, variables)
+
+    if axis is None:
+        # źródło nie gwarantuje kolejności – sortujemy raz, razem z danymi
+        axis = np.array(times, dtype="datetime64[ns]")
+        order = np.argsort(axis, kind="stable")
+        axis = axis[order]
+        block = block[:, order]
+
+    df = frame_from_block(axis, block, list(variables.values()))
+    # czas w indeksie jest lokalny – offset potrzebny np. przy przyrostowym odświeżaniu
+    df.attrs["utc_offset_seconds"] = int(data.get("utc_offset_seconds") or 0)
+    return df
+
+
+def parse_open_meteo_multi(
+    payloads: Sequence[Optional[Mapping[str, Any]]],
+    *,
+    variables: Mapping[str, str] = OPEN_METEO_VARIABLES,
+) -> Tuple[List[Optional[np.ndarray]], np.ndarray, List[str]]:
+    """
+    Wiele punktów → jedna prealokowana kostka float32 (punkty × zmienne × czas).
+
+    Zwraca (osie czasu per punkt – None gdy brak danych, kostka, nazwy zmiennych).
+    Punkty mogą mieć różne osie (inna strefa czasowa), ale tę samą długość
+    – krótsze są dopełniane NaN. Widok dla punktu i:
+    `frame_from_block(axes[i], cube[i, :, :len(axes[i])], names)`.
+    """
+    lengths = [len((p or {}).get("hourly", {}).get("time") or []) for p in payloads]
+    n_time = max(lengths, default=0)
+    cube = np.full((len(payloads), len(variables), n_time), np.nan, dtype=np.float32)
+    axes: List[Optional[np.ndarray]] = []
+    for i, payload in enumerate(payloads):
+        if not lengths[i]:
+            axes.append(None)
+            continue
+        hourly = payload["hourly"]  # type: ignore[index]
+        axes.append(parse_time_axis(hourly["time"]))
+        fill_block(hourly, cube[i, :, : lengths[i]], variables)
+    return axes, cube, list(variables.values())
+
+
+def _legacy_parse(data: Mapping[str, Any], variables: Mapping[str, str]) -> pd.DataFrame:
+    """Stara ścieżka (listy → DataFrame → to_datetime → set_index → sort) – tylko do benchmarku."""
+    hourly = data["hourly"]
+    df = pd.DataFrame({"time": pd.to_datetime(hourly["time"])})
+    for src, name in variables.items():
+        df[name] = hourly[src]
+    df.set_index("time", inplace=True)
+    df.sort_index(inplace=True)
+    return df
+
+
+def benchmark(locations: int = 1000, n_variables: int = 50, days: int = 16) -> Dict[str, float]:
+    """Porównanie starej i nowej ścieżki na syntetycznym payloadzie (bez json.loads)."""
+    import time
+
+    rng = np.random.default_rng(0)
+    n_time = days * 24
+    start = np.datetime64("2025-01-01T00:00")
+    times = [str(t)[:16] for t in start + np.arange(n_time).astype("timedelta64[h]")]
+    variables = {f"var_{k}": f"v{k}" for k in range(n_variables)}
+    payloads = []
+    for _ in range(locations):
+        hourly: Dict[str, Any] = {"time": times}
+        for src in variables:
+            hourly[src] = np.round(rng.normal(10, 5, n_time), 1).tolist()
+        payloads.append({"hourly": hourly})
+
+    t0 = time.perf_counter()
+    for p in payloads:
+        _legacy_parse(p, variables)
+    legacy_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for p in payloads:
+        parse_open_meteo(p, variables=variables)
+    single_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    parse_open_meteo_multi(payloads, variables=variables)
+    multi_s = time.perf_counter() - t0
+
+    return {
+        "legacy_s": legacy_s,
+        "columnar_s": single_s,
+        "columnar_multi_s": multi_s,
+        "speedup": legacy_s / single_s,
+        "speedup_multi": legacy_s / multi_s,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark parsowania Open-Meteo.")
+    parser.add_argument("--locations", type=int, default=1000)
+    parser.add_argument("--variables", type=int, default=50)
+    parser.add_argument("--days", type=int, default=16)
+    args = parser.parse_args()
+    for k, v in benchmark(args.locations, args.variables, args.days).items():
+        print(f"{k:>18}: {v:.3f}")
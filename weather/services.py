@@ -1,51 +1,120 @@
 from __future__ import annotations
-from typing import Optional, Dict, Callable, Any
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Optional, Dict, Callable, Any, Iterable, List, Sequence, Tuple, Union
 import logging
+import os
+import threading
 
+import numpy as np
 import pandas as pd
 
-from ingestion.open_meteo_client import fetch_hourly_forecast
+from ingestion.open_meteo_client import fetch_hourly_forecast, fetch_hourly_forecast_multi
+from ingestion.prefetch import get_hot_key_tracker
+from weather.block import ForecastBlock
+from weather.forecast_cache import ForecastDiskCache, current_model_run, get_default_cache, get_schedule
+from weather.parsing import OPEN_METEO_VARIABLES, frame_from_block, parse_open_meteo, parse_open_meteo_multi
+from weather.sources import SOURCE_REGISTRY, FanOutResult
+from weather.variables import CATALOGUE, open_meteo_mapping
 
 logger = logging.getLogger(__name__)
 
-# tu rejestrujemy wszystkie źródła, z których umiemy pobrać dane
-SUPPORTED_SOURCES = ["open-meteo"]
+# przy nowym przebiegu modelu dociągamy tylko zmienioną część prognozy (patrz refresh_hourly_dataframe)
+INCREMENTAL_REFRESH = os.getenv("FORECAST_INCREMENTAL_REFRESH", "1").lower() not in ("0", "false", "no")
+
+# źródła rejestrujemy w weather/sources.py – ta lista jest aktualizowana przy rejestracji
+SUPPORTED_SOURCES = SOURCE_REGISTRY.names_view
 # w przyszłości: ["open-meteo", "ecmwf-proxy", "noaa-gfs"]
 
 
-def _df_from_open_meteo(data: dict) -> Optional[pd.DataFrame]:
+@dataclass(frozen=True)
+class GridSpec:
+    """Natywna siatka modelu źródła: krok i początek siatki w stopniach."""
+    lat_step: float
+    lon_step: float
+    lat_origin: float = 0.0
+    lon_origin: float = 0.0
+
+
+@dataclass(frozen=True)
+class GridCell:
+    """Punkt przyciągnięty do siatki + oryginalny punkt (do wyświetlania)."""
+    source: str
+    lat: float
+    lon: float
+    requested_lat: float
+    requested_lon: float
+
+
+# siatki per źródło – open-meteo "best_match" w Europie to głównie ICON-EU (~0.0625°)
+SOURCE_GRIDS: Dict[str, GridSpec] = {
+    "open-meteo": GridSpec(lat_step=0.0625, lon_step=0.0625),
+}
+
+
+def _snap(value: float, step: float, origin: float) -> float:
+    return round(origin + round((value - origin) / step) * step, 6)
+
+
+def snap_to_grid(lat: float, lon: float, source: str = "open-meteo") -> GridCell:
     """
-    Zamienia surowy JSON Open-Meteo na nasz standardowy DataFrame.
+    Kanonizuje współrzędne do środka komórki natywnej siatki modelu źródła.
+
+    Dwóch userów kilka metrów od siebie trafia w tę samą komórkę → jedno pobranie,
+    jeden wpis w cache. Źródła bez zdefiniowanej siatki zostają bez zmian.
     """
-    if not data or "hourly" not in data:
-        return None
+    source = (source or "").lower()
+    lat = float(lat)
+    lon = float(lon)
+    grid = SOURCE_GRIDS.get(source)
+    if grid is None:
+        return GridCell(source, lat, lon, lat, lon)
 
-    hourly = data["hourly"]
-    times = hourly.get("time")
-    if not times:
-        return None
+    snapped_lat = min(90.0, max(-90.0, _snap(lat, grid.lat_step, grid.lat_origin)))
+    snapped_lon = _snap(lon, grid.lon_step, grid.lon_origin)
+    # zawijanie długości do [-180, 180)
+    snapped_lon = round(((snapped_lon + 180.0) % 360.0) - 180.0, 6)
+    return GridCell(source, snapped_lat, snapped_lon, lat, lon)
 
-    df = pd.DataFrame({"time": pd.to_datetime(times)})
 
-    # mapowanie pól open-meteo -> nasze pola
-    if "temperature_2m" in hourly:
-        df["temperature_c"] = hourly["temperature_2m"]
-    else:
-        df["temperature_c"] = None
+def _annotate_cell(df: pd.DataFrame, cell: GridCell) -> pd.DataFrame:
+    df.attrs["grid_lat"] = cell.lat
+    df.attrs["grid_lon"] = cell.lon
+    df.attrs["requested_lat"] = cell.requested_lat
+    df.attrs["requested_lon"] = cell.requested_lon
+    return df
 
-    if "precipitation" in hourly:
-        df["precip_mm"] = hourly["precipitation"]
-    else:
-        df["precip_mm"] = 0.0
 
-    # możesz tu dopisać:
-    # if "relative_humidity_2m" in hourly: df["humidity"] = hourly["relative_humidity_2m"]
+def _df_from_open_meteo(data: dict) -> Optional[pd.DataFrame]:
+    """
+    Zamienia surowy JSON Open-Meteo na nasz standardowy DataFrame.
+    Parsowanie kolumnowe do float32 – patrz weather/parsing.py.
+    """
+    # Open-Meteo zwraca godziny rosnąco – sortowanie zbędne
+    return parse_open_meteo(data, assume_sorted=True)
 
-    df.set_index("time", inplace=True)
-    # sort na wszelki wypadek
-    df.sort_index(inplace=True)
 
-    return df
+def fetch_open_meteo_frame(
+    lat: float,
+    lon: float,
+    *,
+    timezone: str = "auto",
+    days: int = 7,
+    variables: Optional[Sequence[str]] = None,
+) -> Optional[pd.DataFrame]:
+    """
+    Surowe pobranie z Open-Meteo dla podanego punktu (bez siatki) – używa go `OpenMeteoProvider`.
+    `variables` – nasze nazwy z katalogu (weather/variables.py); domyślnie temperatura + opad.
+    """
+    mapping = open_meteo_mapping(variables) if variables else OPEN_METEO_VARIABLES
+    data = fetch_hourly_forecast(
+        lat=lat,
+        lon=lon,
+        timezone=timezone,
+        forecast_days=days,
+        hourly=tuple(mapping),
+    )
+    return parse_open_meteo(data, variables=mapping, assume_sorted=True)
 
 
 def get_hourly_dataframe(
@@ -55,35 +124,627 @@ def get_hourly_dataframe(
     timezone: str = "auto",
     days: int = 7,
     source: str = "open-meteo",
+    snap: bool = True,
+    variables: Optional[Sequence[str]] = None,
 ) -> Optional[pd.DataFrame]:
     """
     Główny punkt wejścia: pobiera godzinową prognozę z wybranego źródła
     i zwraca ją w naszym ujednoliconym formacie.
 
+    Przy `snap=True` pobiera dla komórki siatki modelu (patrz `snap_to_grid`),
+    a oryginalny punkt zostaje w `df.attrs["requested_lat"/"requested_lon"]`.
+
+    `variables` – nazwy z katalogu weather/variables.py (wiatr, wilgotność, ...);
+    pojedyncze kolumny na żądanie daje też `LazyForecast`.
+
     Zwraca:
-        DataFrame z indexem czasowym i kolumnami:
+        DataFrame z indexem czasowym i kolumnami (domyślnie):
             - temperature_c
             - precip_mm
         albo None, jeśli nie udało się pobrać/przetworzyć.
     """
     source = (source or "").lower()
+    cell = snap_to_grid(lat, lon, source) if snap else GridCell(source, lat, lon, lat, lon)
+
+    provider = SOURCE_REGISTRY.get(source)
+    if provider is None:
+        logger.warning("Źródło %r nie jest wspierane. Dostępne: %s", source, SUPPORTED_SOURCES)
+        return None
+    try:
+        df = provider.fetch_sync(cell.lat, cell.lon, timezone=timezone, days=days, variables=variables)
+    except Exception as e:
+        logger.error("Błąd źródła %s: %s", source, e)
+        return None
+
+    if df is None or df.empty:
+        logger.warning("Brak danych pogodowych dla lat=%s lon=%s ze źródła %s", lat, lon, source)
+        return None
+
+    return _annotate_cell(df, cell)
+
+
+def get_hourly_dataframe_cached(
+    lat: float,
+    lon: float,
+    *,
+    timezone: str = "auto",
+    days: int = 7,
+    source: str = "open-meteo",
+    cache: Optional[ForecastDiskCache] = None,
+    track: bool = True,
+    incremental: bool = INCREMENTAL_REFRESH,
+) -> Optional[pd.DataFrame]:
+    """
+    Jak `get_hourly_dataframe`, ale najpierw sprawdza trwały cache na dysku.
+
+    Wpis żyje do publikacji kolejnego przebiegu modelu, więc po restarcie
+    aplikacji nie pobieramy wszystkiego od nowa. Kluczem jest komórka siatki,
+    nie surowe lat/lon.
+
+    `track=True` zlicza zapytanie jako popyt dla schedulera prefetchu
+    (ingestion/prefetch.py); sam prefetch woła z `track=False`.
+
+    `incremental=True`: gdy jest wpis z poprzedniego przebiegu, dociągamy tylko
+    nowe / nieaktualne godziny (patrz `refresh_hourly_dataframe`).
+    """
+    cache = cache or get_default_cache()
+    model_run = current_model_run(source)
+    cell = snap_to_grid(lat, lon, source)
+    if track:
+        get_hot_key_tracker().record(source, cell.lat, cell.lon, days=days, timezone=timezone)
+
+    df = cache.get(source, cell.lat, cell.lon, days=days, timezone=timezone, model_run=model_run)
+    if df is not None:
+        return _annotate_cell(df, cell)
+
+    previous = None
+    if incremental:
+        # wpis z poprzedniego przebiegu (już wygasły) – baza do dociągnięcia samej różnicy
+        prev_run = model_run - timedelta(hours=get_schedule(source).cycle_hours)
+        previous = cache.get(
+            source, cell.lat, cell.lon, days=days, timezone=timezone, model_run=prev_run, allow_expired=True
+        )
+
+    if previous is not None:
+        df = refresh_hourly_dataframe(
+            previous, cell.lat, cell.lon, timezone=timezone, days=days, source=source, model_run=model_run
+        )
+    else:
+        df = get_hourly_dataframe(cell.lat, cell.lon, timezone=timezone, days=days, source=source, snap=False)
+        if df is not None:
+            df.attrs["model_run"] = model_run.isoformat()
+
+    if df is not None:
+        # nieudane odświeżenie oddaje starą ramkę – takiej nie zapisujemy pod nowym przebiegiem
+        if df.attrs.get("model_run") == model_run.isoformat():
+            cache.put(df, source, cell.lat, cell.lon, days=days, timezone=timezone, model_run=model_run)
+        df = _annotate_cell(df, cell)
+    return df
+
+
+def get_forecast_block(
+    locations: Iterable[Tuple[float, float]],
+    *,
+    timezone: str = "auto",
+    days: int = 7,
+    source: str = "open-meteo",
+) -> Optional[ForecastBlock]:
+    """
+    Wiele punktów → jeden ForecastBlock (wspólna oś czasu, float32) – dla jobów wsadowych.
+
+    Pobiera tak jak `get_hourly_dataframes` (siatka, deduplikacja, zapytania
+    wielopunktowe), ale zamiast listy ramek zwraca kostkę (punkty × zmienne × czas).
+    Współrzędne w bloku to punkty z wejścia; None, gdy nic nie przyszło.
+    """
+    coords = [(float(lat), float(lon)) for lat, lon in locations]
+    source = (source or "").lower()
+    if source != "open-meteo":
+        logger.warning("Źródło %r nie obsługuje ForecastBlock. Dostępne: open-meteo", source)
+        return None
+
+    cells = [snap_to_grid(lat, lon, source) for lat, lon in coords]
+    unique: Dict[Tuple[float, float], int] = {}
+    for cell in cells:
+        unique.setdefault((cell.lat, cell.lon), len(unique))
+    payloads = fetch_hourly_forecast_multi(
+        list(unique),
+        timezone=timezone,
+        forecast_days=days,
+        hourly=tuple(OPEN_METEO_VARIABLES),
+    )
+    axes, cube, names = parse_open_meteo_multi(payloads)
+    if all(a is None for a in axes):
+        logger.warning("Brak danych pogodowych dla %d punktów (źródło %s)", len(coords), source)
+        return None
+
+    order = [unique[(cell.lat, cell.lon)] for cell in cells]
+    if order != list(range(len(unique))):
+        # duplikaty komórek – tu kopia jest nieunikniona (każdy punkt ma własny wiersz)
+        cube = cube[order]
+        axes = [axes[i] for i in order]
+    block = ForecastBlock.from_cube(axes, cube, names, coords)
+    block.attrs["source"] = source
+    block.attrs["grid_lats"] = [cell.lat for cell in cells]
+    block.attrs["grid_lons"] = [cell.lon for cell in cells]
+    return block
+
+
+def get_hourly_dataframes_multi_source(
+    lat: float,
+    lon: float,
+    sources: Optional[Iterable[str]] = None,
+    *,
+    timezone: str = "auto",
+    days: int = 7,
+    deadline_s: Optional[float] = None,
+) -> FanOutResult:
+    """
+    Jeden punkt, wiele źródeł naraz (fan-out asyncio, patrz weather/sources.py).
+
+    Każde źródło dostaje współrzędne przyciągnięte do własnej siatki. Wynik jest
+    częściowy: ramki ze źródeł, które zdążyły, + `errors` / `timed_out` dla reszty.
+    Czekamy najwyżej tyle, ile najwolniejszy timeout (albo `deadline_s`).
+    """
+    names = [n.lower() for n in sources] if sources is not None else SOURCE_REGISTRY.names()
+    cells = {name: snap_to_grid(lat, lon, name) for name in names}
+    result = SOURCE_REGISTRY.fetch_many_sync(
+        lat,
+        lon,
+        names,
+        timezone=timezone,
+        days=days,
+        deadline_s=deadline_s,
+        points={name: (c.lat, c.lon) for name, c in cells.items()},
+    )
+    for name, df in result.frames.items():
+        _annotate_cell(df, cells[name])
+    return result
+
+
+def get_hourly_dataframes(
+    locations: Iterable[Tuple[float, float]],
+    *,
+    timezone: str = "auto",
+    days: int = 7,
+    source: str = "open-meteo",
+    stack: bool = False,
+) -> Union[List[Optional[pd.DataFrame]], Optional[pd.DataFrame]]:
+    """
+    Wersja wsadowa `get_hourly_dataframe` dla wielu punktów (lat, lon).
+
+    Punkty są przyciągane do siatki modelu i deduplikowane, a unikalne komórki
+    pakowane w wielopunktowe zapytania Open-Meteo (po przecinku), dzielone na
+    paczki pod limity URL-a / rozmiaru – zamiast jednego round-tripu na punkt.
+
+    Zwraca:
+        - stack=False: listę DataFrame'ów (albo None) w kolejności `locations`,
+        - stack=True: jeden DataFrame z MultiIndexem (location, time), gdzie
+          `location` to pozycja punktu na liście wejściowej; None gdy nic nie przyszło.
+    """
+    coords = [(float(lat), float(lon)) for lat, lon in locations]
+    source = (source or "").lower()
 
     if source == "open-meteo":
-        data = fetch_hourly_forecast(
-            lat=lat,
-            lon=lon,
+        cells = [snap_to_grid(lat, lon, source) for lat, lon in coords]
+        unique: Dict[Tuple[float, float], int] = {}
+        for cell in cells:
+            unique.setdefault((cell.lat, cell.lon), len(unique))
+        payloads = fetch_hourly_forecast_multi(
+            list(unique),
             timezone=timezone,
             forecast_days=days,
-            # tu można dopisać więcej pól
-            hourly=("temperature_2m", "precipitation"),
+            hourly=tuple(OPEN_METEO_VARIABLES),
         )
-        df = _df_from_open_meteo(data)
+        # jedna prealokowana kostka float32; ramki per komórka to widoki na nią
+        axes, cube, names = parse_open_meteo_multi(payloads)
+        cell_frames = [
+            frame_from_block(axis, cube[i, :, : len(axis)], names) if axis is not None else None
+            for i, axis in enumerate(axes)
+        ]
+        for f, payload in zip(cell_frames, payloads):
+            if f is not None:
+                f.attrs["utc_offset_seconds"] = int(payload.get("utc_offset_seconds") or 0)
+        frames: List[Optional[pd.DataFrame]] = []
+        for cell in cells:
+            f = cell_frames[unique[(cell.lat, cell.lon)]]
+            # każdy punkt dostaje własny obiekt (attrs są per punkt), dane są współdzielone
+            frames.append(_annotate_cell(f.copy(deep=False), cell) if f is not None else None)
     else:
         logger.warning("Źródło %r nie jest wspierane. Dostępne: %s", source, SUPPORTED_SOURCES)
+        frames = [None] * len(coords)
+
+    missing = sum(1 for f in frames if f is None or f.empty)
+    if missing:
+        logger.warning("Brak danych pogodowych dla %d z %d punktów (źródło %s)", missing, len(coords), source)
+
+    if not stack:
+        return frames
+
+    present = {i: f for i, f in enumerate(frames) if f is not None and not f.empty}
+    if not present:
         return None
+    stacked = pd.concat(present, names=["location", "time"])
+    lat_map = {i: coords[i][0] for i in present}
+    lon_map = {i: coords[i][1] for i in present}
+    loc_level = stacked.index.get_level_values("location")
+    stacked["lat"] = loc_level.map(lat_map).to_numpy()
+    stacked["lon"] = loc_level.map(lon_map).to_numpy()
+    return stacked
 
-    if df is None or df.empty:
-        logger.warning("Brak danych pogodowych dla lat=%s lon=%s ze źródła %s", lat, lon, source)
+
+# ---------------------------
+# przyrostowe odświeżanie
+# ---------------------------
+
+_HOUR = np.timedelta64(1, "h")
+_refresh_lock = threading.Lock()
+_refresh_stats = {
+    "full": 0,
+    "incremental": 0,
+    "noop": 0,
+    "in_place": 0,
+    "failed": 0,
+    "values_fetched": 0,
+    "values_full_equiv": 0,
+}
+
+
+def _bump_refresh(**counts: int) -> None:
+    with _refresh_lock:
+        for name, n in counts.items():
+            _refresh_stats[name] += n
+
+
+def get_refresh_stats() -> Dict[str, Any]:
+    """Ile odświeżeń było pełnych / przyrostowych i jaki ułamek wartości faktycznie pobraliśmy."""
+    with _refresh_lock:
+        out: Dict[str, Any] = dict(_refresh_stats)
+    full_equiv = out["values_full_equiv"]
+    out["fetched_ratio"] = out["values_fetched"] / full_equiv if full_equiv else 0.0
+    return out
+
+
+def reset_refresh_stats() -> None:
+    with _refresh_lock:
+        for name in _refresh_stats:
+            _refresh_stats[name] = 0
+
+
+@dataclass
+class _RefreshPlan:
+    """Co trzeba dociągnąć dla jednego punktu i gdzie to wpisać."""
+    previous: pd.DataFrame
+    variables: Dict[str, str]  # pole Open-Meteo → nasza kolumna
+    axis: np.ndarray  # docelowa oś czasu (lokalna, datetime64[ns])
+    block: np.ndarray  # docelowy blok (zmienne × czas) float32
+    in_place: bool  # block to widok na dane `previous`
+    requests: List[Tuple[Tuple[str, ...], str, str]]  # (zmienne źródła, start_hour, end_hour)
+    # pobrane wycinki (wiersz bloku, pozycje, wartości) – wpisywane dopiero, gdy przyjdą wszystkie
+    pending: List[Tuple[int, np.ndarray, np.ndarray]] = field(default_factory=list)
+
+
+def _refresh_variables(previous: Optional[pd.DataFrame]) -> Dict[str, str]:
+    """
+    Zmienne do odświeżenia: domyślne + kolumny z katalogu, które poprzednia ramka już ma
+    (np. dociągnięte porywy). Kolumny spoza katalogu nie mają pola w Open-Meteo – odpadają.
+    """
+    variables = dict(OPEN_METEO_VARIABLES)
+    if previous is not None:
+        extra = [c for c in previous.columns if c in CATALOGUE and c not in variables.values()]
+        variables.update(open_meteo_mapping(extra))
+    return variables
+
+
+def _hour_str(t: np.datetime64) -> str:
+    return str(t.astype("datetime64[m]"))
+
+
+def _values_view(df: pd.DataFrame) -> Optional[np.ndarray]:
+    """Tablica (czas × zmienne) współdzieląca pamięć z ramką – None, gdy pandas trzyma kolumny osobno."""
+    if df.shape[1] == 0:
+        return None
+    values = df.to_numpy()
+    if values.dtype != np.float32 or not values.flags.writeable:
+        return None
+    if not np.may_share_memory(values, df.iloc[:, 0].to_numpy()):
+        return None
+    return values
+
+
+def _plan_refresh(
+    previous: Optional[pd.DataFrame],
+    *,
+    variables: Dict[str, str],
+    days: int,
+    model_run: datetime,
+    now: datetime,
+) -> Optional[_RefreshPlan]:
+    """
+    Porównuje poprzednią ramkę z docelowym horyzontem. None = trzeba pobrać całość
+    (brak poprzedniej ramki, nieznany offset strefy, nieregularna oś, luka na początku).
+    """
+    if previous is None or previous.empty:
+        return None
+    offset = previous.attrs.get("utc_offset_seconds")
+    index = previous.index
+    if offset is None or not isinstance(index, pd.DatetimeIndex) or index.tz is not None:
         return None
+    prev_axis = index.to_numpy(dtype="datetime64[ns]")
+    n_prev = len(prev_axis)
+    if n_prev > 1 and prev_axis[-1] - prev_axis[0] != _HOUR * (n_prev - 1):
+        return None  # luki / zmiana czasu – prościej pobrać od nowa
+
+    now_local = np.datetime64(now, "ns") + np.timedelta64(int(offset), "s")
+    start = now_local.astype("datetime64[D]").astype("datetime64[ns]")
+    axis = start + _HOUR * np.arange(int(days) * 24)
+    end = axis[-1]
+    if prev_axis[0] > start:
+        return None
+
+    names = list(variables.values())
+    present = tuple(src for src, name in variables.items() if name in previous.columns)
+    missing = tuple(src for src, name in variables.items() if name not in previous.columns)
+
+    # nowe godziny na końcu horyzontu…
+    fetch_from = prev_axis[-1] + _HOUR
+    if previous.attrs.get("model_run") != model_run.isoformat():
+        # …a przy nowym przebiegu także przyszłość od bieżącej godziny (przeszłość zostaje)
+        fetch_from = min(fetch_from, now_local.astype("datetime64[h]").astype("datetime64[ns]"))
+    fetch_from = max(fetch_from, start)
+
+    requests: List[Tuple[Tuple[str, ...], str, str]] = []
+    if present and fetch_from <= end:
+        requests.append((present, _hour_str(fetch_from), _hour_str(end)))
+    if missing:
+        requests.append((missing, _hour_str(start), _hour_str(end)))
+
+    same_layout = n_prev == len(axis) and prev_axis[0] == start and list(previous.columns) == names
+    values = _values_view(previous) if same_layout else None
+    if values is not None:
+        return _RefreshPlan(previous, variables, axis, values.T, True, requests)
+
+    # oś się przesunęła (nowy dzień) albo doszła zmienna – nowy blok + przepisanie części wspólnej
+    block = np.full((len(names), len(axis)), np.nan, dtype=np.float32)
+    lo = int((start - prev_axis[0]) // _HOUR)
+    n_keep = min(n_prev - lo, len(axis))
+    if n_keep > 0:
+        for row, name in enumerate(names):
+            if name in previous.columns:
+                block[row, :n_keep] = previous[name].to_numpy(dtype=np.float32)[lo : lo + n_keep]
+    return _RefreshPlan(previous, variables, axis, block, False, requests)
+
+
+def _add_delta(plan: _RefreshPlan, src_vars: Tuple[str, ...], data: Optional[Dict[str, Any]]) -> bool:
+    """
+    Odkłada pobrany wycinek do `plan.pending` (blok planu jeszcze bez zmian).
+    False = nie da się (brak danych / inny offset strefy).
+    """
+    sub = {src: plan.variables[src] for src in src_vars}
+    delta = parse_open_meteo(data, variables=sub)
+    if delta is None or delta.empty:
+        return False
+    if delta.attrs.get("utc_offset_seconds") != plan.previous.attrs.get("utc_offset_seconds"):
+        return False  # zmiana czasu w międzyczasie – oś lokalna się przesunęła
+    pos = (delta.index.to_numpy(dtype="datetime64[ns]") - plan.axis[0]) // _HOUR
+    ok = (pos >= 0) & (pos < len(plan.axis))
+    pos = pos[ok].astype(np.int64)
+    names = list(plan.variables.values())
+    delta_values = delta.to_numpy()
+    for j, src in enumerate(src_vars):
+        plan.pending.append((names.index(plan.variables[src]), pos, delta_values[ok, j]))
+    return True
+
 
+def _finish_plan(plan: _RefreshPlan, model_run: datetime) -> pd.DataFrame:
+    # wszystkie wycinki są już pobrane – dopiero teraz wpisujemy (przy in_place – w `previous`),
+    # więc nieudane odświeżenie nigdy nie zostawia ramki pół na pół ze starego i nowego przebiegu
+    for row, pos, values in plan.pending:
+        plan.block[row, pos] = values
+    plan.pending.clear()
+    if plan.in_place:
+        df = plan.previous
+    else:
+        df = frame_from_block(plan.axis, plan.block, list(plan.variables.values()))
+        df.attrs.update(plan.previous.attrs)
+    df.attrs["model_run"] = model_run.isoformat()
+    return df
+
+
+def _plan_values(plan: _RefreshPlan) -> int:
+    total = 0
+    for src_vars, start_hour, end_hour in plan.requests:
+        hours = (np.datetime64(end_hour) - np.datetime64(start_hour)) // _HOUR + 1
+        total += len(src_vars) * int(hours)
+    return total
+
+
+def refresh_hourly_dataframe(
+    previous: Optional[pd.DataFrame],
+    lat: float,
+    lon: float,
+    *,
+    timezone: str = "auto",
+    days: int = 7,
+    source: str = "open-meteo",
+    model_run: Optional[datetime] = None,
+    now: Optional[datetime] = None,
+) -> Optional[pd.DataFrame]:
+    """
+    Przyrostowe odświeżenie prognozy dla punktu (lat/lon już przyciągnięte do siatki).
+
+    Zamiast pobierać cały horyzont od nowa, dociąga tylko:
+    - godziny, które weszły na koniec horyzontu (nowy dzień),
+    - przy nowym przebiegu modelu – godziny od „teraz” w przód (przeszłość zostaje),
+    - zmienne, których poprzednia ramka nie miała (na cały horyzont).
+
+    Odświeżane są zmienne domyślne + kolumny z katalogu (weather/variables.py), które
+    poprzednia ramka już ma; kolumny spoza katalogu nie przechodzą do nowej ramki.
+
+    Wycinki są najpierw wszystkie pobierane, a wpisywane dopiero, gdy przyszły wszystkie.
+    Gdy oś czasu się nie zmieniła, wartości trafiają w miejscu do bloku float32
+    poprzedniej ramki (zwracany jest ten sam obiekt); inaczej powstaje nowy blok
+    z przepisaną częścią wspólną. Gdy nie da się przyrostowo – pełne pobranie;
+    gdy i to zawiedzie – zwracamy nietkniętą poprzednią ramkę (ze starym
+    `attrs["model_run"]`), żeby UI miało cokolwiek.
+    """
+    source = (source or "").lower()
+    now = now or datetime.now(dt_timezone.utc).replace(tzinfo=None)
+    model_run = model_run or current_model_run(source, now)
+    variables = _refresh_variables(previous)
+    full_equiv = len(variables) * int(days) * 24
+
+    plan = None
+    if source == "open-meteo":
+        plan = _plan_refresh(previous, variables=variables, days=days, model_run=model_run, now=now)
+
+    if plan is not None:
+        if not plan.requests:
+            _bump_refresh(noop=1)
+            return _finish_plan(plan, model_run)
+        applied = True
+        for src_vars, start_hour, end_hour in plan.requests:
+            data = fetch_hourly_forecast(
+                lat, lon, timezone=timezone, hourly=src_vars, start_hour=start_hour, end_hour=end_hour
+            )
+            if not _add_delta(plan, src_vars, data):
+                applied = False
+                break
+        if applied:
+            _bump_refresh(
+                incremental=1,
+                in_place=int(plan.in_place),
+                values_fetched=_plan_values(plan),
+                values_full_equiv=full_equiv,
+            )
+            return _finish_plan(plan, model_run)
+
+    return _full_refresh(
+        previous, lat, lon, timezone=timezone, days=days, source=source, model_run=model_run,
+        variables=list(variables.values()),
+    )
+
+
+def _full_refresh(
+    previous: Optional[pd.DataFrame],
+    lat: float,
+    lon: float,
+    *,
+    timezone: str,
+    days: int,
+    source: str,
+    model_run: datetime,
+    fresh: Optional[pd.DataFrame] = None,
+    variables: Optional[Sequence[str]] = None,
+) -> Optional[pd.DataFrame]:
+    df = fresh
+    if df is None:
+        df = get_hourly_dataframe(
+            lat, lon, timezone=timezone, days=days, source=source, snap=False, variables=variables
+        )
+    if df is None:
+        _bump_refresh(failed=1)
+        return previous
+    full_equiv = df.shape[1] * len(df)
+    _bump_refresh(full=1, values_fetched=full_equiv, values_full_equiv=full_equiv)
+    df.attrs["model_run"] = model_run.isoformat()
     return df
+
+
+def refresh_hourly_dataframes(
+    previous: Sequence[Optional[pd.DataFrame]],
+    locations: Iterable[Tuple[float, float]],
+    *,
+    timezone: str = "auto",
+    days: int = 7,
+    source: str = "open-meteo",
+    model_run: Optional[datetime] = None,
+    now: Optional[datetime] = None,
+) -> List[Optional[pd.DataFrame]]:
+    """
+    Wersja wsadowa `refresh_hourly_dataframe` dla wielu śledzonych punktów.
+
+    Punkty z tym samym wycinkiem (zmienne, start_hour, end_hour) – czyli zwykle
+    wszystkie w jednej strefie czasowej – idą wspólnymi zapytaniami wielopunktowymi.
+    Wycinki punktu są wpisywane dopiero, gdy przyszły wszystkie (jak w wersji pojedynczej).
+    Punkty, których nie da się odświeżyć przyrostowo, lecą pełną ścieżką `get_hourly_dataframes`
+    (a te z dodatkowymi kolumnami z katalogu – pojedynczo, z tymi kolumnami).
+    """
+    source = (source or "").lower()
+    now = now or datetime.now(dt_timezone.utc).replace(tzinfo=None)
+    model_run = model_run or current_model_run(source, now)
+    cells = [snap_to_grid(lat, lon, source) for lat, lon in locations]
+    previous = list(previous)
+    if len(previous) != len(cells):
+        raise ValueError("previous i locations muszą mieć tę samą długość")
+
+    variables = [_refresh_variables(prev) for prev in previous]
+    plans: List[Optional[_RefreshPlan]] = [
+        _plan_refresh(prev, variables=vars_i, days=days, model_run=model_run, now=now)
+        if source == "open-meteo"
+        else None
+        for prev, vars_i in zip(previous, variables)
+    ]
+
+    groups: Dict[Tuple[Tuple[str, ...], str, str], List[int]] = {}
+    for i, plan in enumerate(plans):
+        if plan is not None:
+            for req in plan.requests:
+                groups.setdefault(req, []).append(i)
+
+    for (src_vars, start_hour, end_hour), idxs in groups.items():
+        payloads = fetch_hourly_forecast_multi(
+            [(cells[i].lat, cells[i].lon) for i in idxs],
+            timezone=timezone,
+            hourly=src_vars,
+            start_hour=start_hour,
+            end_hour=end_hour,
+        )
+        for i, data in zip(idxs, payloads):
+            plan = plans[i]
+            if plan is not None and not _add_delta(plan, src_vars, data):
+                plans[i] = None  # spróbujemy pełnej ścieżki; `previous[i]` nietknięte
+
+    out: List[Optional[pd.DataFrame]] = [None] * len(cells)
+    full_idx: List[int] = []
+    for i, plan in enumerate(plans):
+        if plan is None:
+            if len(variables[i]) > len(OPEN_METEO_VARIABLES):
+                df = _full_refresh(
+                    previous[i], cells[i].lat, cells[i].lon, timezone=timezone, days=days,
+                    source=source, model_run=model_run, variables=list(variables[i].values()),
+                )
+                out[i] = _annotate_cell(df, cells[i]) if df is not None else None
+            else:
+                full_idx.append(i)
+            continue
+        if plan.requests:
+            _bump_refresh(
+                incremental=1,
+                in_place=int(plan.in_place),
+                values_fetched=_plan_values(plan),
+                values_full_equiv=len(plan.variables) * int(days) * 24,
+            )
+        else:
+            _bump_refresh(noop=1)
+        out[i] = _annotate_cell(_finish_plan(plan, model_run), cells[i])
+
+    if full_idx:
+        fresh = get_hourly_dataframes(
+            [(cells[i].lat, cells[i].lon) for i in full_idx], timezone=timezone, days=days, source=source
+        )
+        for i, df in zip(full_idx, fresh):  # type: ignore[arg-type]
+            if df is None:
+                _bump_refresh(failed=1)
+                out[i] = previous[i]
+                continue
+            out[i] = _full_refresh(
+                previous[i],
+                cells[i].lat,
+                cells[i].lon,
+                timezone=timezone,
+                days=days,
+                source=source,
+                model_run=model_run,
+                fresh=df,
+            )
+    return out
@@ -0,0 +1,323 @@
+"""
+Rejestr źródeł prognoz + asynchroniczny fan-out do wielu dostawców naraz.
+
+- każdy dostawca (`ForecastProvider`) ma własny timeout i limit współbieżności,
+- `SourceRegistry.fetch_many()` odpytuje wybrane źródła równolegle (asyncio) i zwraca
+  wyniki częściowe: co przyszło w czasie – jest, co padło / nie zdążyło – ląduje
+  w `errors` / `timed_out`,
+- latencja = najwolniejsze źródło, na które chcemy czekać (timeout / deadline),
+  a nie suma wszystkich.
+
+Fałszywe lokalne źródła (`FakeProvider`, `register_fake_providers`) pozwalają testować
+fan-out bez sieci.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import logging
+import threading
+import time
+import weakref
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class ForecastProvider:
+    """
+    Bazowy dostawca prognozy. Wystarczy zaimplementować `fetch_sync` –
+    wersja async domyślnie odpala ją w wątku (asyncio.to_thread).
+    Dostawcy natywnie asynchroniczni nadpisują `fetch`.
+    """
+
+    name: str = "base"
+
+    def __init__(self, *, timeout_s: float = 10.0, max_concurrency: int = 8) -> None:
+        self.timeout_s = timeout_s
+        self.max_concurrency = max_concurrency
+        # semafor per pętla zdarzeń (asyncio.Semaphore jest przywiązany do pętli)
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def fetch_sync(
+        self, lat: float, lon: float, *, timezone: str, days: int, variables: Optional[Sequence[str]] = None
+    ) -> Optional[pd.DataFrame]:
+        raise NotImplementedError
+
+    async def fetch(
+        self, lat: float, lon: float, *, timezone: str, days: int, variables: Optional[Sequence[str]] = None
+    ) -> Optional[pd.DataFrame]:
+        return await asyncio.to_thread(
+            self.fetch_sync, lat, lon, timezone=timezone, days=days, variables=variables
+        )
+
+    def semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        sem = self._semaphores.get(loop)
+        if sem is None:
+            sem = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = sem
+        return sem
+
+
+class OpenMeteoProvider(ForecastProvider):
+    name = "open-meteo"
+
+    def fetch_sync(
+        self, lat: float, lon: float, *, timezone: str, days: int, variables: Optional[Sequence[str]] = None
+    ) -> Optional[pd.DataFrame]:
+        # import lokalny – services importuje rejestr z tego modułu
+        from weather.services import fetch_open_meteo_frame
+
+        return fetch_open_meteo_frame(lat, lon, timezone=timezone, days=days, variables=variables)
+
+
+class FakeProvider(ForecastProvider):
+    """
+    Lokalne, syntetyczne źródło do testów: stałe opóźnienie, opcjonalnie błąd,
+    przesunięcie temperatury (żeby źródła się od siebie różniły).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        latency_s: float = 0.0,
+        fail: bool = False,
+        temp_offset: float = 0.0,
+        timeout_s: float = 5.0,
+        max_concurrency: int = 8,
+    ) -> None:
+        super().__init__(timeout_s=timeout_s, max_concurrency=max_concurrency)
+        self.name = name
+        self.latency_s = latency_s
+        self.fail = fail
+        self.temp_offset = temp_offset
+
+    def _build(self, lat: float, lon: float, days: int, variables: Optional[Sequence[str]]) -> pd.DataFrame:
+        from ingestion.fake_server import build_fake_forecast
+        from weather.parsing import parse_open_meteo
+        from weather.variables import DEFAULT_VARIABLES, open_meteo_mapping
+
+        mapping = open_meteo_mapping(variables or DEFAULT_VARIABLES)
+        payload = build_fake_forecast(lat, lon, list(mapping), days)
+        df = parse_open_meteo(payload, variables=mapping)
+        if self.temp_offset and "temperature_c" in df.columns:
+            df["temperature_c"] += self.temp_offset
+        return df
+
+    def fetch_sync(
+        self, lat: float, lon: float, *, timezone: str, days: int, variables: Optional[Sequence[str]] = None
+    ) -> Optional[pd.DataFrame]:
+        time.sleep(self.latency_s)
+        if self.fail:
+            raise RuntimeError(f"{self.name}: symulowana awaria")
+        return self._build(lat, lon, days, variables)
+
+    async def fetch(
+        self, lat: float, lon: float, *, timezone: str, days: int, variables: Optional[Sequence[str]] = None
+    ) -> Optional[pd.DataFrame]:
+        await asyncio.sleep(self.latency_s)
+        if self.fail:
+            raise RuntimeError(f"{self.name}: symulowana awaria")
+        return self._build(lat, lon, days, variables)
+
+
+class SyncFakeProvider(FakeProvider):
+    """Jak FakeProvider, ale bez własnego `fetch` – opóźnienie to blokujący sleep w wątku."""
+
+    fetch = ForecastProvider.fetch
+
+
+@dataclass
+class FanOutResult:
+    """Wynik fan-outu: ramki per źródło + co padło / nie zdążyło + czasy."""
+    frames: Dict[str, pd.DataFrame] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    timed_out: List[str] = field(default_factory=list)
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+    total_ms: float = 0.0
+
+    @property
+    def complete(self) -> bool:
+        return not self.errors and not self.timed_out
+
+
+class SourceRegistry:
+    """Rejestr dostawców – zastępuje if/else po nazwie źródła."""
+
+    def __init__(self) -> None:
+        self._providers: Dict[str, ForecastProvider] = {}
+        self._lock = threading.Lock()
+        # lista nazw aktualizowana w miejscu – można ją wystawić jako stałą modułu
+        self.names_view: List[str] = []
+
+    def register(self, provider: ForecastProvider) -> ForecastProvider:
+        with self._lock:
+            self._providers[provider.name] = provider
+            if provider.name not in self.names_view:
+                self.names_view.append(provider.name)
+        return provider
+
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            self._providers.pop(name, None)
+            if name in self.names_view:
+                self.names_view.remove(name)
+
+    def get(self, name: str) -> Optional[ForecastProvider]:
+        return self._providers.get((name or "").lower())
+
+    def names(self) -> List[str]:
+        return list(self.names_view)
+
+    async def _fetch_one(
+        self, provider: ForecastProvider, lat: float, lon: float, timezone: str, days: int
+    ) -> Optional[pd.DataFrame]:
+        async def _limited() -> Optional[pd.DataFrame]:
+            async with provider.semaphore():
+                return await provider.fetch(lat, lon, timezone=timezone, days=days)
+
+        # czekanie na wolne miejsce u dostawcy też liczy się do jego timeoutu
+        return await asyncio.wait_for(_limited(), timeout=provider.timeout_s)
+
+    async def fetch_many(
+        self,
+        lat: float,
+        lon: float,
+        sources: Optional[Iterable[str]] = None,
+        *,
+        timezone: str = "auto",
+        days: int = 7,
+        deadline_s: Optional[float] = None,
+        points: Optional[Dict[str, Tuple[float, float]]] = None,
+    ) -> FanOutResult:
+        """
+        Odpytuje źródła równolegle. Każde ma własny timeout (`provider.timeout_s`);
+        `deadline_s` dodatkowo ucina cały fan-out – co nie zdążyło, trafia do `timed_out`.
+        `points` pozwala podać inne współrzędne per źródło (np. przyciągnięte do jego siatki).
+        """
+        points = points or {}
+        names = list(sources) if sources is not None else self.names()
+        result = FanOutResult()
+        t0 = time.perf_counter()
+
+        tasks: Dict[asyncio.Task, str] = {}
+        for name in names:
+            provider = self.get(name)
+            if provider is None:
+                result.errors[name] = "nieznane źródło"
+                continue
+            p_lat, p_lon = points.get(name, (lat, lon))
+            task = asyncio.create_task(self._fetch_one(provider, p_lat, p_lon, timezone, days))
+            task.add_done_callback(
+                lambda _t, n=name: result.timings_ms.__setitem__(n, (time.perf_counter() - t0) * 1000.0)
+            )
+            tasks[task] = name
+
+        if tasks:
+            done, pending = await asyncio.wait(tasks, timeout=deadline_s)
+            for task in pending:
+                task.cancel()
+                result.timed_out.append(tasks[task])
+            for task in done:
+                name = tasks[task]
+                exc = task.exception()
+                if isinstance(exc, asyncio.TimeoutError):
+                    result.timed_out.append(name)
+                elif exc is not None:
+                    result.errors[name] = str(exc) or type(exc).__name__
+                else:
+                    df = task.result()
+                    if df is None or df.empty:
+                        result.errors[name] = "brak danych"
+                    else:
+                        result.frames[name] = df
+
+        result.total_ms = (time.perf_counter() - t0) * 1000.0
+        if not result.complete:
+            logger.info(
+                "Fan-out częściowy: ok=%s błędy=%s timeout=%s",
+                list(result.frames), list(result.errors), result.timed_out,
+            )
+        return result
+
+    def fetch_many_sync(self, lat: float, lon: float, sources: Optional[Iterable[str]] = None, **kwargs: Any) -> FanOutResult:
+        """Wersja dla kodu synchronicznego (skrypt Streamlita, joby wsadowe)."""
+        names = list(sources) if sources is not None else self.names()
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return self._run_isolated(lat, lon, names, kwargs)
+        # jesteśmy w pętli zdarzeń – odpalamy osobną w wątku, żeby jej nie blokować rekurencyjnie
+        box: Dict[str, FanOutResult] = {}
+        thread = threading.Thread(
+            target=lambda: box.__setitem__("r", self._run_isolated(lat, lon, names, kwargs))
+        )
+        thread.start()
+        thread.join()
+        return box["r"]
+
+    def _run_isolated(self, lat: float, lon: float, names: List[str], kwargs: Dict[str, Any]) -> FanOutResult:
+        """
+        Własna pętla + własna pula wątków dla blokujących `fetch_sync`.
+
+        Nie `asyncio.run`: ono na końcu czeka na domyślny executor, czyli na każdego
+        dostawcę, który przekroczył timeout – synchroniczny wołający blokowałby się
+        mimo `timeout_s` / `deadline_s`. Tu pulę zamykamy bez czekania; zawieszony
+        wątek dokończy w tle, a jego wynik przepada.
+        """
+        loop = asyncio.new_event_loop()
+        executor = ThreadPoolExecutor(max_workers=max(1, len(names)), thread_name_prefix="fanout")
+        loop.set_default_executor(executor)
+        try:
+            return loop.run_until_complete(self.fetch_many(lat, lon, names, **kwargs))
+        finally:
+            try:
+                pending = asyncio.all_tasks(loop)
+                for task in pending:
+                    task.cancel()
+                if pending:
+                    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+                loop.run_until_complete(loop.shutdown_asyncgens())
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+                loop.close()
+
+
+SOURCE_REGISTRY = SourceRegistry()
+SOURCE_REGISTRY.register(OpenMeteoProvider())
+
+
+def register_fake_providers(registry: SourceRegistry = SOURCE_REGISTRY) -> List[str]:
+    """Rejestruje zestaw lokalnych źródeł do testów fan-outu (szybkie, wolne, zawodne)."""
+    providers = [
+        FakeProvider("fake-fast", latency_s=0.01),
+        FakeProvider("fake-slow", latency_s=0.5, temp_offset=0.5),
+        FakeProvider("fake-flaky", latency_s=0.02, fail=True),
+        FakeProvider("fake-hanging", latency_s=30.0, timeout_s=1.0),
+        # blokujące `fetch_sync` w wątku – ścieżka, którą idą prawdziwi dostawcy HTTP
+        SyncFakeProvider("fake-blocking", latency_s=4.0, timeout_s=0.5),
+    ]
+    for p in providers:
+        registry.register(p)
+    return [p.name for p in providers]
+
+
+if __name__ == "__main__":
+    # demo offline: szybkie + wolne + zawodne + wiszące źródło, deadline 2 s
+    logging.basicConfig(level=logging.INFO)
+    registry = SourceRegistry()
+    fakes = register_fake_providers(registry)
+    t0 = time.perf_counter()
+    res = registry.fetch_many_sync(52.23, 21.01, fakes, deadline_s=2.0)
+    wall_s = time.perf_counter() - t0
+    print(f"ok: {sorted(res.frames)}")
+    print(f"błędy: {res.errors}")
+    print(f"timeout: {res.timed_out}")
+    print(f"czasy [ms]: { {k: round(v, 1) for k, v in res.timings_ms.items()} }")
+    print(f"łącznie: {res.total_ms:.0f} ms, zegar ściany: {wall_s:.2f} s (suma opóźnień źródeł: ~35.5 s)")
@@ -0,0 +1,247 @@
+"""
+Katalog zmiennych prognozy + leniwe dociąganie kolumn.
+
+Nie każda strona potrzebuje wiatru, ciśnienia czy zachmurzenia, więc:
+- `CATALOGUE` opisuje każdą zmienną (nasza nazwa, pole Open-Meteo, jednostka, dtype),
+- `LazyForecast` trzyma tylko to, co już ktoś przeczytał – kolumna jest pobierana,
+  parsowana i trzymana w pamięci dopiero przy pierwszym dostępie (`lf["wind_gusts_kmh"]`).
+
+LazyForecast udaje DataFrame na tyle, na ile potrzebują tego wykresy / alerty
+(`.columns`, `.empty`, `.index`, `[...]`) – `.columns` to wszystkie zmienne
+dostępne w katalogu, a nie tylko już pobrane.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from core.ttl_cache import MISSING, TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class VariableSpec:
+    """Opis zmiennej: nasza kolumna, pole w Open-Meteo, jednostka, dtype i wartość dla braku."""
+    name: str
+    open_meteo: str
+    unit: str
+    dtype: str = "float32"
+    fill: Optional[float] = None
+    label_pl: str = ""
+    label_en: str = ""
+
+    def label(self, lang: str = "pl") -> str:
+        text = self.label_pl if lang == "pl" else self.label_en
+        return f"{text or self.name} ({self.unit})"
+
+
+CATALOGUE: Dict[str, VariableSpec] = {
+    spec.name: spec
+    for spec in (
+        VariableSpec("temperature_c", "temperature_2m", "°C", label_pl="Temperatura", label_en="Temperature"),
+        VariableSpec("precip_mm", "precipitation", "mm", fill=0.0, label_pl="Opad", label_en="Precipitation"),
+        VariableSpec("humidity_pct", "relative_humidity_2m", "%", label_pl="Wilgotność", label_en="Humidity"),
+        VariableSpec("wind_speed_kmh", "wind_speed_10m", "km/h", label_pl="Wiatr", label_en="Wind speed"),
+        VariableSpec("wind_dir_deg", "wind_direction_10m", "°", label_pl="Kierunek wiatru", label_en="Wind direction"),
+        VariableSpec("wind_gusts_kmh", "wind_gusts_10m", "km/h", label_pl="Porywy wiatru", label_en="Wind gusts"),
+        VariableSpec("pressure_hpa", "pressure_msl", "hPa", label_pl="Ciśnienie", label_en="Pressure"),
+        VariableSpec("cloud_cover_pct", "cloud_cover", "%", label_pl="Zachmurzenie", label_en="Cloud cover"),
+        VariableSpec("snowfall_cm", "snowfall", "cm", fill=0.0, label_pl="Opad śniegu", label_en="Snowfall"),
+    )
+}
+
+# to, co pobieramy zawsze (tekst, sloty, postprocessing)
+DEFAULT_VARIABLES: Tuple[str, ...] = ("temperature_c", "precip_mm")
+
+# kolumny dociągane leniwie trzymamy do końca przebiegu modelu (~6 h) – domyślnie 3 h
+LAZY_CACHE_SIZE = int(os.getenv("LAZY_VARIABLES_CACHE_SIZE", "2048"))
+LAZY_CACHE_TTL_S = float(os.getenv("LAZY_VARIABLES_CACHE_TTL_S", "10800"))
+LAZY_CACHE = TTLCache(LAZY_CACHE_SIZE, LAZY_CACHE_TTL_S, name="lazy-variables")
+
+
+def get_spec(name: str) -> Optional[VariableSpec]:
+    return CATALOGUE.get(name)
+
+
+def open_meteo_mapping(names: Iterable[str]) -> Dict[str, str]:
+    """Nasze nazwy → {pole Open-Meteo: nasza nazwa} (format `variables` w weather/parsing.py)."""
+    out: Dict[str, str] = {}
+    for name in names:
+        spec = CATALOGUE.get(name)
+        if spec is None:
+            logger.warning("Nieznana zmienna %r – pomijam (katalog: %s)", name, list(CATALOGUE))
+            continue
+        out[spec.open_meteo] = spec.name
+    return out
+
+
+def fetch_variables(
+    lat: float,
+    lon: float,
+    names: Sequence[str],
+    *,
+    timezone: str = "auto",
+    days: int = 7,
+) -> Optional[pd.DataFrame]:
+    """Pobiera z Open-Meteo tylko wskazane zmienne (jedno zapytanie), w dtype z katalogu."""
+    from ingestion.open_meteo_client import fetch_hourly_forecast
+    from weather.parsing import parse_open_meteo
+
+    mapping = open_meteo_mapping(names)
+    if not mapping:
+        return None
+    data = fetch_hourly_forecast(lat, lon, timezone=timezone, forecast_days=days, hourly=tuple(mapping))
+    df = parse_open_meteo(data, variables=mapping)
+    if df is None:
+        return None
+    for name in df.columns:
+        dtype = CATALOGUE[name].dtype
+        if df[name].dtype != np.dtype(dtype):
+            df[name] = df[name].astype(dtype)
+    return df
+
+
+class LazyForecast:
+    """
+    Prognoza dla jednego punktu z kolumnami materializowanymi przy pierwszym dostępie.
+
+    `base` – ramka z już pobranymi kolumnami (np. temperatura/opad po slotach
+    i postprocessingu); reszta katalogu jest dociągana przez `fetch_variables`
+    i zapamiętywana w LAZY_CACHE (klucz: punkt, strefa, dni, przebieg modelu),
+    więc rerun Streamlita nie pobiera jej ponownie.
+    """
+
+    def __init__(
+        self,
+        lat: float,
+        lon: float,
+        *,
+        timezone: str = "auto",
+        days: int = 7,
+        base: Optional[pd.DataFrame] = None,
+        model_run: Optional[str] = None,
+        cache: Optional[TTLCache] = LAZY_CACHE,
+    ) -> None:
+        self.lat = float(lat)
+        self.lon = float(lon)
+        self.timezone = timezone
+        self.days = int(days)
+        self.model_run = model_run or (base.attrs.get("model_run") if base is not None else None)
+        self._cache = cache
+        self._lock = threading.Lock()
+        self._frame: Optional[pd.DataFrame] = base
+        self._failed: set = set()
+
+    # --- API a la DataFrame ---
+
+    @property
+    def columns(self) -> pd.Index:
+        return pd.Index(list(CATALOGUE))
+
+    @property
+    def loaded(self) -> List[str]:
+        return [] if self._frame is None else list(self._frame.columns)
+
+    @property
+    def index(self) -> pd.Index:
+        if self._frame is None:
+            self.require(*DEFAULT_VARIABLES)
+        return self._frame.index if self._frame is not None else pd.DatetimeIndex([])
+
+    @property
+    def empty(self) -> bool:
+        return len(self.index) == 0
+
+    @property
+    def attrs(self) -> Dict[str, Any]:
+        return self._frame.attrs if self._frame is not None else {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in CATALOGUE
+
+    def __getitem__(self, key: Union[str, Sequence[str]]) -> Union[pd.Series, pd.DataFrame]:
+        if isinstance(key, str):
+            self.require(key)
+            if self._frame is None or key not in self._frame.columns:
+                raise KeyError(key)
+            return self._frame[key]
+        names = list(key)
+        self.require(*names)
+        present = [n for n in names if self._frame is not None and n in self._frame.columns]
+        if len(present) != len(names):
+            raise KeyError([n for n in names if n not in present])
+        return self._frame[present]  # type: ignore[index]
+
+    def get(self, name: str, default: Any = None) -> Any:
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def to_frame(self, names: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Ramka z podanymi kolumnami (domyślnie – tylko już pobrane)."""
+        if names is None:
+            return self._frame if self._frame is not None else pd.DataFrame()
+        return self[list(names)]  # type: ignore[return-value]
+
+    # --- materializacja ---
+
+    def _cache_key(self, name: str) -> Tuple[Any, ...]:
+        return (round(self.lat, 4), round(self.lon, 4), self.timezone, self.days, self.model_run, name)
+
+    def require(self, *names: str) -> List[str]:
+        """
+        Dociąga brakujące kolumny – wszystkie naraz, jednym zapytaniem.
+        Zwraca listę tych, których nie udało się pobrać.
+        """
+        with self._lock:
+            missing = [
+                n for n in dict.fromkeys(names)
+                if n in CATALOGUE and n not in self._failed and (self._frame is None or n not in self._frame.columns)
+            ]
+            if not missing:
+                return [n for n in names if n in self._failed or n not in CATALOGUE]
+
+            columns: Dict[str, pd.Series] = {}
+            to_fetch: List[str] = []
+            for name in missing:
+                hit = self._cache.get(self._cache_key(name)) if self._cache is not None else MISSING
+                if hit is MISSING:
+                    to_fetch.append(name)
+                else:
+                    columns[name] = hit
+
+            if to_fetch:
+                fetched = fetch_variables(self.lat, self.lon, to_fetch, timezone=self.timezone, days=self.days)
+                for name in to_fetch:
+                    if fetched is None or name not in fetched.columns:
+                        self._failed.add(name)
+                        continue
+                    columns[name] = fetched[name]
+                    if self._cache is not None:
+                        self._cache.set(self._cache_key(name), fetched[name])
+
+            if columns:
+                self._merge(columns)
+            return [n for n in names if n in self._failed or n not in CATALOGUE]
+
+    def _merge(self, columns: Dict[str, pd.Series]) -> None:
+        if self._frame is None:
+            self._frame = pd.DataFrame(columns)
+            self._frame.index.name = "time"
+            return
+        frame = self._frame.copy(deep=False)
+        for name, series in columns.items():
+            # wyrównanie do osi bazowej (ta sama oś → reindex bez kopiowania logiki)
+            frame[name] = series.reindex(frame.index)
+        frame.attrs.update(self._frame.attrs)
+        self._frame = frame
+
+    def __repr__(self) -> str:
+        return f"LazyForecast(lat={self.lat}, lon={self.lon}, loaded={self.loaded})"
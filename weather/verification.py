@@ -1,8 +1,23 @@
 from __future__ import annotations
-from typing import Dict, Optional
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import os
+
 import pandas as pd
 import numpy as np
 
+from weather.alignment import (
+    ALIGN_POLICIES,
+    Candidates,
+    _as_ns,
+    align_frame,
+    find_candidates,
+    merge_candidates,
+    resolve,
+    sorted_unique,
+    tolerance_ns,
+)
+from weather.block import ForecastBlock
+
 
 def _safe_corr(a: pd.Series, b: pd.Series) -> float:
     # korelacja może się wywalić przy małej liczbie próbek
@@ -15,10 +30,12 @@ def _safe_corr(a: pd.Series, b: pd.Series) -> float:
 
 
 def verify_forecast_vs_actuals(
-    forecast_df: pd.DataFrame,
+    forecast_df: Union[pd.DataFrame, ForecastBlock],
     actuals_df: pd.DataFrame,
     *,
     time_tolerance: Optional[str] = None,
+    location: int = 0,
+    align: Optional[str] = None,
 ) -> Dict[str, float]:
     """
     Porównuje prognozę z obserwacjami i zwraca zestaw metryk.
@@ -31,6 +48,10 @@ def verify_forecast_vs_actuals(
         actuals_df: DataFrame z obserwacjami (kolumna 'time')
         time_tolerance: np. '5min' – wtedy próbuje dopasować czasy z tolerancją
                         (przydatne gdy obserwacje są o 10:05 a prognoza o 10:00)
+        location: który punkt bloku weryfikujemy, gdy forecast_df to ForecastBlock
+        align: polityka dopasowania z weather/alignment.py ("exact", "nearest",
+               "backward", "interpolate"); domyślnie "nearest" z tolerancją,
+               a bez niej zwykły join po timestampie
 
     Returns:
         dict z metrykami (można spokojnie serializować do JSON).
@@ -41,16 +62,18 @@ def verify_forecast_vs_actuals(
     actuals_df.set_index("time", inplace=True)
     actuals_df.sort_index(inplace=True)
 
+    if isinstance(forecast_df, ForecastBlock):
+        forecast_df = forecast_df.to_pandas(location)
     forecast_df = forecast_df.copy()
     forecast_df.sort_index(inplace=True)
 
     # --- dopasowanie czasów ---
-    if time_tolerance:
-        # resample obserwacji do tego samego kroku co prognoza (przybliżenie)
-        # np. jeśli prognoza jest co godzinę, a time_tolerance="10min", to weźmiemy najbliższy punkt
-        actuals_aligned = actuals_df.reindex(
+    if time_tolerance or align:
+        # obserwacje przeniesione na oś prognozy (merge-asof, weather/alignment.py)
+        actuals_aligned = align_frame(
             forecast_df.index,
-            method="nearest",
+            actuals_df,
+            policy=align or "nearest",
             tolerance=time_tolerance,
         )
         joined = forecast_df.join(
@@ -116,3 +139,553 @@ def verify_forecast_vs_actuals(
         metrics["precip_corr"] = _safe_corr(a, f)
 
     return metrics
+
+
+# ---------------------------
+# weryfikacja strumieniowa (duże archiwa stacji)
+# ---------------------------
+
+# nasza kolumna -> prefiks metryk (jak w verify_forecast_vs_actuals)
+METRIC_PREFIXES: Dict[str, str] = {
+    "temperature_c": "temp",
+    "precip_mm": "precip",
+}
+DEFAULT_CHUNKSIZE = 200_000
+
+
+class MomentAccumulator:
+    """
+    Akumulator online dla par (prognoza f, obserwacja a).
+
+    Trzyma sumy błędów (MAE / RMSE / bias) i momenty w stylu Welforda
+    (średnie, M2, współmoment) łączone między paczkami wzorem Chana – stabilnie
+    numerycznie, w stałej pamięci. Metryki = te same definicje co
+    `verify_forecast_vs_actuals` (bias = f − a, korelacja Pearsona).
+    """
+
+    __slots__ = ("n", "sum_err", "sum_abs", "sum_sq", "mean_f", "mean_a", "m2_f", "m2_a", "c_fa")
+
+    def __init__(self) -> None:
+        self.n = 0
+        self.sum_err = 0.0
+        self.sum_abs = 0.0
+        self.sum_sq = 0.0
+        self.mean_f = 0.0
+        self.mean_a = 0.0
+        self.m2_f = 0.0
+        self.m2_a = 0.0
+        self.c_fa = 0.0
+
+    def update(self, f: np.ndarray, a: np.ndarray) -> None:
+        """Dodaje paczkę par; pary z NaN po którejkolwiek stronie są pomijane."""
+        f = np.asarray(f, dtype=np.float64)
+        a = np.asarray(a, dtype=np.float64)
+        valid = np.isfinite(f) & np.isfinite(a)
+        if not valid.all():
+            f = f[valid]
+            a = a[valid]
+        nb = len(f)
+        if nb == 0:
+            return
+        err = f - a
+        mean_f = float(f.mean())
+        mean_a = float(a.mean())
+        df_ = f - mean_f
+        da = a - mean_a
+        self._merge(
+            nb,
+            float(err.sum()),
+            float(np.abs(err).sum()),
+            float((err * err).sum()),
+            mean_f,
+            mean_a,
+            float((df_ * df_).sum()),
+            float((da * da).sum()),
+            float((df_ * da).sum()),
+        )
+
+    def merge(self, other: "MomentAccumulator") -> None:
+        self._merge(
+            other.n, other.sum_err, other.sum_abs, other.sum_sq,
+            other.mean_f, other.mean_a, other.m2_f, other.m2_a, other.c_fa,
+        )
+
+    def _merge(
+        self, nb: int, sum_err: float, sum_abs: float, sum_sq: float,
+        mean_f: float, mean_a: float, m2_f: float, m2_a: float, c_fa: float,
+    ) -> None:
+        if nb == 0:
+            return
+        na = self.n
+        n = na + nb
+        delta_f = mean_f - self.mean_f
+        delta_a = mean_a - self.mean_a
+        w = na * nb / n
+        self.m2_f += m2_f + delta_f * delta_f * w
+        self.m2_a += m2_a + delta_a * delta_a * w
+        self.c_fa += c_fa + delta_f * delta_a * w
+        self.mean_f += delta_f * nb / n
+        self.mean_a += delta_a * nb / n
+        self.sum_err += sum_err
+        self.sum_abs += sum_abs
+        self.sum_sq += sum_sq
+        self.n = n
+
+    def metrics(self, prefix: str) -> Dict[str, float]:
+        n = self.n
+        nan = float("nan")
+        out: Dict[str, float] = {f"{prefix}_n": int(n)}
+        out[f"{prefix}_mae"] = self.sum_abs / n if n else nan
+        out[f"{prefix}_rmse"] = float(np.sqrt(self.sum_sq / n)) if n else nan
+        out[f"{prefix}_bias"] = self.sum_err / n if n else nan
+        denom = np.sqrt(self.m2_f * self.m2_a)
+        out[f"{prefix}_corr"] = float(self.c_fa / denom) if n >= 2 and denom > 0 else nan
+        return out
+
+
+class StreamingVerifier:
+    """
+    Weryfikacja prognozy (jeden punkt) względem obserwacji podawanych paczkami.
+
+    - bez tolerancji i polityki: dokładne dopasowanie timestampów (jak join w
+      `verify_forecast_vs_actuals`), każda paczka → akumulatory i zapominamy,
+    - z `time_tolerance` / `align`: dla każdej godziny prognozy trzymamy
+      najbliższą dotąd obserwację z lewej i z prawej (weather/alignment.py),
+      a politykę (nearest / backward / interpolate) stosujemy na końcu –
+      pamięć O(długość prognozy), niezależnie od rozmiaru archiwum.
+    """
+
+    def __init__(
+        self,
+        forecast_df: Union[pd.DataFrame, ForecastBlock],
+        *,
+        time_tolerance: Optional[str] = None,
+        location: int = 0,
+        variables: Sequence[str] = tuple(METRIC_PREFIXES),
+        align: Optional[str] = None,
+    ) -> None:
+        if isinstance(forecast_df, ForecastBlock):
+            forecast_df = forecast_df.to_pandas(location)
+        forecast_df = forecast_df.sort_index()
+        self.times = pd.DatetimeIndex(forecast_df.index).asi8
+        self.variables = [v for v in variables if v in forecast_df.columns]
+        self.forecast = {v: forecast_df[v].to_numpy(dtype=np.float64) for v in self.variables}
+        self.policy = align or ("nearest" if time_tolerance else None)
+        if self.policy is not None and self.policy not in ALIGN_POLICIES:
+            raise ValueError(f"Nieznana polityka dopasowania: {self.policy!r}")
+        self.tolerance_ns = tolerance_ns(time_tolerance)
+        self.n_samples = 0
+        self.seen_columns: set = set()
+        self.acc = {v: MomentAccumulator() for v in self.variables}
+        if self.policy is not None:
+            self._cand = Candidates.empty(len(self.times), len(self.variables))
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        """Paczka obserwacji z kolumną `time` + zmienne (np. z pd.read_csv(chunksize=...))."""
+        if chunk is None or chunk.empty:
+            return
+        self.seen_columns.update(chunk.columns)
+        obs_times = pd.to_datetime(chunk["time"]).to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        if self.policy is None:
+            self._update_exact(chunk, obs_times)
+        else:
+            self._update_aligned(chunk, obs_times)
+
+    def _update_exact(self, chunk: pd.DataFrame, obs_times: np.ndarray) -> None:
+        if len(self.times) == 0:
+            return
+        pos = np.searchsorted(self.times, obs_times)
+        pos_c = np.minimum(pos, len(self.times) - 1)
+        matched = (pos < len(self.times)) & (self.times[pos_c] == obs_times)
+        self.n_samples += int(matched.sum())
+        idx = pos_c[matched]
+        for v in self.variables:
+            if v in chunk.columns:
+                a = pd.to_numeric(chunk[v], errors="coerce").to_numpy(dtype=np.float64)[matched]
+                self.acc[v].update(self.forecast[v][idx], a)
+
+    def _update_aligned(self, chunk: pd.DataFrame, obs_times: np.ndarray) -> None:
+        if len(self.times) == 0 or len(obs_times) == 0:
+            return
+        values = np.column_stack([
+            pd.to_numeric(chunk[v], errors="coerce").to_numpy(dtype=np.float64)
+            if v in chunk.columns else np.full(len(chunk), np.nan)
+            for v in self.variables
+        ]) if self.variables else np.empty((len(chunk), 0))
+        obs_t, obs_v = sorted_unique(obs_times, values)
+        merge_candidates(self._cand, find_candidates(self.times, obs_t, obs_v))
+
+    def result(self) -> Dict[str, float]:
+        """Metryki w tym samym formacie co `verify_forecast_vs_actuals`."""
+        if self.policy is not None:
+            aligned, matched = resolve(self.times, self._cand, self.policy, self.tolerance_ns)
+            n_all = int(matched.sum())
+            accs = {v: MomentAccumulator() for v in self.variables}
+            for k, v in enumerate(self.variables):
+                accs[v].update(self.forecast[v][matched], aligned[matched, k])
+        else:
+            n_all = self.n_samples
+            accs = self.acc
+
+        metrics: Dict[str, float] = {"n_samples": int(n_all)}
+        if n_all == 0:
+            return metrics
+        for v in self.variables:
+            if v in self.seen_columns:
+                metrics.update(accs[v].metrics(METRIC_PREFIXES.get(v, v)))
+        return metrics
+
+
+def iter_observation_chunks(
+    source: Any,
+    *,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    columns: Optional[Sequence[str]] = None,
+) -> Iterable[pd.DataFrame]:
+    """
+    Paczki obserwacji z CSV (ścieżka / plik / upload Streamlita) albo z gotowego
+    iterowalnego źródła DataFrame'ów. Czytamy tylko potrzebne kolumny.
+    """
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunksize):
+            yield source.iloc[start : start + chunksize]
+        return
+    if not isinstance(source, (str, bytes)) and not hasattr(source, "read"):
+        yield from source
+        return
+    wanted = set(columns) if columns else None
+    reader = pd.read_csv(
+        source,
+        chunksize=chunksize,
+        usecols=(lambda c: c in wanted) if wanted else None,
+    )
+    for chunk in reader:
+        yield chunk
+
+
+def verify_forecast_stream(
+    forecast_df: Union[pd.DataFrame, ForecastBlock],
+    observations: Any,
+    *,
+    time_tolerance: Optional[str] = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    location: int = 0,
+    align: Optional[str] = None,
+) -> Dict[str, float]:
+    """
+    Strumieniowa wersja `verify_forecast_vs_actuals` – obserwacje czytane paczkami,
+    metryki liczone online (stała pamięć, wielogigabajtowe archiwa stacji).
+    Wynik ma te same klucze i definicje co wersja w pamięci.
+    """
+    verifier = StreamingVerifier(
+        forecast_df, time_tolerance=time_tolerance, location=location, align=align
+    )
+    wanted = ["time", *verifier.variables]
+    for chunk in iter_observation_chunks(observations, chunksize=chunksize, columns=wanted):
+        verifier.update(chunk)
+    return verifier.result()
+
+
+# ---------------------------
+# prognozy ensemble: CRPS, Brier, histogram rang, diagram niezawodności
+# ---------------------------
+
+# progi opadu [mm/h] dla Brier / niezawodności
+BRIER_THRESHOLDS_MM: Tuple[float, ...] = (0.1, 1.0, 5.0)
+# ile stacji naraz trzymamy w pamięci (kopia posortowanej kostki to M × T × chunk)
+ENSEMBLE_CHUNK_STATIONS = int(os.getenv("ENSEMBLE_CHUNK_STATIONS", "256"))
+RELIABILITY_BINS = 10
+
+
+def crps_ensemble(ens: np.ndarray, obs: np.ndarray) -> np.ndarray:
+    """
+    CRPS dla kostki (członkowie × ...) i obserwacji (...), wzór na posortowanych członkach:
+
+        CRPS = mean|x_i − y| − 1/M² · Σ (2i − M − 1) · x_(i)
+
+    czyli O(M log M) zamiast O(M²) par. Brak obserwacji albo któregoś członka → NaN.
+    """
+    x = np.sort(np.asarray(ens, dtype=np.float64), axis=0)
+    y = np.asarray(obs, dtype=np.float64)
+    m = x.shape[0]
+    weights = (2.0 * np.arange(1, m + 1) - m - 1).reshape((m,) + (1,) * (x.ndim - 1))
+    skill = np.abs(x - y).mean(axis=0)
+    spread = (weights * x).sum(axis=0) / (m * m)
+    crps = skill - spread
+    invalid = ~np.isfinite(y) | ~np.isfinite(x).all(axis=0)
+    crps[invalid] = np.nan
+    return crps
+
+
+def exceedance_probability(ens: np.ndarray, threshold: float) -> np.ndarray:
+    """Odsetek członków ≥ progu (NaN, gdy któregoś członka brak)."""
+    ens = np.asarray(ens)
+    p = (ens >= threshold).mean(axis=0)
+    return np.where(np.isfinite(ens).all(axis=0), p, np.nan)
+
+
+def rank_of_observation(ens: np.ndarray, obs: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Ranga obserwacji wśród członków (0..M); remisy rozbijane losowo – płaski histogram dla dobrego ensemble."""
+    below = (ens < obs).sum(axis=0)
+    ties = (ens == obs).sum(axis=0)
+    return below + np.floor(rng.random(below.shape) * (ties + 1)).astype(np.int64)
+
+
+def verify_ensemble(
+    ens: np.ndarray,
+    obs: np.ndarray,
+    *,
+    thresholds: Sequence[float] = BRIER_THRESHOLDS_MM,
+    n_bins: int = RELIABILITY_BINS,
+    chunk_stations: int = ENSEMBLE_CHUNK_STATIONS,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Wyniki probabilistyczne dla kostki (członkowie × czas × stacje) i obserwacji (czas × stacje).
+
+    Liczone paczkami stacji (`chunk_stations`) – pamięć ograniczona niezależnie od
+    liczby stacji; sumy z paczek są po prostu dodawane.
+
+    Zwraca dict gotowy do JSON:
+      n, crps, crps_per_station, rank_histogram (M + 1 liczników),
+      brier / brier_skill / base_rate per próg,
+      reliability per próg: {p_mean, obs_freq, n} w `n_bins` przedziałach prawdopodobieństwa.
+    """
+    ens = np.asarray(ens)
+    obs = np.asarray(obs)
+    if ens.ndim == 2:
+        ens = ens[:, :, None]
+    if obs.ndim == 1:
+        obs = obs[:, None]
+    m, n_t, n_s = ens.shape
+    if obs.shape != (n_t, n_s):
+        raise ValueError(f"obserwacje mają kształt {obs.shape}, oczekiwano {(n_t, n_s)}")
+
+    rng = np.random.default_rng(seed)
+    edges = np.linspace(0.0, 1.0, n_bins + 1)
+    thresholds = [float(t) for t in thresholds]
+
+    n_valid = 0
+    crps_sum = np.zeros(n_s)
+    crps_n = np.zeros(n_s)
+    rank_counts = np.zeros(m + 1, dtype=np.int64)
+    brier_sum = np.zeros(len(thresholds))
+    event_sum = np.zeros(len(thresholds))
+    rel_n = np.zeros((len(thresholds), n_bins))
+    rel_p = np.zeros((len(thresholds), n_bins))
+    rel_o = np.zeros((len(thresholds), n_bins))
+
+    step = max(1, int(chunk_stations))
+    for start in range(0, n_s, step):
+        sl = slice(start, min(start + step, n_s))
+        e = ens[:, :, sl]
+        y = obs[:, sl]
+        valid = np.isfinite(y) & np.isfinite(e).all(axis=0)
+        if not valid.any():
+            continue
+        n_valid += int(valid.sum())
+
+        crps = crps_ensemble(e, y)
+        crps_sum[sl] += np.where(valid, crps, 0.0).sum(axis=0)
+        crps_n[sl] += valid.sum(axis=0)
+
+        ranks = rank_of_observation(e, y, rng)[valid]
+        rank_counts += np.bincount(ranks, minlength=m + 1)
+
+        y_v = y[valid]
+        for k, thr in enumerate(thresholds):
+            p = exceedance_probability(e, thr)[valid]
+            o = (y_v >= thr).astype(np.float64)
+            brier_sum[k] += float(((p - o) ** 2).sum())
+            event_sum[k] += float(o.sum())
+            b = np.clip(np.searchsorted(edges, p, side="right") - 1, 0, n_bins - 1)
+            rel_n[k] += np.bincount(b, minlength=n_bins)
+            rel_p[k] += np.bincount(b, weights=p, minlength=n_bins)
+            rel_o[k] += np.bincount(b, weights=o, minlength=n_bins)
+
+    out: Dict[str, Any] = {"n": n_valid, "members": int(m), "stations": int(n_s)}
+    if n_valid == 0:
+        return out
+    with np.errstate(invalid="ignore", divide="ignore"):
+        per_station = np.where(crps_n > 0, crps_sum / crps_n, np.nan)
+        out["crps"] = float(crps_sum.sum() / n_valid)
+        out["crps_per_station"] = [float(v) for v in per_station]
+        out["rank_histogram"] = [int(c) for c in rank_counts]
+        brier: Dict[str, float] = {}
+        skill: Dict[str, float] = {}
+        base: Dict[str, float] = {}
+        reliability: Dict[str, Dict[str, List[float]]] = {}
+        for k, thr in enumerate(thresholds):
+            key = f"{thr:g}"
+            bs = brier_sum[k] / n_valid
+            rate = event_sum[k] / n_valid
+            clim = rate * (1.0 - rate)
+            brier[key] = float(bs)
+            base[key] = float(rate)
+            skill[key] = float(1.0 - bs / clim) if clim > 0 else float("nan")
+            used = rel_n[k] > 0
+            reliability[key] = {
+                "p_mean": [float(v) for v in (rel_p[k][used] / rel_n[k][used])],
+                "obs_freq": [float(v) for v in (rel_o[k][used] / rel_n[k][used])],
+                "n": [int(v) for v in rel_n[k][used]],
+            }
+    out["brier"] = brier
+    out["brier_skill"] = skill
+    out["base_rate"] = base
+    out["reliability"] = reliability
+    return out
+
+
+def _scatter_long(
+    df: pd.DataFrame,
+    variable: str,
+    times: np.ndarray,
+    axes: Sequence[Tuple[str, Optional[Sequence[Any]]]],
+    time_col: str,
+) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """Format długi → tablica (osie..., czas, stacje) – jedno przypisanie przez indeksy."""
+    t = pd.to_datetime(df[time_col]).to_numpy(dtype="datetime64[ns]")
+    pos = np.searchsorted(times, t)
+    ok = (pos < len(times)) & (times[np.minimum(pos, len(times) - 1)] == t)
+    codes: List[np.ndarray] = []
+    labels: List[np.ndarray] = []
+    for col, wanted in axes:
+        if col in df.columns:
+            if wanted is None:
+                c, u = pd.factorize(df[col], sort=True)
+                u = np.asarray(u)
+            else:
+                u = np.asarray(wanted)
+                c = pd.Index(u).get_indexer(df[col])
+            ok &= c >= 0
+        else:
+            c, u = np.zeros(len(df), dtype=np.int64), np.asarray(wanted if wanted is not None else ["-"])
+        codes.append(c)
+        labels.append(u)
+    shape = [len(labels[0]), len(times), len(labels[1])] if len(axes) == 2 else [len(times), len(labels[0])]
+    out = np.full(shape, np.nan, dtype=np.float32)
+    values = pd.to_numeric(df[variable], errors="coerce").to_numpy(dtype=np.float32)
+    if len(axes) == 2:
+        out[codes[0][ok], pos[ok], codes[1][ok]] = values[ok]
+    else:
+        out[pos[ok], codes[0][ok]] = values[ok]
+    return out, labels
+
+
+def ensemble_cube(
+    df: pd.DataFrame,
+    variable: str,
+    *,
+    times: Optional[np.ndarray] = None,
+    member_col: str = "member",
+    station_col: str = "station",
+    time_col: str = "time",
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Ensemble w formacie długim (time, member, [station], zmienne) → kostka (M, T, S) float32.
+    Bez kolumny stacji – jedna stacja. Zwraca (kostka, czasy, członkowie, stacje).
+    """
+    if times is None:
+        times = np.unique(pd.to_datetime(df[time_col]).to_numpy(dtype="datetime64[ns]"))
+    times = np.asarray(times, dtype="datetime64[ns]")
+    cube, (members, stations) = _scatter_long(
+        df, variable, times, [(member_col, None), (station_col, None)], time_col
+    )
+    return cube, times, members, stations
+
+
+def observation_matrix(
+    df: pd.DataFrame,
+    variable: str,
+    times: np.ndarray,
+    stations: Sequence[Any],
+    *,
+    station_col: str = "station",
+    time_col: str = "time",
+) -> np.ndarray:
+    """Obserwacje (time, [station], zmienne) na osiach kostki ensemble → (T, S); brak → NaN."""
+    matrix, _ = _scatter_long(
+        df, variable, np.asarray(times, dtype="datetime64[ns]"), [(station_col, list(stations))], time_col
+    )
+    return matrix
+
+
+def stream_observation_matrix(
+    observations: Any,
+    variable: str,
+    times: np.ndarray,
+    stations: Sequence[Any],
+    *,
+    align: str = "exact",
+    time_tolerance: Optional[str] = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    station_col: str = "station",
+    time_col: str = "time",
+) -> np.ndarray:
+    """
+    Jak `observation_matrix`, ale obserwacje czytane paczkami (CSV / upload / iterowalne
+    DataFrame'y) – tylko kolumny czas / stacja / zmienna, pamięć O(czasy × stacje).
+
+    - "exact": dokładne timestampy, wiersze spoza okna ensemble odrzucane od razu,
+    - "nearest" / "backward" / "interpolate": per stacja kandydaci z lewej/prawej
+      (weather/alignment.py) łączeni paczka po paczce, polityka na końcu – te same
+      definicje co `verify_forecast_stream`.
+    Ten sam timestamp w kilku paczkach → wygrywa późniejszy wiersz.
+    """
+    if align not in ALIGN_POLICIES:
+        raise ValueError(f"Nieznana polityka dopasowania: {align!r}")
+    target = _as_ns(np.asarray(times, dtype="datetime64[ns]"))
+    station_index = pd.Index(list(stations))
+    n_t, n_s = len(target), len(station_index)
+    out = np.full((n_t, n_s), np.nan, dtype=np.float32)
+    if n_t == 0 or n_s == 0:
+        return out
+    tol_ns = tolerance_ns(time_tolerance)
+    # przy dokładnym dopasowaniu albo z tolerancją nic spoza okna się nie przyda
+    pad = 0 if align == "exact" else tol_ns
+    lo = target.min() - pad if pad is not None else None
+    hi = target.max() + pad if pad is not None else None
+    cands: Dict[int, Candidates] = {}
+
+    for chunk in iter_observation_chunks(
+        observations, chunksize=chunksize, columns=[time_col, station_col, variable]
+    ):
+        if chunk is None or chunk.empty or variable not in chunk.columns:
+            continue
+        t = _as_ns(chunk[time_col])
+        values = pd.to_numeric(chunk[variable], errors="coerce").to_numpy(dtype=np.float64)
+        if station_col in chunk.columns:
+            codes = station_index.get_indexer(chunk[station_col])
+        else:
+            codes = np.zeros(len(chunk), dtype=np.int64) if n_s == 1 else np.full(len(chunk), -1)
+        keep = codes >= 0
+        if lo is not None:
+            keep &= (t >= lo) & (t <= hi)
+        if not keep.any():
+            continue
+        t, values, codes = t[keep], values[keep], codes[keep]
+
+        if align == "exact":
+            pos = np.searchsorted(target, t)
+            pos_c = np.minimum(pos, n_t - 1)
+            ok = (pos < n_t) & (target[pos_c] == t)
+            # przypisanie w kolejności wierszy – ostatni wygrywa
+            out[pos_c[ok], codes[ok]] = values[ok]
+            continue
+
+        order = np.argsort(codes, kind="stable")
+        codes_sorted = codes[order]
+        bounds = np.flatnonzero(np.diff(codes_sorted)) + 1
+        for part in np.split(order, bounds):
+            code = int(codes[part[0]])
+            obs_t, obs_v = sorted_unique(t[part], values[part][:, None])
+            found = find_candidates(target, obs_t, obs_v)
+            if code in cands:
+                merge_candidates(cands[code], found)
+            else:
+                cands[code] = found
+
+    for code, cand in cands.items():
+        aligned, matched = resolve(target, cand, align, tol_ns)
+        out[matched, code] = aligned[matched, 0]
+    return out
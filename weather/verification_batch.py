@@ -0,0 +1,308 @@
+"""
+Wsadowa weryfikacja prognoz: tysiące stacji × wiele przebiegów modelu naraz.
+
+Wejście w formacie długim:
+- prognozy: station, issue_time, valid_time, <zmienne...>
+- obserwacje: station, time, <zmienne...>
+
+Wynik: metryki (n, MAE, RMSE, bias, korelacja – te same definicje co
+`verify_forecast_vs_actuals`) per stacja × przedział wyprzedzenia × zmienna.
+
+Jedno przejście wektorowe, bez pętli po grupach:
+1. dopasowanie prognoza ↔ obserwacja po kluczu int64 (kod stacji, czas) – sort + searchsorted,
+2. numer grupy = stacja × przedział wyprzedzenia,
+3. statystyki dostateczne (sumy f, a, f², a², fa, |e|, e²) przez np.bincount.
+
+Statystyki są addytywne, więc partycje stacji liczą się niezależnie w puli procesów
+i po prostu się sumują.
+
+Benchmark:
+    python -m weather.verification_batch --stations 1000 --runs 60 --workers 4
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from weather.alignment import _as_ns
+
+logger = logging.getLogger(__name__)
+
+# granice przedziałów wyprzedzenia [h] – ostatni przedział jest otwarty (np. „240h+”)
+DEFAULT_LEAD_BUCKETS_H: Tuple[int, ...] = (0, 6, 12, 24, 48, 72, 120, 168, 240)
+DEFAULT_WORKERS = int(os.getenv("VERIFICATION_WORKERS", "1"))
+
+STAT_FIELDS = ("n", "sum_f", "sum_a", "sum_ff", "sum_aa", "sum_fa", "sum_abs", "sum_sq")
+
+
+def lead_bucket_labels(edges: Sequence[int]) -> List[str]:
+    labels = [f"{lo}-{hi}h" for lo, hi in zip(edges[:-1], edges[1:])]
+    labels.append(f"{edges[-1]}h+")
+    return labels
+
+
+_NAT = np.iinfo(np.int64).min
+
+
+def _time_seconds(values: Any) -> np.ndarray:
+    # strefy jak w weather.alignment: świadome → UTC bez strefy, naiwne bez zmian
+    ns = _as_ns(values)
+    return np.where(ns == _NAT, _NAT, ns // 1_000_000_000)
+
+
+def _make_keys(codes: np.ndarray, seconds: np.ndarray, t0: int) -> np.ndarray:
+    # 32 bity na czas (sekundy od t0, ~136 lat) + reszta na kod stacji
+    return (codes.astype(np.int64) << 32) | (seconds - t0).astype(np.int64)
+
+
+def _partition_stats(
+    f_keys: np.ndarray,
+    groups: np.ndarray,
+    f_values: np.ndarray,
+    o_keys: np.ndarray,
+    o_values: np.ndarray,
+    shifts: np.ndarray,
+    n_groups: int,
+) -> np.ndarray:
+    """
+    Statystyki dostateczne dla jednej partycji: (zmienne, grupy, pola STAT_FIELDS).
+    `o_keys` musi być posortowane i unikalne.
+    """
+    n_vars = f_values.shape[1]
+    out = np.zeros((n_vars, n_groups, len(STAT_FIELDS)), dtype=np.float64)
+    if len(f_keys) == 0 or len(o_keys) == 0:
+        return out
+
+    pos = np.searchsorted(o_keys, f_keys)
+    pos_c = np.minimum(pos, len(o_keys) - 1)
+    matched = (pos < len(o_keys)) & (o_keys[pos_c] == f_keys)
+    if not matched.any():
+        return out
+    g_all = groups[matched]
+    obs_idx = pos_c[matched]
+
+    for v in range(n_vars):
+        # przesunięcie o średnią obserwacji – sumy kwadratów bez utraty precyzji
+        f = f_values[matched, v] - shifts[v]
+        a = o_values[obs_idx, v] - shifts[v]
+        valid = np.isfinite(f) & np.isfinite(a)
+        f = f[valid]
+        a = a[valid]
+        g = g_all[valid]
+        e = f - a
+        weights = (None, f, a, f * f, a * a, f * a, np.abs(e), e * e)
+        for k, w in enumerate(weights):
+            out[v, :, k] = np.bincount(g, weights=w, minlength=n_groups)
+    return out
+
+
+def _partition_worker(args: Tuple[Any, ...]) -> np.ndarray:
+    return _partition_stats(*args)
+
+
+def stats_to_metrics(stats: np.ndarray) -> Dict[str, np.ndarray]:
+    """(…, STAT_FIELDS) → n, mae, rmse, bias, corr (definicje jak w verify_forecast_vs_actuals)."""
+    n = stats[..., 0]
+    sum_f, sum_a, sum_ff, sum_aa, sum_fa, sum_abs, sum_sq = (stats[..., k] for k in range(1, 8))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mae = np.where(n > 0, sum_abs / n, np.nan)
+        rmse = np.where(n > 0, np.sqrt(sum_sq / n), np.nan)
+        bias = np.where(n > 0, (sum_f - sum_a) / n, np.nan)
+        var_f = n * sum_ff - sum_f * sum_f
+        var_a = n * sum_aa - sum_a * sum_a
+        cov = n * sum_fa - sum_f * sum_a
+        denom = np.sqrt(np.maximum(var_f, 0.0) * np.maximum(var_a, 0.0))
+        corr = np.where((n >= 2) & (denom > 0), cov / denom, np.nan)
+    return {"n": n.astype(np.int64), "mae": mae, "rmse": rmse, "bias": bias, "corr": corr}
+
+
+def verify_batch(
+    forecasts: pd.DataFrame,
+    observations: pd.DataFrame,
+    *,
+    variables: Optional[Sequence[str]] = None,
+    lead_buckets_h: Sequence[int] = DEFAULT_LEAD_BUCKETS_H,
+    station_col: str = "station",
+    issue_col: str = "issue_time",
+    valid_col: str = "valid_time",
+    obs_time_col: str = "time",
+    workers: int = DEFAULT_WORKERS,
+) -> pd.DataFrame:
+    """
+    Metryki per (stacja, przedział wyprzedzenia, zmienna) dla prognoz w formacie długim.
+
+    - obserwacje z powtórzonym (stacja, czas) – bierzemy ostatnią,
+    - prognozy z ujemnym wyprzedzeniem (valid < issue) są pomijane,
+    - `workers > 1` – partycje stacji w puli procesów (wynik identyczny).
+
+    Zwraca DataFrame z MultiIndexem (station, lead_bucket, variable)
+    i kolumnami n, mae, rmse, bias, corr – tylko grupy z n > 0.
+    """
+    if variables is None:
+        skip = {station_col, issue_col, valid_col, obs_time_col}
+        variables = [c for c in forecasts.columns if c not in skip and c in observations.columns]
+    variables = list(variables)
+    edges = np.asarray(lead_buckets_h, dtype=np.int64)
+    labels = lead_bucket_labels(list(edges))
+    columns = ["n", "mae", "rmse", "bias", "corr"]
+    empty = pd.DataFrame(
+        columns=columns,
+        index=pd.MultiIndex.from_arrays([[], [], []], names=["station", "lead_bucket", "variable"]),
+    )
+    if forecasts.empty or observations.empty or not variables:
+        return empty
+
+    # wspólne kody stacji dla obu tabel
+    # (przez Categorical – bez sklejania milionów stringów w jedną kolumnę);
+    # wiersze bez stacji albo bez czasu (kod -1 / NaT) pomijamy
+    uniques = (
+        pd.Index(pd.unique(forecasts[station_col]))
+        .union(pd.Index(pd.unique(observations[station_col])))
+        .dropna()
+    )
+    f_codes = pd.Categorical(forecasts[station_col], categories=uniques).codes
+    o_codes = pd.Categorical(observations[station_col], categories=uniques).codes
+
+    f_valid_s = _time_seconds(forecasts[valid_col])
+    f_issue_s = _time_seconds(forecasts[issue_col])
+    o_time_s = _time_seconds(observations[obs_time_col])
+    f_ok = (f_codes >= 0) & (f_valid_s != _NAT) & (f_issue_s != _NAT)
+    o_ok = (o_codes >= 0) & (o_time_s != _NAT)
+    if not f_ok.any() or not o_ok.any():
+        return empty
+    # maska przed jakąkolwiek arytmetyką na czasach – NaT (int64 min) przepełniłby klucze
+    f_rows = np.flatnonzero(f_ok)
+    lead_h = (f_valid_s[f_rows] - f_issue_s[f_rows]) / 3600.0
+    f_rows, lead_h = f_rows[lead_h >= 0], lead_h[lead_h >= 0]
+    if len(f_rows) == 0:
+        return empty
+    f_codes, f_valid_s = f_codes[f_rows], f_valid_s[f_rows]
+    t0 = int(min(f_valid_s.min(), o_time_s[o_ok].min()))
+
+    bucket = np.clip(np.searchsorted(edges, lead_h, side="right") - 1, 0, len(edges) - 1)
+    n_buckets = len(edges)
+    groups = f_codes.astype(np.int64) * n_buckets + bucket
+    f_keys = _make_keys(f_codes, f_valid_s, t0)
+    f_values = np.column_stack(
+        [pd.to_numeric(forecasts[v], errors="coerce").to_numpy(np.float64)[f_rows] for v in variables]
+    )
+
+    o_keys = _make_keys(o_codes[o_ok], o_time_s[o_ok], t0)
+    o_values = np.column_stack(
+        [pd.to_numeric(observations[v], errors="coerce").to_numpy(np.float64)[o_ok] for v in variables]
+    )
+    # sort + deduplikacja (ostatnia obserwacja wygrywa)
+    order = np.argsort(o_keys, kind="stable")
+    o_keys = o_keys[order]
+    o_values = o_values[order]
+    last = np.r_[o_keys[1:] != o_keys[:-1], True]
+    o_keys = o_keys[last]
+    o_values = o_values[last]
+
+    shifts = np.nan_to_num(np.nanmean(o_values, axis=0)) if len(o_values) else np.zeros(len(variables))
+    n_groups = len(uniques) * n_buckets
+
+    workers = max(1, int(workers))
+    if workers == 1:
+        stats = _partition_stats(f_keys, groups, f_values, o_keys, o_values, shifts, n_groups)
+    else:
+        # partycje po stacjach – każda dostaje tylko swoje obserwacje
+        f_part = (f_keys >> 32) % workers
+        o_part = (o_keys >> 32) % workers
+        jobs = [
+            (f_keys[f_part == p], groups[f_part == p], f_values[f_part == p],
+             o_keys[o_part == p], o_values[o_part == p], shifts, n_groups)
+            for p in range(workers)
+        ]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            stats = sum(pool.map(_partition_worker, jobs))
+
+    metrics = stats_to_metrics(stats)  # każda: (zmienne, grupy)
+    var_idx, group_idx = np.nonzero(metrics["n"] > 0)
+    if len(var_idx) == 0:
+        return empty
+    station_idx = group_idx // n_buckets
+    bucket_idx = group_idx % n_buckets
+    index = pd.MultiIndex.from_arrays(
+        [
+            np.asarray(uniques)[station_idx],
+            pd.Categorical.from_codes(bucket_idx, categories=labels, ordered=True),
+            pd.Categorical.from_codes(var_idx, categories=variables),
+        ],
+        names=["station", "lead_bucket", "variable"],
+    )
+    out = pd.DataFrame({name: metrics[name][var_idx, group_idx] for name in columns}, index=index)
+    return out.sort_index()
+
+
+def make_synthetic_batch(
+    n_stations: int = 1000,
+    n_runs: int = 40,
+    horizon_h: int = 168,
+    step_h: int = 6,
+    seed: int = 0,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Syntetyczne prognozy (format długi) + obserwacje – do benchmarku i testów."""
+    rng = np.random.default_rng(seed)
+    stations = np.array([f"ST{i:05d}" for i in range(n_stations)])
+    start = np.datetime64("2025-01-01T00:00", "ns")
+    issues = start + np.arange(n_runs) * np.timedelta64(step_h, "h")
+    leads = np.arange(0, horizon_h, 1) * np.timedelta64(1, "h")
+
+    st_idx = np.repeat(np.arange(n_stations), n_runs * len(leads))
+    issue = np.tile(np.repeat(issues, len(leads)), n_stations)
+    valid = issue + np.tile(leads, n_stations * n_runs)
+    lead_h = np.tile(np.arange(horizon_h), n_stations * n_runs)
+
+    obs_times = start + np.arange(n_runs * step_h + horizon_h) * np.timedelta64(1, "h")
+    truth_t = rng.normal(8, 6, (n_stations, len(obs_times))).astype(np.float32)
+    truth_p = rng.gamma(0.3, 2.0, (n_stations, len(obs_times))).astype(np.float32)
+    observations = pd.DataFrame({
+        "station": pd.Categorical.from_codes(np.repeat(np.arange(n_stations), len(obs_times)), stations),
+        "time": np.tile(obs_times, n_stations),
+        "temperature_c": truth_t.ravel(),
+        "precip_mm": truth_p.ravel(),
+    })
+
+    t_idx = ((valid - start) // np.timedelta64(1, "h")).astype(np.int64)
+    noise = rng.normal(0, 1, len(valid)).astype(np.float32) * (1 + lead_h / 48.0)
+    forecasts = pd.DataFrame({
+        "station": pd.Categorical.from_codes(st_idx, stations),
+        "issue_time": issue,
+        "valid_time": valid,
+        "temperature_c": truth_t[st_idx, t_idx] + noise,
+        "precip_mm": np.maximum(0, truth_p[st_idx, t_idx] + noise * 0.3),
+    })
+    return forecasts, observations
+
+
+def benchmark(n_stations: int = 1000, n_runs: int = 60, workers: int = 1) -> Dict[str, float]:
+    import time
+
+    forecasts, observations = make_synthetic_batch(n_stations, n_runs)
+    t0 = time.perf_counter()
+    result = verify_batch(forecasts, observations, workers=workers)
+    elapsed = time.perf_counter() - t0
+    return {
+        "forecast_rows": float(len(forecasts)),
+        "observation_rows": float(len(observations)),
+        "groups": float(len(result)),
+        "seconds": elapsed,
+        "rows_per_s": len(forecasts) / elapsed,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark wsadowej weryfikacji.")
+    parser.add_argument("--stations", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    for k, v in benchmark(args.stations, args.runs, args.workers).items():
+        print(f"{k:>16}: {v:,.2f}")